@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useMemo, useCallback } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
-import { checkAvailability, createBooking } from '../../services/api';
+import { checkAvailability, createBooking, joinWaitlist } from '../../services/api';
 import '../../styles/BookingPage.css';
 
 const BookingForm = () => {
@@ -28,6 +28,8 @@ const BookingForm = () => {
   const [error, setError] = useState(null);
   const [conflictDetails, setConflictDetails] = useState(null);
   const [submitting, setSubmitting] = useState(false);
+  const [lastRequest, setLastRequest] = useState(null);
+  const [waitlistMessage, setWaitlistMessage] = useState(null);
 
   // Get today's date in YYYY-MM-DD format for min date
   const today = new Date().toISOString().split('T')[0];
@@ -170,6 +172,7 @@ const BookingForm = () => {
     setSubmitting(true);
     setError(null);
     setConflictDetails(null);
+    setWaitlistMessage(null);
 
     try {
       // Create datetime strings - backend will interpret in EST/EDT timezone
@@ -192,12 +195,13 @@ const BookingForm = () => {
       const startDatetime = `${startDate}T${String(startHour).padStart(2, '0')}:00:00`;
       const endDatetime = `${endDate}T${String(endHour).padStart(2, '0')}:00:00`;
 
-      const response = await createBooking({
-        room_ids: roomIds,
+      const bookingRequest = {
         start_datetime: startDatetime,
         end_datetime: endDatetime,
         booking_type: isCampBooking ? 'camp' : 'regular',
-      });
+      };
+      setLastRequest(bookingRequest);
+      const response = await createBooking({ room_ids: roomIds, ...bookingRequest });
 
       // Success - navigate to success page or dashboard
       alert(isCampBooking ? 'Camp booking created successfully! It will be reviewed by an admin.' : 'Booking created successfully!');
@@ -215,6 +219,23 @@ const BookingForm = () => {
     }
   };
 
+  // Wait for the conflicting rooms at the requested time instead of re-checking later
+  const handleJoinWaitlist = async () => {
+    const conflictRoomIds = [...new Set(conflictDetails.conflicts.map((conflict) => conflict.room_id))];
+    setSubmitting(true);
+    try {
+      await Promise.all(conflictRoomIds.map((roomId) => joinWaitlist({ room_id: roomId, ...lastRequest })));
+      setConflictDetails(null);
+      setError(null);
+      setWaitlistMessage("You're on the waitlist. If the booking is cancelled, the room will be booked for you and you'll get an email.");
+    } catch (err) {
+      const data = err.response?.data;
+      setError(data?.detail || (data && Object.values(data).flat()[0]) || 'Failed to join the waitlist');
+    } finally {
+      setSubmitting(false);
+    }
+  };
+
   // Generate time options from available hours
   const generateTimeOptions = () => {
     if (availableHours.length === 0) return [];
@@ -485,10 +506,19 @@ const BookingForm = () => {
                   </li>
                 ))}
               </ul>
-              <p>Please select a different time slot.</p>
+              <p>Please select a different time slot, or join the waitlist to get the room if this booking is cancelled.</p>
+              {lastRequest && conflictDetails.conflicts.every((conflict) => conflict.room_id) && (
+                <button type="button" onClick={handleJoinWaitlist} className="btn-secondary" disabled={submitting}>
+                  Join waitlist
+                </button>
+              )}
             </div>
           )}
 
+          {waitlistMessage && (
+            <div className="waitlist-message">{waitlistMessage}</div>
+          )}
+
           {/* Submit Button */}
           <div className="form-actions">
             <button
@@ -22,6 +22,28 @@ const API = axios.create({
   timeout: 10000, // 10 second timeout
 });
 
+// Idempotency keys for write requests: a request keeps its key until it succeeds, so
+// sending the same request again after a timeout (the user retrying) reuses it and the
+// server answers with the first attempt's result instead of booking twice
+const IDEMPOTENT_METHODS = ['post', 'put', 'patch', 'delete'];
+const pendingIdempotencyKeys = new Map();
+
+const newIdempotencyKey = () => (
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`
+);
+
+const requestSignature = (config) => (
+  `${config.method} ${config.url} ${typeof config.data === 'string' ? config.data : JSON.stringify(config.data ?? null)}`
+);
+
+const releaseIdempotencyKey = (config) => {
+  if (config?.idempotencySignature) {
+    pendingIdempotencyKeys.delete(config.idempotencySignature);
+  }
+};
+
 // Automatically attach JWT token to every request if it exists
 API.interceptors.request.use((config) => {
   const token = localStorage.getItem('access');
@@ -29,6 +51,16 @@ API.interceptors.request.use((config) => {
     config.headers.Authorization = `Bearer ${token}`;
   }
   
+  // auth/ requests are skipped: they aren't idempotent views and their bodies hold passwords
+  if (IDEMPOTENT_METHODS.includes(config.method) && !config.url.includes('auth/') && !config.headers['Idempotency-Key']) {
+    const signature = requestSignature(config);
+    if (!pendingIdempotencyKeys.has(signature)) {
+      pendingIdempotencyKeys.set(signature, newIdempotencyKey());
+    }
+    config.idempotencySignature = signature;
+    config.headers['Idempotency-Key'] = pendingIdempotencyKeys.get(signature);
+  }
+
   // Ensure baseURL is properly set
   if (!config.url.startsWith('http') && !config.baseURL) {
     console.warn('⚠️ API request missing baseURL:', config.url);
@@ -39,7 +71,10 @@ API.interceptors.request.use((config) => {
 
 // Handle token refresh on 401 errors and log errors for debugging
 API.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    releaseIdempotencyKey(response.config);
+    return response;
+  },
   async (error) => {
     const originalRequest = error.config;
     
@@ -109,8 +144,50 @@ export const checkAvailability = async (date, roomIds) => {
   return await API.get(`check_availability/?date=${date}&room_ids=${roomIdsStr}`);
 };
 
+// During an admission window (e.g. camp registration opening) the server queues the
+// request and answers 202; poll its status until it has been booked or rejected, and
+// resolve or reject the same way as an inline create_booking/ would
+const QUEUE_POLL_MS = [1000, 1000, 2000, 2000, 3000];
+const QUEUE_TIMEOUT_MS = 5 * 60 * 1000;
+
+const waitForQueuedBooking = async (queued) => {
+  const startedAt = Date.now();
+  let request = queued;
+  for (let attempt = 0; request.status === 'Queued'; attempt += 1) {
+    if (Date.now() - startedAt > QUEUE_TIMEOUT_MS) {
+      throw new Error('Your booking request is still queued. Check My Bookings later.');
+    }
+    await new Promise((resolve) => setTimeout(resolve, QUEUE_POLL_MS[Math.min(attempt, QUEUE_POLL_MS.length - 1)]));
+    request = (await API.get(`booking-queue/${queued.id}/`)).data;
+  }
+  if (request.status === 'Rejected') {
+    const error = new Error(request.result?.detail || 'Booking request was rejected');
+    error.response = { status: request.result?.conflicts ? 409 : 400, data: request.result };
+    throw error;
+  }
+  return await getBooking(request.booking_id);
+};
+
 export const createBooking = async (data) => {
-  return await API.post('create_booking/', data);
+  const response = await API.post('create_booking/', data);
+  if (response.status === 202) {
+    return await waitForQueuedBooking(response.data);
+  }
+  return response;
+};
+
+// Waitlist: when a room is taken, wait for a cancellation instead of re-checking
+// availability; the server books it automatically and emails the user
+export const joinWaitlist = async (data) => {
+  return await API.post('waitlist/', data);
+};
+
+export const getMyWaitlist = async () => {
+  return await API.get('waitlist/');
+};
+
+export const leaveWaitlist = async (entryId) => {
+  return await API.delete(`waitlist/${entryId}/`);
 };
 
 export const getFloors = async () => {
@@ -4,5 +4,55 @@ from .models import *
 # Register your models here.
 admin.site.register(CustomUser)
 admin.site.register(Floor)
-admin.site.register(Room)
-admin.site.register(Booking)
\ No newline at end of file
+
+
+@admin.register(Room)
+class RoomAdmin(admin.ModelAdmin):
+    list_select_related = ['floor']  # Room.__str__ shows the floor name
+
+
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    list_select_related = ['user']  # Booking.__str__ shows the username
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name == 'rooms':
+            kwargs['queryset'] = Room.objects.select_related('floor')
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+@admin.register(BookingSeries)
+class BookingSeriesAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'frequency', 'start_date', 'until', 'count', 'status', 'materialized_until']
+    list_filter = ['status', 'frequency']
+    list_select_related = ['user']
+
+@admin.register(IdempotencyRecord)
+class IdempotencyRecordAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'user', 'status_code', 'created_at', 'expires_at']
+    list_filter = ['method', 'status_code']
+    list_select_related = ['user']
+
+@admin.register(AdmissionWindow)
+class AdmissionWindowAdmin(admin.ModelAdmin):
+    list_display = ['name', 'opens_at', 'closes_at']
+    filter_horizontal = ['rooms']
+
+@admin.register(QueuedBooking)
+class QueuedBookingAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'window', 'status', 'booking', 'created_at', 'processed_at']
+    list_filter = ['status', 'window']
+    list_select_related = ['user', 'window']
+    raw_id_fields = ['booking']
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'room', 'start_datetime', 'end_datetime', 'status', 'booking', 'created_at']
+    list_filter = ['status']
+    list_select_related = ['user', 'room']
+    raw_id_fields = ['booking']
+
+@admin.register(WeeklyUsage)
+class WeeklyUsageAdmin(admin.ModelAdmin):
+    list_display = ['user', 'week_start', 'booked_minutes']
+    list_select_related = ['user']
+    search_fields = ['user__email', 'user__username']
@@ -0,0 +1,161 @@
+"""
+Admission queue for high-contention booking windows
+
+When camp registration opens, dozens of users submit create_booking/ for the same rooms
+at once: they all lock and check the same rows, most get a 409 and the workers saturate.
+An AdmissionWindow names rooms and a period; while it is open, create_booking/ requests
+for those rooms are validated as usual but, instead of being booked inline, stored as
+QueuedBooking rows and answered with 202 and the request's status.
+
+`python manage.py process_booking_queue` is the single consumer. It takes the queued
+requests in arrival order, a batch at a time, and resolves them as a set: one query for
+conflicts with existing bookings and series for the whole batch, then a pass in arrival
+order where each request is booked unless it overlaps one already booked in the batch,
+and one bulk insert. The first request for a slot wins, like it would inline, but without
+the contention.
+
+Clients poll booking-queue/<id>/ (one primary-key query) for the outcome; a booked
+request also gets the usual booking confirmation email.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from .db_router import PRIMARY
+from .models import AdmissionWindow, Booking, QueuedBooking, Room
+from .serializers import QueuedBookingSerializer, booking_window_error, initial_booking_status
+from .quotas import QuotaExceeded, WeeklyUsageTracker, user_roles
+from .series import conflict_entry, conflict_response, find_conflicts
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def open_window(room_ids, now):
+    """The admission window open at `now` for any of the rooms, or None"""
+    return AdmissionWindow.objects.filter(
+        opens_at__lte=now, closes_at__gt=now, rooms__id__in=room_ids,
+    ).order_by('closes_at').first()
+
+
+def enqueue(user, window, room_ids, start, end, booking_type):
+    return QueuedBooking.objects.using(PRIMARY).create(
+        user=user,
+        window=window,
+        room_ids=sorted(room_ids),
+        start_datetime=start,
+        end_datetime=end,
+        booking_type=booking_type,
+    )
+
+
+def queue_position(queued):
+    """How many queued requests (this one included) will be processed before this one is done"""
+    return QueuedBooking.objects.using(PRIMARY).filter(status='Queued', id__lte=queued.id).count()
+
+
+def queued_booking_data(queued):
+    """Response body for a queued request; includes its position while it's still waiting"""
+    data = QueuedBookingSerializer(queued).data
+    if queued.status == 'Queued':
+        data['position'] = queue_position(queued)
+    return data
+
+
+def _reject(queued, detail, conflicts=None):
+    queued.status = 'Rejected'
+    queued.result = conflict_response(conflicts) if conflicts else {'detail': detail}
+
+
+def process_queue(limit=None):
+    """
+    Book or reject the oldest queued requests, up to `limit` (default
+    ADMISSION_QUEUE_BATCH_SIZE), in arrival order. Returns (processed requests, bookings).
+    """
+    limit = limit or settings.ADMISSION_QUEUE_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic(using=PRIMARY):
+        queued = list(
+            QueuedBooking.objects.using(PRIMARY).select_for_update()
+            .filter(status='Queued').order_by('id')[:limit]
+        )
+        if not queued:
+            return [], []
+
+        requests = [(set(q.room_ids), q.start_datetime, q.end_datetime) for q in queued]
+        room_names = dict(
+            Room.objects.using(PRIMARY).filter(id__in=set().union(*(rooms for rooms, _, _ in requests)))
+            .values_list('id', 'name')
+        )
+        max_span_days = getattr(settings, 'BOOKING_MAX_SPAN_DAYS', None)
+        tracker = WeeklyUsageTracker(
+            user_roles(q.user_id for q in queued), [(q.user_id, q.booking_type, q.start_datetime) for q in queued]
+        )
+        booked = {}  # room id -> [(start, end)] of the requests booked in this batch
+        to_book = []
+        statuses = {}  # queued id -> status of its booking
+        for q, (rooms, start, end), conflicts in zip(queued, requests, find_conflicts(requests)):
+            q.processed_at = now
+            # The request was valid when queued; a backlog can push it past the start time
+            window_error = booking_window_error(q.booking_type, start, end, now)
+            if window_error or (max_span_days and end - start > timedelta(days=max_span_days)):
+                _reject(q, window_error or f"Bookings cannot span more than {max_span_days} days.")
+                continue
+            if rooms - room_names.keys():
+                _reject(q, "Some rooms are invalid.")
+                continue
+            conflicts = conflicts + [
+                conflict_entry(room_id, room_names[room_id], booked_start, booked_end)
+                for room_id in sorted(rooms)
+                for booked_start, booked_end in booked.get(room_id, ())
+                if booked_start < end and booked_end > start
+            ]
+            if conflicts:
+                _reject(q, None, conflicts)
+                continue
+            try:
+                statuses[q.id] = tracker.admit(
+                    q.user_id, q.booking_type, start, end,
+                    initial_booking_status(q.booking_type, start, end, len(rooms)),
+                )
+            except QuotaExceeded as e:
+                _reject(q, str(e))
+                continue
+            for room_id in rooms:
+                booked.setdefault(room_id, []).append((start, end))
+            to_book.append(q)
+
+        bookings = Booking.objects.using(PRIMARY).bulk_create_with_rooms(
+            [
+                Booking(
+                    user_id=q.user_id,
+                    start_datetime=q.start_datetime,
+                    end_datetime=q.end_datetime,
+                    booking_type=q.booking_type,
+                    status=statuses[q.id],
+                )
+                for q in to_book
+            ],
+            [set(q.room_ids) for q in to_book],
+        )
+        for q, booking in zip(to_book, bookings):
+            q.status = 'Booked'
+            q.booking = booking
+        QueuedBooking.objects.using(PRIMARY).bulk_update(queued, ['status', 'booking', 'result', 'processed_at'])
+
+    _send_confirmations(bookings)
+    return queued, bookings
+
+
+def _send_confirmations(bookings):
+    if not bookings:
+        return
+    # Load users, rooms and floors once for all the emails
+    prefetch_related_objects(bookings, 'user', 'rooms__floor')
+    from .email_utils import send_booking_creation_email
+    for booking in bookings:
+        try:
+            send_booking_creation_email(booking)
+        except Exception as e:
+            logger.error(f"Failed to send booking creation email for queued booking {booking.id}: {str(e)}")
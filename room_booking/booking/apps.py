@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class BookingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'booking'
+
+    def ready(self):
+        # cache_utils and partitioning register system checks
+        from . import cache_utils, middleware, partitioning, slow_queries  # noqa: F401
+        slow_queries.install()
+        middleware.install_query_stats()
+        post_migrate.connect(
+            partitioning.install_triggers_after_migrate, sender=self, dispatch_uid='booking.partitioning.triggers'
+        )
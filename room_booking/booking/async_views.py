@@ -0,0 +1,191 @@
+"""
+Async versions of the read-heavy booking endpoints
+
+DRF's APIView is synchronous, so these are plain Django async views that reproduce the
+behaviour of CheckAvailabilityView, FloorListView, RoomListView and MyBookingView using
+the async ORM. They are routed under /api/async/ and return the same JSON bodies.
+
+Served by an ASGI server (see room_booking/asgi.py), a worker keeps handling other
+requests while one of these waits on authentication or the database. Under WSGI they
+still work, but Django runs each one on its own event loop, so there is no gain.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .coalescing import acoalesce
+from .db_router import is_pinned_to_primary, start_replica_reads, stop_replica_reads
+from .models import Booking, Floor, Room
+from .serializers import BookingSerializer, FloorSerializer, RoomOccupancySerializer, RoomSerializer
+from .throttling import availability_cost
+from .views import (
+    AvailabilityParamError, availability_key, availability_queryset, compute_availability, parse_availability_params,
+    wants_occupancy,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of APIView: JWT authentication, the default DRF throttles
+    (including the X-RateLimit-* headers of CostWeightedThrottle) and JSON error bodies
+    in the same {"detail": ...} shape. With use_replica set, GET requests read from the
+    replica like ReplicaReadMixin views.
+    """
+    require_authentication = True
+    use_replica = False
+    throttle_cost = 1
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Response headers set by the throttles, like APIView.headers
+        self.headers = {}
+        response = await self._dispatch(request, *args, **kwargs)
+        for key, value in self.headers.items():
+            response[key] = value
+        return response
+
+    async def _dispatch(self, request, *args, **kwargs):
+        try:
+            result = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except (InvalidToken, AuthenticationFailed) as e:
+            response = JsonResponse(e.detail if isinstance(e.detail, dict) else {'detail': e.detail}, status=401)
+            response['WWW-Authenticate'] = 'Bearer realm="api"'
+            return response
+        request.user = result[0] if result else AnonymousUser()
+
+        if self.require_authentication and not request.user.is_authenticated:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+        wait = await sync_to_async(self.check_throttles)(request)
+        if wait is not None:
+            response = JsonResponse({'detail': 'Request was throttled.'}, status=429)
+            response['Retry-After'] = str(int(wait))
+            return response
+
+        token = None
+        self.pinned_to_primary = False
+        if self.use_replica and request.method in ('GET', 'HEAD'):
+            self.pinned_to_primary = await sync_to_async(is_pinned_to_primary)(request.user)
+            if not self.pinned_to_primary:
+                token = start_replica_reads()
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        finally:
+            if token is not None:
+                stop_replica_reads(token)
+
+    def check_throttles(self, request):
+        """Seconds to wait if any DEFAULT_THROTTLE_CLASSES throttle refuses the request, else None"""
+        waits = []
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, self):
+                waits.append(throttle.wait() or 0)
+        return max(waits) if waits else None
+
+
+class AsyncCheckAvailabilityView(AsyncAPIView):
+    """Async version of CheckAvailabilityView"""
+    use_replica = True
+
+    def get_throttle_cost(self, request):
+        return availability_cost(request.GET)
+
+    async def get(self, request):
+        try:
+            try:
+                date_str, check_date, room_ids = parse_availability_params(request.GET)
+            except AvailabilityParamError as e:
+                return JsonResponse({'detail': str(e)}, status=400)
+
+            async def compute():
+                bookings = [booking async for booking in availability_queryset(check_date, room_ids)]
+                return compute_availability(date_str, check_date, room_ids, bookings)
+
+            # Users who just wrote get a fresh computation; everyone else shares one
+            if self.pinned_to_primary:
+                return JsonResponse(await compute())
+            return JsonResponse(await acoalesce(availability_key(date_str, room_ids), compute))
+        except (ValueError, TypeError, AttributeError) as e:
+            return JsonResponse({'detail': f"Invalid input: {str(e)}"}, status=400)
+        except Exception as e:
+            logger.error(f"Error checking availability: {str(e)}", exc_info=True)
+            return JsonResponse(
+                {'detail': "An error occurred while checking availability. Please try again later."},
+                status=500,
+            )
+
+
+class AsyncFloorListView(AsyncAPIView):
+    """Async version of FloorListView"""
+    use_replica = True
+    require_authentication = False  # Anyone can view floors
+
+    async def get(self, request):
+        try:
+            floors = [floor async for floor in Floor.objects.all()]
+            return JsonResponse(FloorSerializer(floors, many=True).data, safe=False)
+        except Exception as e:
+            logger.error(f"Error fetching floors: {str(e)}", exc_info=True)
+            return JsonResponse(
+                {'detail': "An error occurred while fetching floors. Please try again later."},
+                status=500,
+            )
+
+
+class AsyncRoomListView(AsyncAPIView):
+    """Async version of RoomListView"""
+    use_replica = True
+    require_authentication = False  # Anyone can view rooms
+
+    def get_throttle_cost(self, request):
+        return 2 if wants_occupancy(request.GET) else 1
+
+    async def get(self, request):
+        try:
+            rooms = Room.objects.select_related('floor')
+            floor_id = request.GET.get('floor', None)
+            if floor_id:
+                try:
+                    floor_id = int(floor_id)
+                except (ValueError, TypeError):
+                    return JsonResponse({'detail': "Invalid floor ID format."}, status=400)
+                if not await Floor.objects.filter(id=floor_id).aexists():
+                    return JsonResponse({'detail': f"Floor with id {floor_id} does not exist."}, status=404)
+                rooms = rooms.filter(floor_id=floor_id)
+            serializer_class = RoomSerializer
+            if wants_occupancy(request.GET):
+                rooms = rooms.with_occupancy(timezone.now())
+                serializer_class = RoomOccupancySerializer
+            rooms = [room async for room in rooms]
+            return JsonResponse(serializer_class(rooms, many=True).data, safe=False)
+        except Exception as e:
+            logger.error(f"Error fetching rooms: {str(e)}", exc_info=True)
+            return JsonResponse(
+                {'detail': "An error occurred while fetching rooms. Please try again later."},
+                status=500,
+            )
+
+
+class AsyncMyBookingView(AsyncAPIView):
+    """Async version of MyBookingView"""
+    use_replica = True
+    throttle_cost = 2
+
+    async def get(self, request):
+        try:
+            bookings = Booking.objects.select_related('user').prefetch_related('rooms', 'rooms__floor').filter(user=request.user)
+            bookings = [booking async for booking in bookings]
+            return JsonResponse(BookingSerializer(bookings, many=True).data, safe=False)
+        except Exception as e:
+            logger.error(f"Error fetching user bookings: {str(e)}", exc_info=True)
+            return JsonResponse(
+                {'detail': "An error occurred while fetching your bookings. Please try again later."},
+                status=500,
+            )
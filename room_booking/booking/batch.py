@@ -0,0 +1,214 @@
+"""
+Batch booking creation
+
+BatchCreateBookingView (bookings/batch/) takes many bookings in one request, e.g. a
+mentor's sessions for a whole term. Instead of running the create_booking/ checks once
+per slot, create_batch():
+
+- validates every item without touching the database (same rules as create_booking/),
+- resolves all rooms and floors in one query,
+- rejects items that overlap an earlier item of the same batch,
+- checks the remaining items against existing bookings and series in one query each,
+- checks the weekly quota (booking/quotas.py) with one read of the user's counters,
+- inserts the bookings with one bulk_create and their room links with another.
+
+In all-or-nothing mode a single failed item means nothing is created; in best-effort
+mode the valid items are created and each failure is reported next to them.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .datetime_utils import parse_local_datetime
+from .db_router import PRIMARY
+from .models import Booking, Room
+from .quotas import QuotaExceeded, WeeklyUsageTracker
+from .serializers import CAMP_BOOKING_ROLES, booking_window_error, initial_booking_status
+from .series import find_conflicts
+from datetime import timedelta
+
+MODE_ALL_OR_NOTHING = 'all_or_nothing'
+MODE_BEST_EFFORT = 'best_effort'
+MODES = (MODE_ALL_OR_NOTHING, MODE_BEST_EFFORT)
+
+
+class BatchItem:
+    """One requested booking and, once checked, why it can't be created"""
+
+    def __init__(self, index):
+        self.index = index
+        self.room_ids = set()
+        self.floor_id = None
+        self.start = None
+        self.end = None
+        self.booking_type = 'regular'
+        self.status = None
+        self.error = None
+        self.conflicts = []
+        self.booking = None
+
+    def fail(self, message):
+        if self.error is None:
+            self.error = message
+
+    def result(self):
+        if self.booking is not None:
+            return {'index': self.index, 'status': 'created', 'booking_id': self.booking.id}
+        if self.error is None:
+            return {
+                'index': self.index,
+                'status': 'not_created',
+                'detail': "Not created because other items in the batch failed.",
+            }
+        result = {'index': self.index, 'status': 'failed', 'detail': self.error}
+        if self.conflicts:
+            result['conflicts'] = self.conflicts
+        return result
+
+
+def parse_item(index, data, user, now):
+    """BatchItem for one request item, with the checks that don't need the database"""
+    item = BatchItem(index)
+    if not isinstance(data, dict):
+        item.fail("Each item must be an object.")
+        return item
+
+    room_ids = data.get('room_ids') or []
+    try:
+        if not isinstance(room_ids, list):
+            raise TypeError
+        item.room_ids = {int(room_id) for room_id in room_ids}
+        item.floor_id = int(data['floor_id']) if data.get('floor_id') else None
+    except (TypeError, ValueError):
+        item.fail("Invalid room_ids or floor_id.")
+        return item
+    if not item.room_ids and not item.floor_id:
+        item.fail("Either room(s) or a floor must be selected.")
+
+    item.booking_type = data.get('booking_type') or 'regular'
+    if item.booking_type not in ('regular', 'camp'):
+        item.fail("booking_type must be 'regular' or 'camp'.")
+    elif item.booking_type == 'camp' and user.role not in CAMP_BOOKING_ROLES:
+        item.fail("Only mentors, coordinators, and admins can book camps.")
+
+    if not data.get('start_datetime') or not data.get('end_datetime'):
+        item.fail("Both start_datetime and end_datetime are required.")
+        return item
+    try:
+        item.start = parse_local_datetime(data['start_datetime'])
+        item.end = parse_local_datetime(data['end_datetime'])
+    except (ValueError, AttributeError) as e:
+        item.fail(f"Invalid datetime format. Use YYYY-MM-DDTHH:MM:SS. Error: {str(e)}")
+        return item
+
+    window_error = booking_window_error(item.booking_type, item.start, item.end, now)
+    if window_error:
+        item.fail(window_error)
+    max_span_days = getattr(settings, 'BOOKING_MAX_SPAN_DAYS', None)
+    if max_span_days and item.end - item.start > timedelta(days=max_span_days):
+        item.fail(f"Bookings cannot span more than {max_span_days} days.")
+    return item
+
+
+def resolve_rooms(items):
+    """Expand floors to their rooms and reject unknown rooms, with one query for the batch"""
+    room_ids = set().union(*(item.room_ids for item in items))
+    floor_ids = {item.floor_id for item in items if item.floor_id}
+    if not room_ids and not floor_ids:
+        return
+    known_rooms = set()
+    rooms_by_floor = {}
+    for room_id, floor_id in Room.objects.filter(Q(id__in=room_ids) | Q(floor_id__in=floor_ids)).values_list('id', 'floor_id'):
+        known_rooms.add(room_id)
+        rooms_by_floor.setdefault(floor_id, set()).add(room_id)
+
+    for item in items:
+        if item.error:
+            continue
+        if item.room_ids - known_rooms:
+            item.fail("Some rooms are invalid.")
+        elif item.floor_id:
+            if item.floor_id not in rooms_by_floor:
+                item.fail(f"Floor with id {item.floor_id} does not exist or has no rooms.")
+            else:
+                item.room_ids |= rooms_by_floor[item.floor_id]
+
+
+def reject_batch_overlaps(items):
+    """Fail items that overlap an earlier valid item of the batch in any room"""
+    accepted = {}  # room id -> [(start, end, index)]
+    for item in items:
+        if item.error:
+            continue
+        clash = next(
+            (
+                index
+                for room_id in item.room_ids
+                for start, end, index in accepted.get(room_id, ())
+                if start < item.end and end > item.start
+            ),
+            None,
+        )
+        if clash is not None:
+            item.fail(f"Overlaps item {clash} of this batch.")
+            continue
+        for room_id in item.room_ids:
+            accepted.setdefault(room_id, []).append((item.start, item.end, item.index))
+
+
+def reject_existing_conflicts(items):
+    """Fail items that overlap an active booking or series, with one query for the whole batch"""
+    candidates = [item for item in items if not item.error]
+    conflicts = find_conflicts([(item.room_ids, item.start, item.end) for item in candidates])
+    for item, found in zip(candidates, conflicts):
+        if found:
+            item.conflicts = found
+            item.fail("Some rooms are already booked during the requested time.")
+
+
+def apply_weekly_quota(items, user):
+    """Set each valid item's status, failing those past the weekly limit, in request order"""
+    candidates = [item for item in items if not item.error]
+    tracker = WeeklyUsageTracker({user.id: user.role}, [(user.id, item.booking_type, item.start) for item in candidates])
+    for item in candidates:
+        status = initial_booking_status(item.booking_type, item.start, item.end, len(item.room_ids))
+        try:
+            item.status = tracker.admit(user.id, item.booking_type, item.start, item.end, status)
+        except QuotaExceeded as e:
+            item.fail(str(e))
+
+
+def create_batch(user, raw_items, mode=MODE_ALL_OR_NOTHING):
+    """
+    Validate and create a batch of bookings for user. Returns the BatchItems in request
+    order; created ones have .booking set (rooms not loaded).
+    """
+    now = timezone.now()
+    items = [parse_item(index, data, user, now) for index, data in enumerate(raw_items)]
+    resolve_rooms(items)
+    reject_batch_overlaps(items)
+
+    # Check and insert in one transaction, like create_booking/
+    with transaction.atomic(using=PRIMARY):
+        reject_existing_conflicts(items)
+        apply_weekly_quota(items, user)
+        to_create = [item for item in items if not item.error]
+        if not to_create or (mode == MODE_ALL_OR_NOTHING and len(to_create) < len(items)):
+            return items
+
+        bookings = [
+            Booking(
+                user=user,
+                start_datetime=item.start,
+                end_datetime=item.end,
+                booking_type=item.booking_type,
+                status=item.status,
+            )
+            for item in to_create
+        ]
+        bookings = Booking.objects.using(PRIMARY).bulk_create_with_rooms(
+            bookings, [item.room_ids for item in to_create]
+        )
+        for item, booking in zip(to_create, bookings):
+            item.booking = booking
+    return items
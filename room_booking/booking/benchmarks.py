@@ -0,0 +1,149 @@
+"""
+Helpers shared by the benchmark management commands (bench_booking, load_test, replay_traffic)
+"""
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+import asyncio
+import threading
+import time
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, elapsed):
+    """Latency percentiles (ms) and throughput for a list of per-call durations in seconds"""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        'count': count,
+        'mean_ms': (sum(ordered) / count * 1000) if count else 0.0,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'max_ms': (ordered[-1] * 1000) if count else 0.0,
+        'rps': count / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def format_summary(label, summary):
+    return (
+        f"{label:<34} n={summary['count']:<6} mean={summary['mean_ms']:8.2f}ms "
+        f"p50={summary['p50_ms']:8.2f}ms p95={summary['p95_ms']:8.2f}ms "
+        f"p99={summary['p99_ms']:8.2f}ms {summary['rps']:9.1f}/s"
+    )
+
+
+def time_callable(func, iterations, warmup=10):
+    """Call func() repeatedly on this thread and summarize the per-call durations"""
+    for _ in range(warmup):
+        func()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def _record(latencies, statuses, group, result, elapsed):
+    for key in (group, 'all'):
+        latencies.setdefault(key, []).append(elapsed)
+        counts = statuses.setdefault(key, {})
+        counts[result] = counts.get(result, 0) + 1
+
+
+def run_concurrently(make_call, concurrency, total_requests=None, duration=None):
+    """
+    Run make_call(index) from `concurrency` threads until total_requests calls have been
+    made or `duration` seconds have passed. make_call returns a (group, status) pair, e.g.
+    ('check-availability', 200); an exception counts as status <ExceptionName>.
+
+    Returns ({group: summary}, {group: {status: count}}), with every call also under 'all'.
+    """
+    lock = threading.Lock()
+    state = {'next': 0}
+    latencies = {}
+    statuses = {}
+    deadline = time.perf_counter() + duration if duration else None
+
+    def claim():
+        with lock:
+            if total_requests is not None and state['next'] >= total_requests:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            state['next'] += 1
+            return state['next'] - 1
+
+    def worker():
+        try:
+            while True:
+                index = claim()
+                if index is None:
+                    return
+                call_started = time.perf_counter()
+                try:
+                    group, result = make_call(index)
+                except Exception as e:
+                    group, result = 'error', type(e).__name__
+                elapsed = time.perf_counter() - call_started
+                with lock:
+                    _record(latencies, statuses, group, result, elapsed)
+        finally:
+            # Each worker thread opened its own database connection
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - started
+    return {group: summarize(values, elapsed) for group, values in latencies.items()}, statuses
+
+
+def run_concurrently_async(make_call, concurrency, total_requests=None, duration=None):
+    """
+    Async counterpart of run_concurrently: `concurrency` coroutines on one event loop (one
+    ASGI worker) await make_call(index). Each call runs in its own ThreadSensitiveContext,
+    as ASGIHandler does for a real request, and closes its database connection afterwards.
+    """
+    latencies = {}
+    statuses = {}
+    state = {'next': 0}
+
+    async def worker(deadline):
+        while True:
+            if total_requests is not None and state['next'] >= total_requests:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            index = state['next']
+            state['next'] += 1
+
+            call_started = time.perf_counter()
+            async with ThreadSensitiveContext():
+                try:
+                    group, result = await make_call(index)
+                except Exception as e:
+                    group, result = 'error', type(e).__name__
+                finally:
+                    await sync_to_async(connections.close_all)()
+            _record(latencies, statuses, group, result, time.perf_counter() - call_started)
+
+    async def main():
+        deadline = time.perf_counter() + duration if duration else None
+        await asyncio.gather(*(worker(deadline) for _ in range(concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    return {group: summarize(values, elapsed) for group, values in latencies.items()}, statuses
@@ -0,0 +1,68 @@
+"""
+Shared cache helpers
+
+CACHES['default'] is shared by every worker (Redis, the database or the filesystem; see
+settings). DRF's throttles already use it, and everything the app caches (replica read
+pins, cached responses) should go through get_shared_cache() so counters and entries
+aren't multiplied by the number of gunicorn workers.
+
+Besides plain caching, the throttles and booking.coalescing rely on add() being atomic
+across workers, which Redis and the database cache provide and the file cache doesn't.
+`python manage.py check --deploy` warns when the default cache is per-process or
+file-based.
+"""
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+import hashlib
+
+# Longest key part used verbatim; longer ones are hashed (memcached caps keys at 250 bytes)
+MAX_KEY_PART_LENGTH = 64
+
+
+def get_shared_cache():
+    return caches[DEFAULT_CACHE_ALIAS]
+
+
+def is_process_local(cache=None):
+    """Whether a cache (default: the shared one) lives inside a single worker process"""
+    return isinstance(cache if cache is not None else get_shared_cache(), LocMemCache)
+
+
+def make_key(namespace, *parts):
+    """
+    Cache key 'namespace:part:part'. Parts with whitespace or over MAX_KEY_PART_LENGTH
+    characters are replaced by a hash so any backend accepts the key.
+    """
+    safe_parts = []
+    for part in parts:
+        part = str(part)
+        if len(part) > MAX_KEY_PART_LENGTH or any(c.isspace() for c in part):
+            part = hashlib.sha256(part.encode('utf-8')).hexdigest()[:32]
+        safe_parts.append(part)
+    return ':'.join([namespace] + safe_parts)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    cache = get_shared_cache()
+    if is_process_local(cache):
+        return [
+            Warning(
+                "The default cache is per-process (LocMemCache), so throttle counters and cached "
+                "data are kept separately by each worker.",
+                hint="Set REDIS_URL, or CACHE_BACKEND to 'database'.",
+                id='booking.W001',
+            )
+        ]
+    if isinstance(cache, FileBasedCache):
+        return [
+            Warning(
+                "The default cache is file-based: its add() isn't atomic and culling can evict live "
+                "keys, so throttle state and the cross-worker locks built on it aren't reliable.",
+                hint="Set REDIS_URL, or CACHE_BACKEND to 'database'.",
+                id='booking.W001',
+            )
+        ]
+    return []
@@ -0,0 +1,180 @@
+"""
+Request coalescing
+
+When registration opens, many users ask check_availability/ about the same rooms and date
+within the same second, and each request used to run the same queries. Identical
+computations are now shared at two levels:
+
+- within a worker, single-flight: the first request for a key computes it and concurrent
+  requests for the same key wait for that result instead of querying themselves
+  (threads in the WSGI workers, coroutines on the event loop in the ASGI ones);
+- across workers, a short-lived lock in the shared cache (booking.cache_utils): the worker
+  holding it computes and publishes the result in the cache for COALESCE_SECONDS, and the
+  others poll for it rather than recomputing. If the lock holder fails or takes longer
+  than COALESCE_LOCK_SECONDS, the waiters compute it themselves.
+
+A published result can be up to COALESCE_SECONDS old, much like a replica read. Views skip
+coalescing for users pinned to the primary after their own write (db_router), so they
+always see their change. COALESCE_SECONDS = 0 turns the cross-worker part off.
+"""
+from django.conf import settings
+from .cache_utils import get_shared_cache, make_key
+import asyncio
+import threading
+import time
+import weakref
+
+# How often a worker waiting on another worker's computation checks the cache
+POLL_SECONDS = 0.05
+
+
+class _Call:
+    """One in-flight computation that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run one computation per key at a time in this process; concurrent callers share it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        # Futures belong to one event loop, so async calls are tracked per loop
+        self._async_calls = weakref.WeakKeyDictionary()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, key, fn):
+        """Async do(): fn is a coroutine function"""
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.setdefault(loop, {})
+        future = calls.get(key)
+        if future is not None:
+            try:
+                # shield: one waiter being cancelled mustn't cancel the shared computation
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The computing request was cancelled (client gone), not this one
+                return await fn()
+
+        future = calls[key] = loop.create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody waited on isn't logged as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del calls[key]
+
+
+single_flight = SingleFlight()
+
+
+def _cache_keys(key):
+    return make_key('coalesce', key), make_key('coalesce-lock', key)
+
+
+def _shared_compute(key, fn):
+    ttl = settings.COALESCE_SECONDS
+    if ttl <= 0:
+        return fn()
+    cache = get_shared_cache()
+    result_key, lock_key = _cache_keys(key)
+    result = cache.get(result_key)
+    if result is not None:
+        return result
+
+    if cache.add(lock_key, True, settings.COALESCE_LOCK_SECONDS):
+        try:
+            result = fn()
+            cache.set(result_key, result, ttl)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + settings.COALESCE_LOCK_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(POLL_SECONDS)
+        result = cache.get(result_key)
+        if result is not None:
+            return result
+        if cache.get(lock_key) is None:
+            break  # The lock holder failed without publishing
+    return fn()
+
+
+async def _ashared_compute(key, fn):
+    ttl = settings.COALESCE_SECONDS
+    if ttl <= 0:
+        return await fn()
+    cache = get_shared_cache()
+    result_key, lock_key = _cache_keys(key)
+    result = await cache.aget(result_key)
+    if result is not None:
+        return result
+
+    if await cache.aadd(lock_key, True, settings.COALESCE_LOCK_SECONDS):
+        try:
+            result = await fn()
+            await cache.aset(result_key, result, ttl)
+            return result
+        finally:
+            await cache.adelete(lock_key)
+
+    deadline = time.monotonic() + settings.COALESCE_LOCK_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_SECONDS)
+        result = await cache.aget(result_key)
+        if result is not None:
+            return result
+        if await cache.aget(lock_key) is None:
+            break  # The lock holder failed without publishing
+    return await fn()
+
+
+def coalesce(key, fn):
+    """
+    fn() (which must not return None), shared with identical concurrent calls in this
+    worker and, through the shared cache, in the other workers
+    """
+    return single_flight.do(key, lambda: _shared_compute(key, fn))
+
+
+async def acoalesce(key, fn):
+    """Async coalesce(): fn is a coroutine function"""
+    return await single_flight.ado(key, lambda: _ashared_compute(key, fn))
@@ -0,0 +1,53 @@
+"""
+Response compression helpers shared by the React shell and ApiCompressionMiddleware
+
+gzip always works; brotli is used when the optional brotli package is installed.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def accepted_encodings(header):
+    """Content codings a client accepts from its Accept-Encoding header (q=0 excluded)"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    if '*' in accepted:
+        accepted.update(ENCODINGS)
+    return accepted
+
+
+def choose_encoding(accept_encoding, available=ENCODINGS):
+    """Best encoding in `available` that the client accepts, or None for identity"""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ENCODINGS:
+        if encoding in available and encoding in accepted:
+            return encoding
+    return None
+
+
+def compress(content, encoding, level=None):
+    """content compressed with encoding ('gzip' or 'br'); level None = the codec's maximum"""
+    if encoding == 'br':
+        return brotli.compress(content, quality=11 if level is None else level)
+    return gzip.compress(content, compresslevel=9 if level is None else level, mtime=0)
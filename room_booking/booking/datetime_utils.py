@@ -0,0 +1,73 @@
+"""
+Datetime parsing and local (America/New_York) time helpers for the booking API
+
+The frontend sends naive wall-clock times ('2025-03-09T14:00:00', or without seconds from
+a datetime-local input) that mean local time. Clients may also send ISO 8601 values with
+'Z' or an offset, which are converted to local time.
+
+DST: a wall time that happens twice (November fall back) resolves to its first, EDT,
+occurrence; one that doesn't exist (March spring forward) is read with the EST offset, so
+02:30 becomes 03:30 EDT. This matches the pytz localize(is_dst=True/False) fallbacks the
+views used before.
+"""
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+import re
+
+LOCAL_TZ = ZoneInfo('America/New_York')
+
+# The two shapes the frontend sends; everything else goes through fromisoformat
+_LOCAL_DATETIME_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})T(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?$')
+_DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})$')
+
+
+def localize(naive):
+    """Attach the local zone to a naive wall-clock datetime (see the module docstring for DST)"""
+    # fold=0 picks the first occurrence of a repeated time and the pre-transition offset
+    # for a skipped one
+    return naive.replace(tzinfo=LOCAL_TZ, fold=0)
+
+
+def parse_local_datetime(value):
+    """
+    Aware local datetime for an API datetime string. Raises ValueError for anything that
+    isn't a valid ISO 8601 datetime (AttributeError if value isn't a string).
+    """
+    match = _LOCAL_DATETIME_RE.match(value)
+    if match:
+        year, month, day, hour, minute, second = match.groups(default='0')
+        return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), tzinfo=LOCAL_TZ)
+
+    # Python < 3.11 fromisoformat doesn't accept 'Z'
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        return localize(parsed)
+    return parsed.astimezone(LOCAL_TZ)
+
+
+def parse_date(value):
+    """date for a 'YYYY-MM-DD' string; raises ValueError"""
+    match = _DATE_RE.match(value)
+    if not match:
+        raise ValueError(f"Invalid date: {value!r}")
+    year, month, day = match.groups()
+    return datetime(int(year), int(month), int(day)).date()
+
+
+def to_local(value):
+    """An aware datetime converted to local time"""
+    return value.astimezone(LOCAL_TZ)
+
+
+def local_day_bounds(day):
+    """(first, last) aware local instants of a calendar date"""
+    return localize(datetime.combine(day, time.min)), localize(datetime.combine(day, time.max))
+
+
+def local_hour_slots(day, hours):
+    """[(hour, start, end)] one-hour local slots on a date, for each hour in hours"""
+    slots = []
+    for hour in hours:
+        start = localize(datetime.combine(day, time(hour)))
+        slots.append((hour, start, start + timedelta(hours=1)))
+    return slots
@@ -0,0 +1,95 @@
+"""
+Read-replica routing
+
+When REPLICA_DATABASE_URL is set, settings adds a 'replica' database and installs
+PrimaryReplicaRouter. Reads go to the primary unless a view opts in: views using
+ReplicaReadMixin (and the async views with use_replica = True) read from the replica
+for GET/HEAD requests. Writes, and every read outside those views, stay on the primary.
+
+After a user's own write, ReplicaStickinessMiddleware pins them to the primary for
+REPLICA_STICKY_SECONDS so they read their writes despite replication lag. Pins live in
+the shared cache (booking.cache_utils), so every worker sees them.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from .cache_utils import get_shared_cache, make_key
+
+PRIMARY = DEFAULT_DB_ALIAS
+REPLICA = 'replica'
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _pin_key(user):
+    return make_key('db-primary-pin', user.pk)
+
+
+def pin_to_primary(user):
+    """Send this user's reads to the primary for the next REPLICA_STICKY_SECONDS"""
+    get_shared_cache().set(_pin_key(user), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return user is not None and user.is_authenticated and get_shared_cache().get(_pin_key(user), False)
+
+
+def start_replica_reads():
+    """Route reads in the current context to the replica; returns a token for stop_replica_reads"""
+    return _read_from_replica.set(replica_configured())
+
+
+def stop_replica_reads(token):
+    _read_from_replica.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    token = start_replica_reads()
+    try:
+        yield
+    finally:
+        stop_replica_reads(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # DatabaseCache entries are written to the primary, so read them back from there
+        if model._meta.app_label == 'django_cache':
+            return PRIMARY
+        return REPLICA if _read_from_replica.get() else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaReadMixin:
+    """
+    APIView mixin: serve GET/HEAD from the replica unless the user was pinned to the
+    primary by a recent write. Authentication still reads from the primary.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.pinned_to_primary = is_pinned_to_primary(request.user)
+        if request.method in ('GET', 'HEAD') and not self.pinned_to_primary:
+            self._replica_token = start_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            stop_replica_reads(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
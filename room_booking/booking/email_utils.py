@@ -6,11 +6,34 @@ from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
+from . import metrics
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+def _send_mail(kind, **kwargs):
+    """send_mail() that records how long the SMTP round trip took"""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        result = send_mail(**kwargs)
+        outcome = 'ok'
+        return result
+    finally:
+        metrics.observe('email_send_duration_seconds', time.perf_counter() - start, kind=kind, outcome=outcome)
+
+
+def _room_names(booking):
+    """Comma-separated room list, using prefetched rooms when the caller already loaded them"""
+    if 'rooms' in getattr(booking, '_prefetched_objects_cache', {}):
+        rooms = booking.rooms.all()
+    else:
+        rooms = booking.rooms.select_related('floor')
+    return ', '.join([f"{room.name} (Floor {room.floor.name})" for room in rooms])
+
+
 def is_email_configured():
     """Check if email is properly configured"""
     return (
@@ -49,7 +72,8 @@ Best regards,
 Grand River Friendship Society
         """
         
-        send_mail(
+        _send_mail(
+            'account_created',
             subject=subject,
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -98,7 +122,8 @@ Best regards,
 Grand River Friendship Society
             """
         
-        send_mail(
+        _send_mail(
+            'account_approval',
             subject=subject,
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -118,8 +143,7 @@ def send_booking_creation_email(booking):
     
     try:
         user = booking.user
-        rooms = booking.rooms.all()
-        room_names = ', '.join([f"{room.name} (Floor {room.floor.name})" for room in rooms])
+        room_names = _room_names(booking)
         
         # Format datetime
         start_str = booking.start_datetime.strftime('%B %d, %Y at %I:%M %p') if booking.start_datetime else 'N/A'
@@ -149,7 +173,8 @@ Best regards,
 Grand River Friendship Society
         """
         
-        send_mail(
+        _send_mail(
+            'booking_created',
             subject=subject,
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -161,6 +186,99 @@ Grand River Friendship Society
         logger.error(f"Failed to send booking creation email: {str(e)}")
 
 
+def send_batch_booking_creation_email(user, bookings):
+    """Send one email confirming every booking created by a batch request"""
+    if not is_email_configured():
+        logger.warning(f"Email not configured. Skipping batch booking email for {len(bookings)} bookings")
+        return
+
+    try:
+        lines = []
+        for booking in bookings:
+            start_str = booking.start_datetime.strftime('%B %d, %Y at %I:%M %p')
+            end_str = booking.end_datetime.strftime('%B %d, %Y at %I:%M %p')
+            lines.append(f"- {_room_names(booking)}: {start_str} to {end_str} ({booking.status})")
+        pending_count = sum(1 for booking in bookings if booking.status == "Pending")
+
+        subject = f'GRFS Booking Confirmation - {len(bookings)} Bookings'
+        message = f"""
+Hello {user.first_name or user.username},
+
+{len(bookings)} room bookings have been created successfully!
+
+Bookings:
+{chr(10).join(lines)}
+
+{f"{pending_count} of them are pending approval. You will receive an email once each has been reviewed." if pending_count else "All of them have been automatically approved!"}
+
+You can view and manage your bookings at: {settings.SITE_URL}/dashboard
+
+If you need to make changes or cancel a booking, please do so through the dashboard.
+
+Best regards,
+Grand River Friendship Society
+        """
+
+        _send_mail(
+            'booking_batch_created',
+            subject=subject,
+            message=message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[user.email],
+            fail_silently=False,
+        )
+        logger.info(f"Batch booking email sent to {user.email} for {len(bookings)} bookings")
+    except Exception as e:
+        logger.error(f"Failed to send batch booking email: {str(e)}")
+
+
+def send_waitlist_booking_email(booking):
+    """Send email when a cancellation let the user's waitlist entry be booked"""
+    if not is_email_configured():
+        logger.warning(f"Email not configured. Skipping waitlist booking email for booking {booking.id}")
+        return
+
+    try:
+        user = booking.user
+        room_names = _room_names(booking)
+        start_str = booking.start_datetime.strftime('%B %d, %Y at %I:%M %p')
+        end_str = booking.end_datetime.strftime('%B %d, %Y at %I:%M %p')
+
+        subject = 'GRFS Booking Confirmation - From Your Waitlist'
+        message = f"""
+Hello {user.first_name or user.username},
+
+Good news! A room you were on the waitlist for became free, and we have booked it for you.
+
+Booking Details:
+- Rooms: {room_names}
+- Start Time: {start_str}
+- End Time: {end_str}
+- Status: {booking.status}
+
+{"Your booking is pending approval. You will receive an email once it has been reviewed." if booking.status == "Pending" else "Your booking has been automatically approved!"}
+
+You can view and manage your bookings at: {settings.SITE_URL}/dashboard
+
+If you no longer need the room, please cancel the booking through the dashboard so the next person on the waitlist can have it.
+
+Best regards,
+Grand River Friendship Society
+        """
+
+        _send_mail(
+            'waitlist_booked',
+            subject=subject,
+            message=message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[user.email],
+            fail_silently=False,
+        )
+        logger.info(f"Waitlist booking email sent to {user.email} for booking {booking.id}")
+    except Exception as e:
+        logger.error(f"Failed to send waitlist booking email: {str(e)}")
+
+
 def send_booking_update_email(booking, updated_by_admin=False, old_data=None):
     """Send email when a booking is updated"""
     if not is_email_configured():
@@ -169,8 +287,7 @@ def send_booking_update_email(booking, updated_by_admin=False, old_data=None):
     
     try:
         user = booking.user
-        rooms = booking.rooms.all()
-        room_names = ', '.join([f"{room.name} (Floor {room.floor.name})" for room in rooms])
+        room_names = _room_names(booking)
         
         # Format datetime
         start_str = booking.start_datetime.strftime('%B %d, %Y at %I:%M %p') if booking.start_datetime else 'N/A'
@@ -215,7 +332,8 @@ Best regards,
 Grand River Friendship Society
         """
         
-        send_mail(
+        _send_mail(
+            'booking_updated',
             subject=subject,
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -235,8 +353,7 @@ def send_booking_cancellation_email(booking, cancelled_by_admin=False):
     
     try:
         user = booking.user
-        rooms = booking.rooms.all()
-        room_names = ', '.join([f"{room.name} (Floor {room.floor.name})" for room in rooms])
+        room_names = _room_names(booking)
         
         # Format datetime
         start_str = booking.start_datetime.strftime('%B %d, %Y at %I:%M %p') if booking.start_datetime else 'N/A'
@@ -264,7 +381,8 @@ Best regards,
 Grand River Friendship Society
         """
         
-        send_mail(
+        _send_mail(
+            'booking_cancelled',
             subject=subject,
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -284,8 +402,7 @@ def send_booking_reminder_email(booking):
     
     try:
         user = booking.user
-        rooms = booking.rooms.all()
-        room_names = ', '.join([f"{room.name} (Floor {room.floor.name})" for room in rooms])
+        room_names = _room_names(booking)
         
         # Format datetime
         start_str = booking.start_datetime.strftime('%B %d, %Y at %I:%M %p') if booking.start_datetime else 'N/A'
@@ -321,7 +438,8 @@ Best regards,
 Grand River Friendship Society
         """
         
-        send_mail(
+        _send_mail(
+            'booking_reminder',
             subject=subject,
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
@@ -0,0 +1,144 @@
+"""
+Floor availability heatmap
+
+For every time bucket across a date range, how many rooms on a floor are free: what a
+user booking a whole floor (floor_id in create_booking/) would otherwise piece together
+from check_availability/ room by room. The counting happens in the database, so no Python
+loop runs over the bookings:
+
+- PostgreSQL: the buckets come from generate_series over local wall-clock time (so
+  buckets stay aligned across DST changes) and are LEFT JOINed against the floor's
+  booked ranges, with COUNT(DISTINCT room) per bucket.
+- Other databases: one aggregate query with a COUNT(DISTINCT room) FILTER column per
+  bucket, with the buckets built in Python.
+
+Series occurrences beyond the materialization horizon (booking/series.py) aren't
+bookings yet and so aren't counted.
+"""
+from django.db import connections, router
+from django.db.models import Count, Q
+from .datetime_utils import LOCAL_TZ, localize
+from .models import Booking
+from datetime import datetime, time, timedelta
+
+BUCKET_MINUTES = (15, 30, 60, 120, 240, 1440)
+DEFAULT_BUCKET_MINUTES = 60
+MAX_DAYS = 31
+MAX_BUCKETS = 1000
+# Sub-day buckets cover the bookable hours only (8 AM to midnight, as in find_slots/)
+OPEN_HOUR = 8
+
+
+class HeatmapParamError(ValueError):
+    """Invalid heatmap query parameters; the message is safe to return to the client"""
+
+
+def bucket_starts(first_day, last_day, bucket_minutes):
+    """Naive local start of every bucket between two dates (inclusive)"""
+    step = timedelta(minutes=bucket_minutes)
+    starts = []
+    current = datetime.combine(first_day, time.min)
+    end = datetime.combine(last_day + timedelta(days=1), time.min)
+    while current < end:
+        if bucket_minutes >= 1440 or current.hour >= OPEN_HOUR:
+            starts.append(current)
+        current += step
+    return starts
+
+
+def check_range(first_day, last_day, bucket_minutes):
+    """Raise HeatmapParamError unless the range and bucket size are allowed"""
+    if bucket_minutes not in BUCKET_MINUTES:
+        raise HeatmapParamError(f"bucket must be one of: {', '.join(str(m) for m in BUCKET_MINUTES)} (minutes)")
+    if last_day < first_day:
+        raise HeatmapParamError("end_date must not be before start_date")
+    if (last_day - first_day).days + 1 > MAX_DAYS:
+        raise HeatmapParamError(f"The date range cannot be longer than {MAX_DAYS} days")
+    hours_per_day = 24 if bucket_minutes >= 1440 else 24 - OPEN_HOUR
+    if ((last_day - first_day).days + 1) * hours_per_day * 60 // bucket_minutes > MAX_BUCKETS:
+        raise HeatmapParamError(f"Too many buckets (at most {MAX_BUCKETS}); use larger buckets or a shorter range")
+
+
+def _booked_ranges(floor_id, range_start, range_end, using):
+    """(room_id, start, end) rows of the active bookings on the floor overlapping the range"""
+    return Booking.rooms.through.objects.using(using).filter(
+        room__floor_id=floor_id,
+        booking__in=Booking.objects.using(using).active().overlapping(range_start, range_end),
+    )
+
+
+def _busy_counts_postgresql(floor_id, first_day, last_day, bucket_minutes, using):
+    booked = _booked_ranges(
+        floor_id,
+        localize(datetime.combine(first_day, time.min)),
+        localize(datetime.combine(last_day + timedelta(days=1), time.min)),
+        using,
+    ).values('room_id', 'booking__start_datetime', 'booking__end_datetime')
+    booked_sql, booked_params = booked.query.sql_with_params()
+    step = f"{bucket_minutes} minutes"
+    hour_filter = "" if bucket_minutes >= 1440 else "WHERE EXTRACT(HOUR FROM local_start) >= %s"
+    sql = f"""
+        WITH booked (room_id, start_datetime, end_datetime) AS ({booked_sql}),
+        buckets AS (
+            SELECT local_start,
+                   local_start AT TIME ZONE %s AS bucket_start,
+                   (local_start + %s::interval) AT TIME ZONE %s AS bucket_end
+            FROM generate_series(%s::timestamp, %s::timestamp, %s::interval) AS local_start
+            {hour_filter}
+        )
+        SELECT buckets.local_start, COUNT(DISTINCT booked.room_id)
+        FROM buckets
+        LEFT JOIN booked
+            ON booked.start_datetime < buckets.bucket_end AND booked.end_datetime > buckets.bucket_start
+        GROUP BY buckets.local_start
+        ORDER BY buckets.local_start
+    """
+    last_start = datetime.combine(last_day + timedelta(days=1), time.min) - timedelta(minutes=bucket_minutes)
+    params = [
+        *booked_params,
+        LOCAL_TZ.key, step, LOCAL_TZ.key,
+        datetime.combine(first_day, time.min), last_start, step,
+    ]
+    if hour_filter:
+        params.append(OPEN_HOUR)
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(local_start, busy) for local_start, busy in cursor.fetchall()]
+
+
+def _busy_counts_portable(floor_id, first_day, last_day, bucket_minutes, using):
+    starts = bucket_starts(first_day, last_day, bucket_minutes)
+    step = timedelta(minutes=bucket_minutes)
+    bounds = [(localize(start), localize(start + step)) for start in starts]
+    counts = _booked_ranges(floor_id, bounds[0][0], bounds[-1][1], using).aggregate(**{
+        f"b{index}": Count(
+            'room_id', distinct=True,
+            filter=Q(booking__start_datetime__lt=bucket_end, booking__end_datetime__gt=bucket_start),
+        )
+        for index, (bucket_start, bucket_end) in enumerate(bounds)
+    })
+    return [(start, counts[f"b{index}"]) for index, start in enumerate(starts)]
+
+
+def floor_heatmap(floor_id, total_rooms, first_day, last_day, bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """
+    [{'start', 'end', 'busy_rooms', 'free_rooms'}] for each bucket, from one query.
+    total_rooms is the number of rooms on the floor.
+    """
+    check_range(first_day, last_day, bucket_minutes)
+    using = router.db_for_read(Booking)
+    if connections[using].vendor == 'postgresql':
+        counts = _busy_counts_postgresql(floor_id, first_day, last_day, bucket_minutes, using)
+    else:
+        counts = _busy_counts_portable(floor_id, first_day, last_day, bucket_minutes, using)
+
+    step = timedelta(minutes=bucket_minutes)
+    return [
+        {
+            'start': localize(local_start).isoformat(),
+            'end': localize(local_start + step).isoformat(),
+            'busy_rooms': busy,
+            'free_rooms': max(total_rooms - busy, 0),
+        }
+        for local_start, busy in counts
+    ]
@@ -0,0 +1,153 @@
+"""
+Idempotency keys
+
+The frontend gives up on a request after 10 s (frontend/src/services/api.js) and users
+retry. create_booking/ can take that long when SMTP is slow, so a retry would run the
+conflict check, the insert and the email again. Views using IdempotentMixin accept an
+Idempotency-Key header on their write methods:
+
+- the first request with a key claims it (an IdempotencyRecord row), and its response is
+  stored when it finishes,
+- a repeat with the same key and body gets the stored response back, with an
+  Idempotent-Replayed: true header, without running the view,
+- a repeat while the first request is still running gets 409; reusing a key for a
+  different request gets 422.
+
+Keys are per user and kept for IDEMPOTENCY_KEY_TTL_HOURS. Only successful responses are
+stored: a rejected or failed request (400 and above) changed nothing, so its key is
+released and a retry runs again, rather than replaying a conflict that may have cleared.
+Expired records are deleted by `python manage.py purge_idempotency_keys` (run daily).
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from .db_router import PRIMARY
+from .models import IdempotencyRecord
+from datetime import timedelta
+import hashlib
+import json
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+# A claim whose request hasn't finished after this long is assumed lost (worker killed)
+STALE_CLAIM_SECONDS = 60
+
+
+class InvalidIdempotencyKey(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = f"{HEADER} must be between 1 and {MAX_KEY_LENGTH} characters."
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = f"A request with this {HEADER} is still being processed. Try again shortly."
+
+
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = f"This {HEADER} was already used for a different request."
+
+
+class _Replay(Exception):
+    """Raised from IdempotentMixin.initial to answer with a stored response"""
+
+    def __init__(self, record):
+        super().__init__()
+        self.record = record
+
+
+def request_fingerprint(request):
+    """sha256 of the method, path and parsed body, so formatting differences don't matter"""
+    body = json.dumps(request.data, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(f"{request.method}\n{request.get_full_path()}\n{body}".encode('utf-8')).hexdigest()
+
+
+def claim(user, key, request):
+    """
+    Record that the request with this key is running. Returns None once claimed, or the
+    finished record whose response should be replayed. Raises IdempotencyKeyInUse or
+    IdempotencyKeyMismatch.
+    """
+    now = timezone.now()
+    fields = {
+        'method': request.method,
+        'path': request.path[:255],
+        'fingerprint': request_fingerprint(request),
+        'status_code': None,
+        'response_data': None,
+        'expires_at': now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    }
+    try:
+        with transaction.atomic(using=PRIMARY):
+            IdempotencyRecord.objects.using(PRIMARY).create(user=user, key=key, **fields)
+        return None
+    except IntegrityError:
+        pass
+
+    with transaction.atomic(using=PRIMARY):
+        record = IdempotencyRecord.objects.using(PRIMARY).select_for_update().filter(user=user, key=key).first()
+        if record is None:
+            # Purged since the insert failed
+            return claim(user, key, request)
+        stale = record.status_code is None and record.created_at < now - timedelta(seconds=STALE_CLAIM_SECONDS)
+        if record.expires_at <= now or stale:
+            # Expired, or abandoned by a request that never finished: start over
+            for name, value in fields.items():
+                setattr(record, name, value)
+            record.created_at = now
+            record.save()
+            return None
+    if record.fingerprint != fields['fingerprint']:
+        raise IdempotencyKeyMismatch()
+    if record.status_code is None:
+        raise IdempotencyKeyInUse()
+    return record
+
+
+def finish(user, key, response):
+    """Store the response of a claimed request, or release the key if it didn't succeed"""
+    records = IdempotencyRecord.objects.using(PRIMARY).filter(user=user, key=key, status_code__isnull=True)
+    if response.status_code >= 400 or not isinstance(response, Response):
+        records.delete()
+    else:
+        records.update(status_code=response.status_code, response_data=response.data)
+
+
+class IdempotentMixin:
+    """
+    APIView mixin: honour the Idempotency-Key header on write requests from
+    authenticated users (see the module docstring)
+    """
+    idempotent_methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication, permissions and throttles first: a replay still counts as a request
+        super().initial(request, *args, **kwargs)
+        key = request.headers.get(HEADER)
+        if key is None or request.method not in self.idempotent_methods or not request.user.is_authenticated:
+            return
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise InvalidIdempotencyKey()
+        record = claim(request.user, key, request)
+        if record is not None:
+            raise _Replay(record)
+        self._idempotency_key = key
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _Replay):
+            response = Response(exc.record.response_data, status=exc.record.status_code)
+            response[REPLAYED_HEADER] = 'true'
+            return response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        key = getattr(self, '_idempotency_key', None)
+        if key is not None:
+            self._idempotency_key = None
+            finish(request.user, key, response)
+        return super().finalize_response(request, response, *args, **kwargs)
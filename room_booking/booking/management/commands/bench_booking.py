@@ -0,0 +1,187 @@
+"""
+Management command to microbenchmark the booking hot paths
+
+Usage:
+    python manage.py bench_booking [--iterations=500] [--page-size=100] [--seed=1]
+
+Times check_booking_conflicts and the booking/room serializers against whatever is in
+the database (run seed_bookings first for a realistic dataset) and prints mean,
+p50/p95/p99 and calls per second for each. Nothing is written to the database.
+
+The rendering benchmarks compare DRF's JSONRenderer/JSONParser with the orjson-backed
+FastJSONRenderer/FastJSONParser on a booking page and an availability response, then
+time gzip and brotli (if installed) at the levels ApiCompressionMiddleware uses and
+print the compressed sizes.
+
+The datetime benchmarks compare the pytz/strptime parsing the booking views used to do
+with booking.datetime_utils on the values a create request carries.
+"""
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from booking import compression, renderers
+from booking.datetime_utils import parse_local_datetime
+from booking.benchmarks import format_summary, time_callable
+from booking.models import Booking, Room
+from booking.renderers import FastJSONParser, FastJSONRenderer
+from booking.serializers import BookingSerializer, RoomSerializer
+from booking.views import availability_queryset, check_booking_conflicts, compute_availability
+from booking.management.commands.seed_bookings import PEAK_HOURS
+import io
+import pytz
+import random
+
+
+def legacy_parse_local_datetime(value):
+    """How CreateBookingView parsed a datetime before booking.datetime_utils, for comparison"""
+    est = pytz.timezone('America/New_York')
+    try:
+        naive = datetime.strptime(value, '%Y-%m-%dT%H:%M:%S')
+        try:
+            return est.localize(naive, is_dst=None)
+        except pytz.AmbiguousTimeError:
+            return est.localize(naive, is_dst=True)
+        except pytz.NonExistentTimeError:
+            return est.localize(naive, is_dst=False)
+    except ValueError:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return timezone.make_aware(parsed, est) if parsed.tzinfo is None else parsed.astimezone(est)
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark check_booking_conflicts and the booking serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500, help='Timed calls per benchmark (default: 500)')
+        parser.add_argument('--page-size', type=int, default=100, help='Bookings per serializer call (default: 100)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for the generated inputs')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        iterations = options['iterations']
+
+        rooms = list(Room.objects.select_related('floor'))
+        if not rooms or not Booking.objects.exists():
+            raise CommandError("No rooms or bookings found. Run `python manage.py seed_bookings` first.")
+
+        rooms_by_floor = {}
+        for room in rooms:
+            rooms_by_floor.setdefault(room.floor_id, []).append(room.id)
+        floor_rooms = list(rooms_by_floor.values())
+
+        # Pre-generate inputs so only the code under test is timed
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        hours = list(PEAK_HOURS)
+        slots = []
+        for _ in range(256):
+            candidates = rng.choice(floor_rooms)
+            start = today + timedelta(days=rng.randint(-30, 30), hours=rng.choice(hours))
+            slots.append((rng.sample(candidates, min(len(candidates), rng.choice((1, 1, 2, 3)))), start, start + timedelta(hours=rng.choice((1, 2)))))
+
+        counter = iter(range(10 ** 9))
+
+        def next_slot():
+            return slots[next(counter) % len(slots)]
+
+        def conflicts():
+            room_ids, start, end = next_slot()
+            check_booking_conflicts(room_ids, start, end)
+
+        def conflicts_iso_strings():
+            room_ids, start, end = next_slot()
+            check_booking_conflicts(room_ids, start.isoformat(), end.isoformat())
+
+        page_size = options['page_size']
+        page_queryset = Booking.objects.select_related('user').prefetch_related('rooms__floor')[:page_size]
+        page = list(page_queryset)
+
+        def serialize_page():
+            BookingSerializer(page, many=True).data
+
+        def load_and_serialize_page():
+            BookingSerializer(page_queryset.all(), many=True).data
+
+        def serialize_rooms():
+            RoomSerializer(rooms, many=True).data
+
+        def validate_booking():
+            room_ids, start, end = next_slot()
+            serializer = BookingSerializer(data={
+                'room_ids': room_ids,
+                'start_datetime': start.isoformat(),
+                'end_datetime': end.isoformat(),
+            })
+            serializer.is_valid()
+
+        # Response bodies as the views hand them to the renderer
+        page_data = BookingSerializer(page, many=True).data
+        busiest = Booking.objects.order_by('-start_datetime').first()
+        check_date = timezone.localtime(busiest.start_datetime).date()
+        all_room_ids = [room.id for room in rooms]
+        availability_data = compute_availability(
+            check_date.isoformat(), check_date, all_room_ids, list(availability_queryset(check_date, all_room_ids)),
+        )
+        page_json = JSONRenderer().render(page_data)
+        create_body = JSONRenderer().render({
+            'room_ids': slots[0][0],
+            'start_datetime': slots[0][1].isoformat(),
+            'end_datetime': slots[0][2].isoformat(),
+        })
+
+        # A create request's start and end, as the frontend sends them
+        datetime_strings = [
+            (start.strftime('%Y-%m-%dT%H:%M:%S'), end.strftime('%Y-%m-%dT%H:%M:%S')) for _, start, end in slots
+        ]
+
+        def parse_request_datetimes(parse):
+            def run():
+                start, end = datetime_strings[next(counter) % len(datetime_strings)]
+                parse(start)
+                parse(end)
+            return run
+
+        def render_with(renderer, data):
+            return lambda: renderer.render(data)
+
+        def parse_with(parser):
+            return lambda: parser.parse(io.BytesIO(create_body), parser_context={'encoding': 'utf-8'})
+
+        benchmarks = [
+            ('check_booking_conflicts', conflicts),
+            ('check_booking_conflicts (iso str)', conflicts_iso_strings),
+            (f"BookingSerializer x{len(page)} (cached)", serialize_page),
+            (f"BookingSerializer x{len(page)} (+query)", load_and_serialize_page),
+            (f"RoomSerializer x{len(rooms)}", serialize_rooms),
+            ('BookingSerializer.is_valid', validate_booking),
+            ('request datetimes (pytz/strptime)', parse_request_datetimes(legacy_parse_local_datetime)),
+            ('request datetimes (datetime_utils)', parse_request_datetimes(parse_local_datetime)),
+            (f"JSONRenderer bookings x{len(page)}", render_with(JSONRenderer(), page_data)),
+            (f"FastJSONRenderer bookings x{len(page)}", render_with(FastJSONRenderer(), page_data)),
+            (f"JSONRenderer availability x{len(rooms)}", render_with(JSONRenderer(), availability_data)),
+            (f"FastJSONRenderer availability x{len(rooms)}", render_with(FastJSONRenderer(), availability_data)),
+            ('JSONParser create body', parse_with(JSONParser())),
+            ('FastJSONParser create body', parse_with(FastJSONParser())),
+        ]
+        levels = {'gzip': settings.API_COMPRESSION_GZIP_LEVEL, 'br': settings.API_COMPRESSION_BROTLI_QUALITY}
+        for encoding in compression.ENCODINGS:
+            benchmarks.append((
+                f"{encoding} bookings x{len(page)}",
+                lambda encoding=encoding: compression.compress(page_json, encoding, levels[encoding]),
+            ))
+
+        self.stdout.write(
+            f"{Booking.objects.count()} booking(s), {len(rooms)} room(s); {iterations} iteration(s) per benchmark"
+        )
+        if renderers.orjson is None:
+            self.stdout.write("orjson is not installed; the Fast* classes fall back to DRF's JSON")
+        for label, func in benchmarks:
+            self.stdout.write(format_summary(label, time_callable(func, iterations)))
+
+        sizes = ', '.join(
+            f"{encoding} {len(compression.compress(page_json, encoding, levels[encoding]))}"
+            for encoding in compression.ENCODINGS
+        )
+        self.stdout.write(f"Booking page x{len(page)}: {len(page_json)} bytes; compressed: {sizes}")
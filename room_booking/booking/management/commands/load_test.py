@@ -0,0 +1,201 @@
+"""
+Management command to load test the booking API in-process
+
+Usage:
+    python manage.py load_test [--concurrency=8] [--requests=2000 | --duration=30]
+                               [--mix=availability=6,list=3,create=1] [--users=50]
+                               [--mode=sync|async] [--db-latency=0]
+
+Drives check_availability/, bookings/ and create_booking/ (plus floors/ and rooms/ if
+named in --mix) through Django's test client, authenticated as the users created by
+seed_bookings, and prints p50/p95/p99 latency, requests/sec and status codes per
+endpoint. No web server is needed; it runs against whatever DATABASE_URL points at
+(local SQLite or Postgres).
+
+--mode=sync runs --concurrency threads through the WSGI stack; --concurrency=1 is one
+sync gunicorn worker. --mode=async runs --concurrency coroutines on a single event loop
+through the ASGI stack against the /api/async/ views (list uses async/bookings/my, which
+returns the same bookings for non-admin users), i.e. one ASGI worker. --db-latency adds
+a delay to every query to stand in for the network round trip to a hosted database,
+which is where one async worker overtakes one sync worker.
+
+create_booking/ really writes bookings (owned by seeded users, so `seed_bookings --clear`
+removes them); 409s are conflicts with existing bookings. Emails go to the in-memory
+test backend. On SQLite, concurrent writers may fail with "database is locked".
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.db.backends.signals import connection_created
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from booking.benchmarks import format_summary, run_concurrently, run_concurrently_async
+from booking.models import Room
+from booking.management.commands.seed_bookings import PEAK_HOURS, seeded_users
+import json
+import random
+import threading
+import time
+
+ENDPOINTS = ('availability', 'list', 'create', 'floors', 'rooms')
+# endpoint -> (sync url name, async url name)
+URL_NAMES = {
+    'availability': ('check-availability', 'async-check-availability'),
+    'list': ('booking-list-create', 'async-my-bookings'),
+    'create': ('create-booking', 'create-booking'),
+    'floors': ('floor-list', 'async-floor-list'),
+    'rooms': ('room-list', 'async-room-list'),
+}
+
+
+def parse_mix(value):
+    """'availability=6,list=3,create=1' -> {'availability': 6, 'list': 3, 'create': 1}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise CommandError(f"Unknown endpoint '{name}' in --mix (choose from {', '.join(ENDPOINTS)})")
+        try:
+            mix[name] = int(weight or 1)
+        except ValueError:
+            raise CommandError(f"Invalid weight '{weight}' for '{name}' in --mix")
+    return mix
+
+
+class Command(BaseCommand):
+    help = 'Concurrent in-process load test of the booking endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help='Worker threads, or coroutines with --mode=async (default: 8)')
+        parser.add_argument('--requests', type=int, default=2000, help='Total requests (default: 2000)')
+        parser.add_argument('--duration', type=float, default=None, help='Run for N seconds instead of --requests')
+        parser.add_argument(
+            '--mix',
+            default='availability=6,list=3,create=1',
+            help='Weighted endpoint mix (default: availability=6,list=3,create=1)',
+        )
+        parser.add_argument('--users', type=int, default=50, help='Seeded users to spread requests over (default: 50)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for the generated requests')
+        parser.add_argument(
+            '--mode',
+            choices=['sync', 'async'],
+            default='sync',
+            help='sync: threads through WSGI; async: coroutines on one event loop through ASGI (default: sync)',
+        )
+        parser.add_argument(
+            '--db-latency',
+            type=float,
+            default=0,
+            help='Milliseconds of simulated network latency added to every database query (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        users = list(seeded_users().filter(approval_status='approved').exclude(role='admin')[:options['users']])
+        rooms_by_floor = {}
+        for floor_id, room_id in Room.objects.values_list('floor_id', 'id'):
+            rooms_by_floor.setdefault(floor_id, []).append(room_id)
+        if not users or not rooms_by_floor:
+            raise CommandError("No seeded users or rooms found. Run `python manage.py seed_bookings` first.")
+
+        # Mint tokens up front so the run doesn't measure password hashing
+        tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+        floor_rooms = list(rooms_by_floor.values())
+        names = list(mix)
+        weights = list(mix.values())
+        hours = list(PEAK_HOURS)
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        url_index = 1 if options['mode'] == 'async' else 0
+        urls = {name: reverse(URL_NAMES[name][url_index]) for name in names}
+        rng_lock = threading.Lock()
+        rng = random.Random(options['seed'])
+
+        def next_request(index):
+            """(endpoint, method, url, query or body, headers) for the index-th request"""
+            with rng_lock:
+                name = rng.choices(names, weights)[0]
+                candidates = rng.choice(floor_rooms)
+                room_ids = rng.sample(candidates, min(len(candidates), rng.choice((1, 1, 2))))
+                day = today + timedelta(days=rng.randint(0, 30))
+                hour = rng.choice(hours)
+
+            headers = {'Authorization': f"Bearer {tokens[index % len(tokens)]}"}
+            if name == 'availability':
+                return name, 'get', urls[name], {
+                    'date': day.strftime('%Y-%m-%d'),
+                    'room_ids': ','.join(str(room_id) for room_id in candidates),
+                }, headers
+            if name == 'create':
+                start = day.replace(hour=hour)
+                return name, 'post', urls[name], json.dumps({
+                    'room_ids': room_ids,
+                    'start_datetime': start.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'end_datetime': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S'),
+                }), headers
+            return name, 'get', urls[name], {}, headers
+
+        local = threading.local()
+
+        def make_call(index):
+            name, method, url, data, headers = next_request(index)
+            # The test client keeps per-request state, so each thread gets its own
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+            if method == 'post':
+                response = client.post(url, data, content_type='application/json', headers=headers)
+            else:
+                response = client.get(url, data, headers=headers)
+            return name, response.status_code
+
+        async_client = AsyncClient()
+
+        async def make_async_call(index):
+            name, method, url, data, headers = next_request(index)
+            if method == 'post':
+                response = await async_client.post(url, data, content_type='application/json', headers=headers)
+            else:
+                response = await async_client.get(url, data, headers=headers)
+            return name, response.status_code
+
+        db_latency = options['db_latency'] / 1000
+
+        def add_latency(execute, sql, params, many, context):
+            time.sleep(db_latency)
+            return execute(sql, params, many, context)
+
+        def install_latency(sender, connection, **kwargs):
+            # At the front, so a request's execute_wrapper() block can't pop it off
+            if add_latency not in connection.execute_wrappers:
+                connection.execute_wrappers.insert(0, add_latency)
+
+        if db_latency:
+            connection_created.connect(install_latency, dispatch_uid='load_test.db_latency')
+
+        setup_test_environment()
+        try:
+            self.stdout.write(
+                f"Load testing {options['mode']} with concurrency {options['concurrency']}, "
+                f"{len(users)} user(s), mix {mix}"
+                + (f", {options['db_latency']:g}ms per query" if db_latency else '') + "..."
+            )
+            runner = run_concurrently_async if options['mode'] == 'async' else run_concurrently
+            summaries, statuses = runner(
+                make_async_call if options['mode'] == 'async' else make_call,
+                options['concurrency'],
+                total_requests=None if options['duration'] else options['requests'],
+                duration=options['duration'],
+            )
+        finally:
+            teardown_test_environment()
+            connection_created.disconnect(dispatch_uid='load_test.db_latency')
+
+        for group in names + ['error', 'all']:
+            if group not in summaries:
+                continue
+            counts = ', '.join(f"{code}: {count}" for code, count in sorted(statuses[group].items(), key=str))
+            self.stdout.write(format_summary(group, summaries[group]))
+            self.stdout.write(f"{'':<34} status {counts}")
@@ -0,0 +1,123 @@
+"""
+Management command to maintain monthly partitions of the booking table (PostgreSQL only)
+Run this command periodically (e.g., daily via cron) once BOOKING_PARTITIONING is enabled
+
+Usage:
+    python manage.py manage_booking_partitions --convert      # one-time conversion
+    python manage.py manage_booking_partitions [--months-ahead=3] [--retention-months=24] [--drop]
+
+Each run creates the partitions for the coming months and detaches partitions older than
+the retention period. Detached partitions are moved into BOOKING_PARTITION_ARCHIVE_SCHEMA
+together with their room links, or dropped with --drop. See booking/partitioning.py for
+how references to bookings are kept consistent once the table is partitioned.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from booking import partitioning
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Create future booking partitions and detach/archive old ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert the existing booking table into a partitioned table (one-time)',
+        )
+        parser.add_argument(
+            '--keep-legacy',
+            action='store_true',
+            help='With --convert, keep the original table as booking_booking_legacy',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.BOOKING_PARTITION_MONTHS_AHEAD,
+            help='Number of future months to create partitions for '
+                 f'(default: {settings.BOOKING_PARTITION_MONTHS_AHEAD})',
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=settings.BOOKING_PARTITION_RETENTION_MONTHS,
+            help='Detach partitions older than this many months, 0 to keep everything '
+                 f'(default: {settings.BOOKING_PARTITION_RETENTION_MONTHS})',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Drop detached partitions instead of moving them to the archive schema',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the SQL that would be executed without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.BOOKING_PARTITIONING:
+            raise CommandError("Booking partitioning is disabled. Set BOOKING_PARTITIONING=True to use it.")
+        if not partitioning.is_supported():
+            raise CommandError(f"Booking partitioning requires PostgreSQL (current database: {connection.vendor}).")
+
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING("DRY RUN MODE - No changes will be made"))
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            def run(sql, params=None):
+                if dry_run:
+                    self.stdout.write(f"{sql};" + (f"  -- params: {params}" if params else ""))
+                else:
+                    cursor.execute(sql, params)
+
+            partitioned = partitioning.is_partitioned(cursor)
+
+            if options['convert']:
+                if partitioned:
+                    raise CommandError("The booking table is already partitioned.")
+                self.stdout.write("Converting booking table to monthly partitions...")
+                try:
+                    partitioning.convert_to_partitioned(
+                        cursor, run, options['months_ahead'], keep_legacy=options['keep_legacy']
+                    )
+                except ValueError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(self.style.SUCCESS("✓ Booking table converted"))
+                return
+
+            if not partitioned:
+                raise CommandError("The booking table is not partitioned yet. Run with --convert first.")
+
+            # Normally installed by `migrate` already; cheap to make sure of
+            partitioning.install_integrity_triggers(run)
+
+            this_month = partitioning.month_start(timezone.now())
+            created = partitioning.ensure_partitions(
+                cursor, run, this_month, partitioning.add_months(this_month, options['months_ahead'])
+            )
+            for name in created:
+                self.stdout.write(self.style.SUCCESS(f"✓ Created partition {name}"))
+
+            retired = []
+            if options['retention_months'] > 0:
+                retired = partitioning.retire_partitions(
+                    cursor,
+                    run,
+                    partitioning.add_months(this_month, -options['retention_months']),
+                    archive_schema=settings.BOOKING_PARTITION_ARCHIVE_SCHEMA,
+                    drop=options['drop'],
+                )
+                for name in retired:
+                    action = 'Dropped' if options['drop'] else f"Archived to {settings.BOOKING_PARTITION_ARCHIVE_SCHEMA}"
+                    self.stdout.write(self.style.SUCCESS(f"✓ {action}: {name}"))
+
+        # Summary
+        self.stdout.write("\n" + "="*50)
+        self.stdout.write(f"Created {len(created)} partition(s), retired {len(retired)} partition(s)")
@@ -0,0 +1,67 @@
+"""
+Management command to create the bookings of recurring booking series as they come up
+Run this command daily (e.g. via cron) so every series has its occurrences booked
+BOOKING_SERIES_HORIZON_DAYS ahead
+
+Usage:
+    python manage.py materialize_booking_series [--days=28] [--dry-run]
+
+Occurrences that conflict with a booking made since the series was created are skipped
+and reported.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from booking.models import BookingSeries
+from booking.series import horizon_date, materialize_series
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Create the bookings of recurring booking series up to the rolling horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.BOOKING_SERIES_HORIZON_DAYS,
+            help=f'How many days ahead occurrences should be booked (default: {settings.BOOKING_SERIES_HORIZON_DAYS})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the series that would be extended without creating bookings',
+        )
+
+    def handle(self, *args, **options):
+        through = horizon_date(options['days'])
+        due = BookingSeries.objects.filter(
+            Q(materialized_until__isnull=True) | Q(materialized_until__lt=through),
+            status='Active',
+        ).filter(Q(until__isnull=True) | Q(until__gte=timezone.localdate()))
+        self.stdout.write(f"Booking occurrences up to {through.isoformat()}")
+
+        created_total = skipped_total = 0
+        for series in due.select_related('user').iterator():
+            if options['dry_run']:
+                self.stdout.write(f"  Would extend series {series.pk}: {series}")
+                continue
+            try:
+                created, skipped = materialize_series(series, through)
+            except Exception as e:
+                logger.error(f"Failed to materialize booking series {series.pk}: {str(e)}", exc_info=True)
+                self.stdout.write(self.style.ERROR(f"  Series {series.pk}: failed ({str(e)})"))
+                continue
+            created_total += len(created)
+            skipped_total += len(skipped)
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f"  Series {series.pk}: skipped {', '.join(day.isoformat() for day in skipped)} (rooms already booked)"
+                ))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created_total} booking(s), skipped {skipped_total} conflicting occurrence(s)"
+        ))
@@ -0,0 +1,143 @@
+"""
+Management command that books the create_booking/ requests queued during admission windows
+Run it as one long-lived process (e.g. a systemd service next to gunicorn) while windows
+are open, or with --once from cron
+
+Usage:
+    python manage.py process_booking_queue [--once] [--batch-size=200] [--interval=1]
+
+Only one consumer runs at a time, so requests are booked strictly in arrival order: a
+second instance exits while the first holds the consumer lock. The lock is a session
+lock in the database (pg_try_advisory_lock on PostgreSQL, GET_LOCK on MySQL), so the
+database releases it when the consumer's process or connection goes away: there is no
+expiry to renew, and no other process can release it.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from booking.admission import process_queue
+from booking.db_router import PRIMARY
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_LOCK_NAME = 'grfs-booking-queue-consumer'
+
+
+class ConsumerLock:
+    """
+    Lock held for the consumer's lifetime. SQLite (development) has no session locks, so
+    there it is an exclusive lock on a file per database in the temp directory, which the
+    OS releases when the process exits.
+    """
+
+    def __init__(self, using=PRIMARY):
+        self.connection = connections[using]
+        self.vendor = self.connection.vendor
+        # pg_try_advisory_lock takes a bigint key
+        self.key = int.from_bytes(hashlib.sha256(CONSUMER_LOCK_NAME.encode()).digest()[:8], 'big', signed=True)
+        self.lock_file = None
+
+    def _query(self, sql, params=()):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+
+    def acquire(self):
+        """Take the lock without waiting. Returns whether it is held (again) by this process"""
+        if self.vendor == 'postgresql':
+            return self._query("SELECT pg_try_advisory_lock(%s)", [self.key])
+        if self.vendor == 'mysql':
+            return self._query("SELECT GET_LOCK(%s, 0)", [CONSUMER_LOCK_NAME]) == 1
+        if self.lock_file is not None:
+            return True
+        if fcntl is None:
+            logger.warning("No consumer lock on this platform: run a single process_booking_queue")
+            return True
+        database = hashlib.sha256(str(self.connection.settings_dict['NAME']).encode()).hexdigest()[:16]
+        path = os.path.join(tempfile.gettempdir(), f"{CONSUMER_LOCK_NAME}-{database}.lock")
+        lock_file = open(path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def release(self):
+        if self.vendor == 'postgresql':
+            # Every acquire() re-entered the lock; drop them all
+            self._query("SELECT pg_advisory_unlock_all()")
+        elif self.vendor == 'mysql':
+            self._query("SELECT RELEASE_ALL_LOCKS()")
+        elif self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+
+class Command(BaseCommand):
+    help = 'Book queued booking requests in arrival order (single consumer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the requests queued now and exit instead of waiting for more',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ADMISSION_QUEUE_BATCH_SIZE,
+            help=f'Requests resolved together (default: {settings.ADMISSION_QUEUE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.ADMISSION_QUEUE_POLL_SECONDS,
+            help=f'Seconds to wait when the queue is empty (default: {settings.ADMISSION_QUEUE_POLL_SECONDS})',
+        )
+
+    def handle(self, *args, **options):
+        lock = ConsumerLock()
+        if not lock.acquire():
+            raise CommandError("Another process_booking_queue is already running.")
+
+        booked_total = rejected_total = 0
+        try:
+            while True:
+                # A new connection (after the old one dropped) doesn't hold the session lock,
+                # and another consumer may have taken it meanwhile
+                if not lock.acquire():
+                    raise CommandError("Lost the consumer lock to another process_booking_queue.")
+                try:
+                    processed, bookings = process_queue(options['batch_size'])
+                except Exception as e:
+                    logger.error(f"Failed to process the booking queue: {str(e)}", exc_info=True)
+                    self.stdout.write(self.style.ERROR(f"Batch failed ({str(e)})"))
+                    processed, bookings = [], []
+                if processed:
+                    booked_total += len(bookings)
+                    rejected_total += len(processed) - len(bookings)
+                    self.stdout.write(f"Booked {len(bookings)}, rejected {len(processed) - len(bookings)}")
+                if len(processed) < options['batch_size']:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            lock.release()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Booked {booked_total} queued request(s), rejected {rejected_total}"
+        ))
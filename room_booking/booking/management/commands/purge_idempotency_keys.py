@@ -0,0 +1,29 @@
+"""
+Management command to delete expired Idempotency-Key records
+Run this command daily (e.g. via cron); records are kept for IDEMPOTENCY_KEY_TTL_HOURS
+
+Usage:
+    python manage.py purge_idempotency_keys [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from booking.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = 'Delete Idempotency-Key records whose replay window has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count the expired records without deleting them',
+        )
+
+    def handle(self, *args, **options):
+        expired = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now())
+        if options['dry_run']:
+            self.stdout.write(f"Would delete {expired.count()} expired idempotency record(s)")
+            return
+        deleted, _ = expired.delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency record(s)"))
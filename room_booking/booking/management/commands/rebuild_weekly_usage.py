@@ -0,0 +1,57 @@
+"""
+Management command to recompute the weekly usage counters (booking/quotas.py) from the bookings
+The counters are kept up to date on every booking write; run this if they were changed
+outside Django (raw SQL, a restored backup) or look wrong. Bookings written while it
+runs may be counted twice or not at all, so run it when the site is quiet.
+
+Usage:
+    python manage.py rebuild_weekly_usage [--user=<id>] [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+from booking.db_router import PRIMARY
+from booking.models import USAGE_FIELDS, Booking, WeeklyUsage, weekly_totals
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user weekly booking usage counters from the bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Only rebuild the counters of this user id',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the counters that are wrong without changing them',
+        )
+
+    def handle(self, *args, **options):
+        bookings = Booking.objects.using(PRIMARY).all()
+        counters = WeeklyUsage.objects.using(PRIMARY).all()
+        if options['user']:
+            bookings = bookings.filter(user_id=options['user'])
+            counters = counters.filter(user_id=options['user'])
+
+        stored = {
+            (user_id, week): minutes
+            for user_id, week, minutes in counters.values_list('user_id', 'week_start', 'booked_minutes')
+            if minutes
+        }
+        if options['dry_run']:
+            totals = weekly_totals(bookings.values_list(*USAGE_FIELDS))
+            wrong = {key for key in totals.keys() | stored.keys() if totals.get(key) != stored.get(key)}
+            for user_id, week in sorted(wrong):
+                self.stdout.write(
+                    f"User {user_id}, week of {week}: {stored.get((user_id, week), 0)} minutes stored, "
+                    f"{totals.get((user_id, week), 0)} booked"
+                )
+            self.stdout.write(f"{len(wrong)} of {len(totals)} counter(s) would change")
+            return
+
+        totals = WeeklyUsage.objects.using(PRIMARY).rebuild([options['user']] if options['user'] else None)
+        wrong = {key for key in totals.keys() | stored.keys() if totals.get(key) != stored.get(key)}
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(totals)} weekly usage counter(s); {len(wrong)} were wrong"
+        ))
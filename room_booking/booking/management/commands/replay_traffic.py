@@ -0,0 +1,217 @@
+"""
+Management command to replay captured API traffic against a running instance
+
+Usage:
+    python manage.py replay_traffic [--url=http://127.0.0.1:8000] [--speed=1] [--hours=24]
+                                    [--file=traffic.jsonl ...] [--output=run.json] [--compare=old.json]
+
+Reads the traces written by TrafficCaptureMiddleware (booking.traffic) and re-issues them
+with their original spacing divided by --speed (1 = real time, 10 = ten times faster,
+0 = as fast as possible). Each captured user is mapped to a seeded user with the same
+role (see seed_bookings) and authenticated with access tokens minted locally and renewed
+before they expire, so the target must share this project's SECRET_KEY and database.
+Requests that cannot be reproduced (login, registration, token refresh, anything with
+redacted fields) and the admin delete-all endpoint are skipped.
+
+Prints per-route latency percentiles and 409 conflict rates next to the rates seen when
+the traffic was captured. --output saves the results so a later run (e.g. the next
+release) can be compared with --compare.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from booking.benchmarks import summarize
+from booking.management.commands.seed_bookings import seeded_users
+from booking.traffic import REDACTED, read_traces
+import json
+import threading
+import time
+
+# Routes whose captured requests can't be reproduced or must never be replayed
+SKIPPED_ROUTES = {'login', 'register', 'token_refresh', 'delete-all-bookings'}
+
+
+def contains_redacted(value):
+    if isinstance(value, dict):
+        return any(contains_redacted(v) for v in value.values())
+    if isinstance(value, list):
+        return any(contains_redacted(v) for v in value)
+    return value == REDACTED
+
+
+def conflict_rate(statuses):
+    total = sum(statuses.values())
+    return statuses.get('409', 0) / total if total else 0.0
+
+
+class Command(BaseCommand):
+    help = 'Replay captured API traffic against a local instance and report latency and conflict rates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the target instance')
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=1.0,
+            help='Replay speed multiplier: 1 = real time, N = N times faster, 0 = as fast as possible',
+        )
+        parser.add_argument('--file', action='append', default=None, help='Trace file(s) to replay (default: the capture log)')
+        parser.add_argument('--hours', type=float, default=None, help='Only replay traffic captured in the last N hours')
+        parser.add_argument('--limit', type=int, default=None, help='Replay at most N requests')
+        parser.add_argument('--concurrency', type=int, default=32, help='Maximum requests in flight (default: 32)')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds (default: 30)')
+        parser.add_argument('--output', default=None, help='Write the results as JSON to this file')
+        parser.add_argument('--compare', default=None, help='Compare with the results of an earlier --output run')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours']) if options['hours'] else None
+        traces, skipped = [], {}
+        for record in read_traces(options['file'], since):
+            reason = None
+            if record['route'] in SKIPPED_ROUTES:
+                reason = record['route']
+            elif contains_redacted(record.get('body')) or contains_redacted(record.get('query')):
+                reason = 'redacted fields'
+            if reason:
+                skipped[reason] = skipped.get(reason, 0) + 1
+                continue
+            traces.append(record)
+            if options['limit'] and len(traces) >= options['limit']:
+                break
+        if not traces:
+            raise CommandError("No replayable traffic found. Enable TRAFFIC_CAPTURE_ENABLED to capture some.")
+        # Records are written when requests finish, so restore the order they started in
+        traces.sort(key=lambda record: record['time'])
+
+        users = self.map_users(traces)
+        tokens = {}
+        # Renew tokens well before they expire
+        token_max_age = jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds() / 2
+        base_url = options['url'].rstrip('/')
+        speed = options['speed']
+        first_time = parse_datetime(traces[0]['time'])
+
+        lock = threading.Lock()
+        results = {}
+
+        def get_token(key):
+            user = users.get(key)
+            if user is None:
+                return None
+            with lock:
+                token, minted_at = tokens.get(key, (None, 0))
+                if token is None or time.monotonic() - minted_at > token_max_age:
+                    token, minted_at = str(AccessToken.for_user(user)), time.monotonic()
+                    tokens[key] = (token, minted_at)
+            return token
+
+        def send(record):
+            headers = {'Accept': 'application/json'}
+            token = get_token((record['user'], record['role']))
+            if token:
+                headers['Authorization'] = f"Bearer {token}"
+            data = None
+            if record.get('body') is not None:
+                data = json.dumps(record['body']).encode('utf-8')
+                headers['Content-Type'] = 'application/json'
+            url = base_url + record['path']
+            if record.get('query'):
+                url += '?' + urlencode(record['query'], doseq=True)
+
+            started = time.perf_counter()
+            try:
+                with urlopen(Request(url, data=data, headers=headers, method=record['method']), timeout=options['timeout']) as response:
+                    response.read()
+                    result = str(response.status)
+            except HTTPError as e:
+                result = str(e.code)
+            except (URLError, OSError) as e:
+                result = type(e).__name__
+            elapsed = time.perf_counter() - started
+
+            with lock:
+                for key in (record['route'], 'all'):
+                    entry = results.setdefault(key, {'latencies': [], 'statuses': {}, 'captured': {}})
+                    entry['latencies'].append(elapsed)
+                    entry['statuses'][result] = entry['statuses'].get(result, 0) + 1
+                    captured = str(record['status'])
+                    entry['captured'][captured] = entry['captured'].get(captured, 0) + 1
+
+        self.stdout.write(
+            f"Replaying {len(traces)} request(s) against {base_url} at "
+            f"{'maximum speed' if speed <= 0 else f'{speed:g}x'}"
+            + (f"; skipped {sum(skipped.values())} ({', '.join(f'{k}: {v}' for k, v in skipped.items())})" if skipped else '')
+        )
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for record in traces:
+                if speed > 0:
+                    due = (parse_datetime(record['time']) - first_time).total_seconds() / speed
+                    delay = due - (time.perf_counter() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                executor.submit(send, record)
+        elapsed = time.perf_counter() - started
+
+        report = {}
+        for route, entry in sorted(results.items(), key=lambda item: (item[0] == 'all', item[0])):
+            report[route] = dict(
+                summarize(entry['latencies'], elapsed),
+                statuses=entry['statuses'],
+                conflict_rate=conflict_rate(entry['statuses']),
+                captured_conflict_rate=conflict_rate(entry['captured']),
+            )
+
+        previous = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                previous = json.load(f)
+
+        self.stdout.write(
+            f"{'route':<26}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'409 now':>9}{'409 then':>10}"
+            + (f"{'Δp95 ms':>10}{'Δ409':>8}" if previous else '')
+        )
+        for route, row in report.items():
+            line = (
+                f"{route:<26}{row['count']:>6}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+                f"{row['conflict_rate']:>9.1%}{row['captured_conflict_rate']:>10.1%}"
+            )
+            if previous and route in previous:
+                line += (
+                    f"{row['p95_ms'] - previous[route]['p95_ms']:>+10.1f}"
+                    f"{(row['conflict_rate'] - previous[route]['conflict_rate']) * 100:>+7.1f}%"
+                )
+            self.stdout.write(line)
+            self.stdout.write(f"{'':<26}status {', '.join(f'{k}: {v}' for k, v in sorted(row['statuses'].items()))}")
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def map_users(self, traces):
+        """Seeded user for each captured (user, role), assigned round-robin within the same role"""
+        pools = {}
+        for user in seeded_users().filter(approval_status='approved'):
+            pools.setdefault(user.role, []).append(user)
+        if not pools:
+            raise CommandError("No seeded users found. Run `python manage.py seed_bookings` first.")
+
+        users = {}
+        used = {}
+        for record in traces:
+            key = (record['user'], record['role'])
+            if record['user'] is None or key in users:
+                continue
+            pool = pools.get(record['role']) or pools.get('user') or next(iter(pools.values()))
+            index = used.get(record['role'], 0)
+            used[record['role']] = index + 1
+            users[key] = pool[index % len(pool)]
+        return users
@@ -0,0 +1,188 @@
+"""
+Management command to seed a database with synthetic floors, rooms, users and bookings
+
+Usage:
+    python manage.py seed_bookings [--floors=5] [--rooms-per-floor=8] [--users=200]
+                                   [--bookings=20000] [--days=120] [--seed=1] [--clear]
+
+Bookings are spread from --days in the past to --days in the future, clustered around
+after-school and evening peak hours and weighted towards weekdays. About a fifth book
+several rooms on one floor and a few are multi-day camps. Active bookings never overlap
+on a room, matching what the API allows.
+
+Seeded users are seed-user-<n>@example.com (plus seed-admin@example.com) with the
+password given by --password, so load_test and replay_traffic can log in as them.
+Use --clear to delete everything seeded previously.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from booking.models import Booking, Floor, Room, CustomUser
+import random
+
+SEED_FLOOR_PREFIX = 'Seed Floor'
+SEED_EMAIL_PREFIX = 'seed-'
+SEED_EMAIL_DOMAIN = '@example.com'
+DEFAULT_SEED_PASSWORD = 'seed-pass-123'
+
+# Local start hour -> relative weight (after school and evenings are busiest)
+PEAK_HOURS = {8: 2, 9: 4, 10: 5, 11: 4, 12: 3, 13: 4, 14: 6, 15: 9, 16: 12, 17: 11, 18: 12, 19: 9, 20: 5, 21: 2}
+ROLE_WEIGHTS = {'user': 80, 'mentor': 15, 'coordinator': 5}
+STATUS_WEIGHTS = {'Approved': 70, 'Pending': 20, 'Cancelled': 10}
+
+
+def seed_user_email(index):
+    return f"{SEED_EMAIL_PREFIX}user-{index}{SEED_EMAIL_DOMAIN}"
+
+
+def seed_admin_email():
+    return f"{SEED_EMAIL_PREFIX}admin{SEED_EMAIL_DOMAIN}"
+
+
+def seeded_users():
+    return CustomUser.objects.filter(email__startswith=SEED_EMAIL_PREFIX, email__endswith=SEED_EMAIL_DOMAIN)
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create synthetic floors, rooms, users and bookings for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--floors', type=int, default=5, help='Number of floors (default: 5)')
+        parser.add_argument('--rooms-per-floor', type=int, default=8, help='Rooms on each floor (default: 8)')
+        parser.add_argument('--users', type=int, default=200, help='Number of users (default: 200)')
+        parser.add_argument('--bookings', type=int, default=20000, help='Number of bookings to attempt (default: 20000)')
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=120,
+            help='Spread bookings from this many days ago to this many days ahead (default: 120)',
+        )
+        parser.add_argument('--password', default=DEFAULT_SEED_PASSWORD, help='Password for every seeded user')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for reproducible datasets')
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded data first')
+        parser.add_argument('--batch-size', type=int, default=2000, help='bulk_create batch size (default: 2000)')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        if options['clear']:
+            self.clear()
+
+        with transaction.atomic():
+            rooms_by_floor = self.create_rooms(options['floors'], options['rooms_per_floor'])
+            users = self.create_users(rng, options['users'], options['password'], options['batch_size'])
+            created = self.create_bookings(
+                rng, rooms_by_floor, users, options['bookings'], options['days'], options['batch_size']
+            )
+
+        room_count = sum(len(rooms) for rooms in rooms_by_floor.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(rooms_by_floor)} floor(s), {room_count} room(s), {len(users)} user(s) "
+            f"and {created} booking(s) (of {options['bookings']} attempted)"
+        ))
+        self.stdout.write(f"Log in as {seed_user_email(0)} or {seed_admin_email()} with password '{options['password']}'")
+
+    def clear(self):
+        bookings = Booking.objects.filter(user__in=seeded_users()).delete()[1].get('booking.Booking', 0)
+        users = seeded_users().delete()[1].get('booking.CustomUser', 0)
+        floors = Floor.objects.filter(name__startswith=SEED_FLOOR_PREFIX).delete()[1].get('booking.Floor', 0)
+        self.stdout.write(f"Deleted {bookings} booking(s), {users} user(s) and {floors} floor(s) from a previous seed")
+
+    def create_rooms(self, floor_count, rooms_per_floor):
+        floors = Floor.objects.bulk_create([
+            Floor(name=f"{SEED_FLOOR_PREFIX} {i}") for i in range(1, floor_count + 1)
+        ])
+        rooms = Room.objects.bulk_create([
+            Room(name=f"Seed Room {floor_number}.{i:02d}", floor=floor)
+            for floor_number, floor in enumerate(floors, start=1)
+            for i in range(1, rooms_per_floor + 1)
+        ])
+        rooms_by_floor = defaultdict(list)
+        for room in rooms:
+            rooms_by_floor[room.floor_id].append(room.id)
+        return rooms_by_floor
+
+    def create_users(self, rng, user_count, password, batch_size):
+        # Hashing is deliberately slow, so hash once and share the result
+        password_hash = make_password(password)
+        existing = set(seeded_users().values_list('email', flat=True))
+        roles = list(ROLE_WEIGHTS)
+        weights = list(ROLE_WEIGHTS.values())
+
+        new_users = []
+        if seed_admin_email() not in existing:
+            new_users.append(CustomUser(
+                email=seed_admin_email(), username='seed-admin', password=password_hash,
+                role='admin', approval_status='approved',
+            ))
+        for i in range(user_count):
+            if seed_user_email(i) not in existing:
+                new_users.append(CustomUser(
+                    email=seed_user_email(i), username=f"seed-user-{i}", password=password_hash,
+                    role=rng.choices(roles, weights)[0], approval_status='approved',
+                ))
+        CustomUser.objects.bulk_create(new_users, batch_size=batch_size)
+
+        return list(seeded_users().exclude(role='admin').values_list('id', flat=True))
+
+    def create_bookings(self, rng, rooms_by_floor, user_ids, booking_count, days, batch_size):
+        if not user_ids or not rooms_by_floor:
+            return 0
+
+        floor_ids = list(rooms_by_floor)
+        hours = list(PEAK_HOURS)
+        hour_weights = list(PEAK_HOURS.values())
+        statuses = list(STATUS_WEIGHTS)
+        status_weights = list(STATUS_WEIGHTS.values())
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # (room id, date) -> list of (start, end) already taken by an active seeded booking
+        taken = defaultdict(list)
+        planned = []
+        for _ in range(booking_count):
+            day = rng.randint(-days, days)
+            start_day = today + timedelta(days=day)
+            # Weekends get a third of the weekday traffic
+            if start_day.weekday() >= 5 and rng.random() < 0.66:
+                continue
+
+            floor_rooms = rooms_by_floor[rng.choice(floor_ids)]
+            is_camp = rng.random() < 0.02
+            if is_camp:
+                start = start_day.replace(hour=8)
+                end = start + timedelta(days=rng.randint(2, 5), hours=9)
+                room_ids = rng.sample(floor_rooms, min(len(floor_rooms), rng.randint(2, 4)))
+            else:
+                start = start_day.replace(hour=rng.choices(hours, hour_weights)[0], minute=rng.choice((0, 0, 30)))
+                end = start + timedelta(minutes=rng.choice((60, 60, 90, 120, 180)))
+                room_count = rng.choices((1, 2, 3), (80, 14, 6))[0]
+                room_ids = rng.sample(floor_rooms, min(len(floor_rooms), room_count))
+
+            status = rng.choices(statuses, status_weights)[0]
+            if status != 'Cancelled':
+                keys = [(room_id, start.date() + timedelta(days=offset))
+                        for room_id in room_ids for offset in range((end.date() - start.date()).days + 1)]
+                if any(s < end and e > start for key in keys for s, e in taken[key]):
+                    continue
+                for key in keys:
+                    taken[key].append((start, end))
+
+            planned.append((Booking(
+                user_id=rng.choice(user_ids),
+                start_datetime=start,
+                end_datetime=end,
+                status=status,
+                booking_type='camp' if is_camp else 'regular',
+            ), room_ids))
+
+        bookings = Booking.objects.bulk_create([booking for booking, _ in planned], batch_size=batch_size)
+        through = Booking.rooms.through
+        through.objects.bulk_create([
+            through(booking_id=booking.id, room_id=room_id)
+            for booking, (_, room_ids) in zip(bookings, planned)
+            for room_id in room_ids
+        ], batch_size=batch_size)
+        return len(bookings)
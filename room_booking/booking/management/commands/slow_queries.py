@@ -0,0 +1,110 @@
+"""
+Management command to summarize captured slow queries
+
+Usage:
+    python manage.py slow_queries [--top=10] [--sort=total] [--hours=24] [--plans]
+
+Groups the records in SLOW_QUERY_LOG by normalized SQL shape and prints the top N shapes
+with their count, total/mean/max duration and the call sites that issued them.
+"""
+from collections import Counter
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from booking.slow_queries import get_log_paths
+import json
+
+
+class Command(BaseCommand):
+    help = 'Print the slowest query shapes captured by the slow query log'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Number of query shapes to show (default: 10)',
+        )
+        parser.add_argument(
+            '--sort',
+            choices=['total', 'mean', 'max', 'count'],
+            default='total',
+            help='Rank shapes by total time, mean time, max time or occurrences (default: total)',
+        )
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=None,
+            help='Only include queries captured in the last N hours',
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Also print the most recent EXPLAIN ANALYZE plan captured for each shape',
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours']) if options['hours'] else None
+        shapes = {}
+
+        for path in get_log_paths():
+            try:
+                with open(path, encoding='utf-8') as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                continue
+
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if since and parse_datetime(record['time']) < since:
+                    continue
+
+                shape = shapes.setdefault(record['shape_id'], {
+                    'sql': record['sql'],
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'call_sites': Counter(),
+                    'params': set(),
+                    'plan': None,
+                    'plan_time': '',
+                })
+                shape['count'] += 1
+                shape['total_ms'] += record['duration_ms']
+                shape['max_ms'] = max(shape['max_ms'], record['duration_ms'])
+                shape['call_sites'][f"{record.get('view') or '-'} / {record.get('function') or '-'}"] += 1
+                if record.get('params_fingerprint'):
+                    shape['params'].add(record['params_fingerprint'])
+                if record.get('plan') and record['time'] > shape['plan_time']:
+                    shape['plan'] = record['plan']
+                    shape['plan_time'] = record['time']
+
+        if not shapes:
+            self.stdout.write("No slow queries captured")
+            return
+
+        sort_keys = {
+            'total': lambda shape: shape['total_ms'],
+            'mean': lambda shape: shape['total_ms'] / shape['count'],
+            'max': lambda shape: shape['max_ms'],
+            'count': lambda shape: shape['count'],
+        }
+        ranked = sorted(shapes.items(), key=lambda item: sort_keys[options['sort']](item[1]), reverse=True)
+
+        self.stdout.write(f"{len(shapes)} slow query shape(s), showing top {min(options['top'], len(shapes))} by {options['sort']}")
+        for shape_id, shape in ranked[:options['top']]:
+            self.stdout.write("\n" + "="*50)
+            self.stdout.write(self.style.WARNING(
+                f"[{shape_id}] count={shape['count']} total={shape['total_ms']:.1f}ms "
+                f"mean={shape['total_ms'] / shape['count']:.1f}ms max={shape['max_ms']:.1f}ms "
+                f"distinct_params={len(shape['params'])}"
+            ))
+            self.stdout.write(shape['sql'])
+            for call_site, count in shape['call_sites'].most_common(3):
+                self.stdout.write(f"  {count}x {call_site}")
+            if options['plans'] and shape['plan']:
+                self.stdout.write(json.dumps(shape['plan'], indent=2))
@@ -0,0 +1,251 @@
+"""
+Per-request performance metrics
+
+Each process keeps its counters and histograms in memory and periodically writes a
+snapshot to METRICS_DIR (one JSON file per process). The metrics endpoint merges
+every snapshot in that directory, so numbers are aggregated across all gunicorn workers
+without needing an external store.
+
+Snapshots of workers that have exited are removed when the endpoint collects them:
+their process id is gone, or the file hasn't been written for METRICS_SNAPSHOT_TTL
+seconds. Files are named after the process id and a random token, so a new worker
+reusing an old process id doesn't take over the old worker's numbers.
+"""
+from django.conf import settings
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'grfs_'
+
+# Histogram bucket upper bounds (a +Inf bucket is always added)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Time spent handling a request, per view', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('Response body size, per view', SIZE_BUCKETS),
+    'db_queries_per_request': ('Number of database queries issued by one request, per view', QUERY_COUNT_BUCKETS),
+    'db_time_seconds_per_request': ('Time spent in the database by one request, per view', LATENCY_BUCKETS),
+    'email_send_duration_seconds': ('Time spent sending one email', LATENCY_BUCKETS),
+}
+
+COUNTERS = {
+    'http_requests_total': 'Requests handled, per view, method and status code',
+}
+
+# metrics-<pid>-<token>.json (metrics-<pid>.json before tokens were added)
+_SNAPSHOT_NAME_RE = re.compile(r'^metrics-(\d+)(?:-[0-9a-f]+)?\.json$')
+
+
+class MetricsRegistry:
+    """Thread-safe in-memory store for the current process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+        self._pid = None
+        self._token = None
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+            for index, upper_bound in enumerate(buckets):
+                if value <= upper_bound:
+                    histogram['buckets'][index] += 1
+                    break
+            else:
+                histogram['buckets'][-1] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        """JSON-serializable copy of everything recorded so far"""
+        with self._lock:
+            return {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [
+                    [name, dict(labels), dict(histogram, buckets=list(histogram['buckets']))]
+                    for (name, labels), histogram in self._histograms.items()
+                ],
+            }
+
+    def flush_due(self):
+        """Whether METRICS_FLUSH_INTERVAL has passed since the last snapshot was written"""
+        return time.monotonic() - self._last_flush >= settings.METRICS_FLUSH_INTERVAL
+
+    def flush(self, force=False):
+        """Write this process' snapshot to METRICS_DIR (at most every METRICS_FLUSH_INTERVAL seconds)"""
+        if not force and not self.flush_due():
+            return
+        self._last_flush = time.monotonic()
+
+        pid = os.getpid()
+        if pid != self._pid:
+            # New process (or a worker forked after the registry was created)
+            self._pid, self._token = pid, uuid.uuid4().hex[:12]
+        directory = get_metrics_dir()
+        path = os.path.join(directory, f"metrics-{pid}-{self._token}.json")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial snapshot
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write metrics snapshot to {path}: {str(e)}")
+
+
+registry = MetricsRegistry()
+
+
+def get_metrics_dir():
+    return settings.METRICS_DIR or os.path.join(tempfile.gettempdir(), 'grfs-metrics')
+
+
+def inc(name, amount=1, **labels):
+    if settings.METRICS_ENABLED:
+        registry.inc(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    if settings.METRICS_ENABLED:
+        registry.observe(name, value, **labels)
+
+
+def _pid_alive(pid):
+    if os.name != 'posix':
+        return True  # os.kill() would terminate the process instead of probing it
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists, but belongs to another user
+    return True
+
+
+def _prune_snapshots(directory, filenames):
+    """Remove the snapshots of exited processes; returns the remaining filenames"""
+    ttl = settings.METRICS_SNAPSHOT_TTL
+    now = time.time()
+    remaining = []
+    for filename in filenames:
+        path = os.path.join(directory, filename)
+        try:
+            stale = (
+                not _pid_alive(int(_SNAPSHOT_NAME_RE.match(filename).group(1)))
+                or (ttl and now - os.path.getmtime(path) > ttl)
+            )
+            if stale:
+                os.remove(path)
+                continue
+        except FileNotFoundError:
+            continue  # Pruned by another worker
+        except OSError as e:
+            logger.warning(f"Failed to remove stale metrics snapshot {filename}: {str(e)}")
+        remaining.append(filename)
+    return remaining
+
+
+def collect():
+    """Merge the snapshots written by every live process into a single snapshot"""
+    registry.flush(force=True)
+
+    counters = {}
+    histograms = {}
+    directory = get_metrics_dir()
+    try:
+        filenames = [name for name in os.listdir(directory) if _SNAPSHOT_NAME_RE.match(name)]
+    except FileNotFoundError:
+        filenames = []
+    filenames = _prune_snapshots(directory, filenames)
+
+    for filename in filenames:
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable metrics snapshot {filename}: {str(e)}")
+            continue
+
+        for name, labels, value in snapshot.get('counters', []):
+            key = (name, tuple(sorted(labels.items())))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, histogram in snapshot.get('histograms', []):
+            key = (name, tuple(sorted(labels.items())))
+            merged = histograms.get(key)
+            if merged is None:
+                histograms[key] = dict(histogram, buckets=list(histogram['buckets']))
+            else:
+                merged['buckets'] = [a + b for a, b in zip(merged['buckets'], histogram['buckets'])]
+                merged['sum'] += histogram['sum']
+                merged['count'] += histogram['count']
+
+    return counters, histograms
+
+
+def _format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    escaped = []
+    for key, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else str(int(value))
+    return str(value)
+
+
+def render_prometheus():
+    """Render the merged metrics in the Prometheus text exposition format (version 0.0.4)"""
+    counters, histograms = collect()
+    lines = []
+
+    for name, help_text in COUNTERS.items():
+        lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{METRIC_PREFIX}{name}{_format_labels(labels)} {_format_number(value)}")
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for upper_bound, count in zip(list(buckets) + ['+Inf'], histogram['buckets']):
+                cumulative += count
+                le = upper_bound if upper_bound == '+Inf' else _format_number(float(upper_bound))
+                lines.append(f"{METRIC_PREFIX}{name}_bucket{_format_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(labels)} {_format_number(histogram['sum'])}")
+            lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,409 @@
+"""
+Request middleware for the booking API
+
+The middleware that is on by default supports both WSGI and ASGI, so under an ASGI server
+the async views in booking.async_views are not pushed onto a thread by the stack.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+from . import compression, metrics, react_shell
+from .db_router import pin_to_primary, replica_configured
+from contextlib import contextmanager
+import contextvars
+import cProfile
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def get_view_label(request):
+    """Stable label for the view that handled a request (URL name when there is one)"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match.route or 'unresolved'
+
+
+class QueryStats:
+    """
+    Count of the queries and time spent running them while collecting (see collect_queries).
+    Set capture_sql=True to also keep every statement.
+    """
+
+    def __init__(self, capture_sql=False):
+        self.count = 0
+        self.duration = 0.0
+        self.capture_sql = capture_sql
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def add(self, sql, many, elapsed):
+        with self._lock:
+            self.count += 1
+            self.duration += elapsed
+            if self.capture_sql:
+                self.queries.append({'sql': sql, 'many': many, 'duration_ms': round(elapsed * 1000, 3)})
+
+
+# The QueryStats collecting in the current context. A context variable rather than
+# connection.execute_wrapper(): under ASGI the ORM runs on executor threads with their
+# own connections, and sync_to_async carries the context over to them
+_active_stats = contextvars.ContextVar('booking_query_stats', default=())
+
+
+@contextmanager
+def collect_queries(stats):
+    """Count the queries run in this context (and the threads it hands work to) into stats"""
+    token = _active_stats.set(_active_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active_stats.reset(token)
+
+
+class QueryStatsWrapper:
+    """Execute wrapper, installed on every connection, that reports into the active QueryStats"""
+
+    def __call__(self, execute, sql, params, many, context):
+        active = _active_stats.get()
+        if not active:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            for stats in active:
+                stats.add(sql, many, elapsed)
+
+
+def _install_query_stats_wrapper(sender, connection, **kwargs):
+    if not any(isinstance(wrapper, QueryStatsWrapper) for wrapper in connection.execute_wrappers):
+        # Insert rather than append, like slow_queries: the connection may be opened
+        # inside a `with connection.execute_wrapper(...)` block
+        connection.execute_wrappers.insert(0, QueryStatsWrapper())
+
+
+def install_query_stats():
+    """Attach QueryStatsWrapper to every connection opened from now on"""
+    connection_created.connect(_install_query_stats_wrapper, dispatch_uid='booking.middleware.query_stats')
+
+
+class PerformanceMetricsMiddleware:
+    """
+    Record latency, response size, database query count and database time for every request.
+    The numbers are exposed in Prometheus format at /api/metrics (admins only).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        start = time.perf_counter()
+        with collect_queries(stats):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, stats)
+        metrics.registry.flush()
+        return response
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with collect_queries(stats):
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, stats)
+        # Writing the snapshot is file I/O; keep it off the event loop
+        if metrics.registry.flush_due():
+            await sync_to_async(metrics.registry.flush)()
+        return response
+
+    def record(self, request, response, duration, stats):
+        view = get_view_label(request)
+        metrics.inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+        metrics.observe('http_request_duration_seconds', duration, view=view)
+        metrics.observe('db_queries_per_request', stats.count, view=view)
+        metrics.observe('db_time_seconds_per_request', stats.duration, view=view)
+        if not response.streaming:
+            metrics.observe('http_response_size_bytes', len(response.content), view=view)
+
+
+class ProfilingMiddleware:
+    """
+    Run a request under cProfile when an admin asks for it with the X-Profile header
+    (or the PROFILING_QUERY_PARAM query parameter). The pstats dump and the SQL captured
+    during the request are saved by booking.profiling and listed at /api/admin/profiles/.
+
+    Disabled unless PROFILING_ENABLED is set, in which case Django drops the middleware
+    entirely. When enabled, requests without the flag only pay for a header lookup.
+    Sync only: cProfile can't follow a request across awaits, so under ASGI enabling it
+    makes Django run the rest of the stack on a thread.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self._is_requested(request) or not self._is_admin(request):
+            return self.get_response(request)
+
+        from .profiling import save_profile
+
+        profiler = cProfile.Profile()
+        stats = QueryStats(capture_sql=True)
+        start = time.perf_counter()
+        with collect_queries(stats):
+            response = profiler.runcall(self.get_response, request)
+        duration = time.perf_counter() - start
+
+        try:
+            profile_id = save_profile(profiler, request, response, get_view_label(request), duration, stats.queries)
+            response['X-Profile-Id'] = profile_id
+        except Exception as e:
+            logger.error(f"Failed to save request profile: {str(e)}", exc_info=True)
+        return response
+
+    def _is_requested(self, request):
+        return request.headers.get('X-Profile') == '1' or settings.PROFILING_QUERY_PARAM in request.GET
+
+    def _is_admin(self, request):
+        """DRF authenticates inside the view, so check the JWT here ourselves"""
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            return False
+        return result is not None and result[0].role == 'admin'
+
+
+class TrafficCaptureMiddleware:
+    """
+    Record an anonymized trace of every /api/ request (see booking.traffic) so real traffic
+    can be replayed against a local instance with `python manage.py replay_traffic`.
+
+    Disabled unless TRAFFIC_CAPTURE_ENABLED is set, in which case Django drops the middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.TRAFFIC_CAPTURE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+
+        from . import traffic
+
+        # The body has to be read before DRF consumes the stream
+        body = traffic.read_body(request)
+        started_at = timezone.now()
+        start = time.perf_counter()
+        response = self.get_response(request)
+        traffic.record_request(request, body, response, started_at, time.perf_counter() - start, get_view_label(request))
+        return response
+
+    async def __acall__(self, request):
+        if not request.path.startswith('/api/'):
+            return await self.get_response(request)
+
+        from . import traffic
+
+        body = traffic.read_body(request)
+        started_at = timezone.now()
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        traffic.record_request(request, body, response, started_at, time.perf_counter() - start, get_view_label(request))
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    After a successful write by an authenticated user, pin that user's reads to the
+    primary for REPLICA_STICKY_SECONDS (see booking.db_router).
+
+    Dropped by Django unless REPLICA_DATABASE_URL is configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self._is_successful_write(request, response):
+            pin_to_primary(request.user)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._is_successful_write(request, response):
+            await sync_to_async(pin_to_primary)(request.user)
+        return response
+
+    def _is_successful_write(self, request, response):
+        # DRF sets request.user on the underlying request once it has authenticated
+        user = getattr(request, 'user', None)
+        return (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        )
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that also runs natively under ASGI. The stock middleware is
+    sync only, which would make Django run every request below it on a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class ReactShellMiddleware:
+    """
+    Answer GET/HEAD requests for React routes with the in-memory index.html (see
+    booking.react_shell) before the session, CSRF, auth and messages middleware run.
+
+    Dropped by Django in DEBUG, where the URLconf doesn't serve the React app either.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        # Load and compress the shell at startup rather than on the first visit
+        try:
+            react_shell.get_shell()
+        except OSError as e:
+            logger.warning(f"React shell not loaded: {str(e)}")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self._serve(request) or await self.get_response(request)
+
+    def _serve(self, request):
+        if request.method not in ('GET', 'HEAD') or not react_shell.is_react_route(request.path_info):
+            return None
+        try:
+            shell = react_shell.get_shell()
+        except OSError:
+            # Let serve_react_app report the missing build
+            return None
+        response = shell.response(request)
+        # XFrameOptionsMiddleware sits below this one and won't see the response
+        response['X-Frame-Options'] = getattr(settings, 'X_FRAME_OPTIONS', 'DENY')
+        return response
+
+
+class ApiCompressionMiddleware:
+    """
+    Compress /api/ responses of at least API_COMPRESSION_MIN_BYTES with brotli or gzip,
+    whichever the client prefers and is available (see booking.compression).
+
+    Small responses, including the login and token responses, are sent as-is.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.API_COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._compress(request, await self.get_response(request))
+
+    def _compress(self, request, response):
+        if (
+            not request.path_info.startswith('/api/')
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < settings.API_COMPRESSION_MIN_BYTES
+        ):
+            return response
+        # Whether or not it is compressed, the response depends on Accept-Encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        level = settings.API_COMPRESSION_BROTLI_QUALITY if encoding == 'br' else settings.API_COMPRESSION_GZIP_LEVEL
+        compressed = compression.compress(response.content, encoding, level)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The bytes changed, so a strong ETag no longer holds
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0008_booking_booking_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_type', models.CharField(choices=[('regular', 'Regular'), ('camp', 'Camp')], default='regular', max_length=20)),
+                ('frequency', models.CharField(choices=[('weekly', 'Weekly'), ('biweekly', 'Biweekly')], default='weekly', max_length=20)),
+                ('start_date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('until', models.DateField(blank=True, null=True)),
+                ('count', models.PositiveIntegerField(blank=True, null=True)),
+                ('exceptions', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('Active', 'Active'), ('Cancelled', 'Cancelled')], db_index=True, default='Active', max_length=20)),
+                ('materialized_until', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('rooms', models.ManyToManyField(related_name='booking_series', to='booking.room')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_series', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'booking series',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='booking.bookingseries'),
+        ),
+    ]
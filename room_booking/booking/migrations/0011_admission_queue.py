@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0010_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdmissionWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('opens_at', models.DateTimeField()),
+                ('closes_at', models.DateTimeField()),
+                ('rooms', models.ManyToManyField(related_name='admission_windows', to='booking.room')),
+            ],
+            options={
+                'ordering': ['-opens_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QueuedBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_ids', models.JSONField(default=list)),
+                ('start_datetime', models.DateTimeField()),
+                ('end_datetime', models.DateTimeField()),
+                ('booking_type', models.CharField(choices=[('regular', 'Regular'), ('camp', 'Camp')], default='regular', max_length=20)),
+                ('status', models.CharField(choices=[('Queued', 'Queued'), ('Booked', 'Booked'), ('Rejected', 'Rejected')], default='Queued', max_length=20)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('booking', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='booking.booking')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queued_bookings', to=settings.AUTH_USER_MODEL)),
+                ('window', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='requests', to='booking.admissionwindow')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='admissionwindow',
+            index=models.Index(fields=['closes_at', 'opens_at'], name='booking_admission_period'),
+        ),
+        migrations.AddIndex(
+            model_name='queuedbooking',
+            index=models.Index(fields=['status', 'id'], name='booking_queued_status_id'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-19 03:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+from collections import defaultdict
+from datetime import timedelta
+
+
+def count_existing_bookings(apps, schema_editor):
+    """
+    Fill the weekly usage counters from the existing bookings: minutes of active regular
+    bookings per user and week (starting Monday, local time) they start in
+    """
+    Booking = apps.get_model('booking', 'Booking')
+    WeeklyUsage = apps.get_model('booking', 'WeeklyUsage')
+    totals = defaultdict(int)
+    bookings = Booking.objects.filter(
+        status__in=['Pending', 'Approved'], booking_type='regular',
+        start_datetime__isnull=False, end_datetime__isnull=False,
+    ).values_list('user_id', 'start_datetime', 'end_datetime')
+    for user_id, start, end in bookings.iterator():
+        day = timezone.localtime(start).date()
+        totals[(user_id, day - timedelta(days=day.weekday()))] += int((end - start).total_seconds() // 60)
+    WeeklyUsage.objects.bulk_create(
+        [
+            WeeklyUsage(user_id=user_id, week_start=week, booked_minutes=minutes)
+            for (user_id, week), minutes in totals.items() if minutes
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0012_waitlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField()),
+                ('booked_minutes', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'weekly usage',
+                'ordering': ['-week_start'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'week_start'), name='booking_weekly_usage_user_week')],
+            },
+        ),
+        migrations.RunPython(count_existing_bookings, migrations.RunPython.noop),
+    ]
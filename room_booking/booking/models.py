@@ -1,6 +1,13 @@
-from django.db import models
+from collections import defaultdict
+from django.db import connections, models, router, transaction
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, Exists, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Greatest, Least
+from datetime import datetime, time, timedelta
+from .datetime_utils import localize, to_local
 
 class CustomUser(AbstractUser):
     
@@ -46,16 +53,212 @@ class Floor(models.Model):
         return self.name
 
 
+class RoomQuerySet(models.QuerySet):
+    def with_occupancy(self, now):
+        """
+        Annotate each room, in the same query, with occupied_now, next_booking_start and
+        booked_today (a timedelta, or None: time booked during today, local time)
+        """
+        booked = Booking.objects.active().filter(rooms=OuterRef('pk'))
+        today = to_local(now).date()
+        day_start = localize(datetime.combine(today, time.min))
+        day_end = localize(datetime.combine(today + timedelta(days=1), time.min))
+        booked_today = (
+            Booking.rooms.through.objects
+            .filter(
+                room_id=OuterRef('pk'),
+                booking__status__in=ACTIVE_BOOKING_STATUSES,
+                booking__start_datetime__lt=day_end,
+                booking__end_datetime__gt=day_start,
+            )
+            .values('room_id')
+            .annotate(total=Sum(ExpressionWrapper(
+                Least(F('booking__end_datetime'), Value(day_end)) - Greatest(F('booking__start_datetime'), Value(day_start)),
+                output_field=models.DurationField(),
+            )))
+            .values('total')
+        )
+        return self.annotate(
+            occupied_now=Exists(booked.filter(start_datetime__lte=now, end_datetime__gt=now)),
+            next_booking_start=Subquery(
+                booked.filter(start_datetime__gt=now).order_by('start_datetime').values('start_datetime')[:1]
+            ),
+            booked_today=Subquery(booked_today, output_field=models.DurationField()),
+        )
+
+
 class Room(models.Model):
     name = models.CharField(max_length=100)
     floor = models.ForeignKey(Floor, on_delete=models.CASCADE, related_name="rooms")
 
+    objects = RoomQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} (Floor {self.floor.name})"
 
 
 User = get_user_model()
 
+# Statuses that hold a room (cancelled bookings never block anything)
+ACTIVE_BOOKING_STATUSES = ['Pending', 'Approved']
+
+# The Booking fields that decide what it adds to WeeklyUsage (see booking_usage)
+USAGE_FIELDS = ('user_id', 'status', 'booking_type', 'start_datetime', 'end_datetime')
+_USAGE_UPDATE_FIELDS = {'user', *USAGE_FIELDS}
+# Queryset updates and deletes touching more bookings than this rebuild the affected
+# users' counters afterwards instead of diffing every row
+USAGE_DIFF_MAX_ROWS = 1000
+
+
+def week_start(moment):
+    """Monday (local date) of the week a datetime falls in"""
+    day = to_local(moment).date()
+    return day - timedelta(days=day.weekday())
+
+
+def booking_usage(user_id, status, booking_type, start_datetime, end_datetime):
+    """
+    (user id, week start, minutes) a booking adds to WeeklyUsage, or None: only active
+    regular bookings count, towards the week they start in
+    """
+    if status not in ACTIVE_BOOKING_STATUSES or booking_type != 'regular' or not (start_datetime and end_datetime):
+        return None
+    return user_id, week_start(start_datetime), int((end_datetime - start_datetime).total_seconds() // 60)
+
+
+def usage_deltas(removed=(), added=()):
+    """{(user id, week start): minutes} from booking_usage() entries taken away and added"""
+    deltas = defaultdict(int)
+    for entry in removed:
+        if entry:
+            deltas[entry[:2]] -= entry[2]
+    for entry in added:
+        if entry:
+            deltas[entry[:2]] += entry[2]
+    return {key: minutes for key, minutes in deltas.items() if minutes}
+
+
+class BookingQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(status__in=ACTIVE_BOOKING_STATUSES)
+
+    def overlapping(self, start, end):
+        """
+        Bookings whose time range overlaps [start, end).
+        When BOOKING_MAX_SPAN_DAYS is set, a lower bound on start_datetime is added so
+        PostgreSQL can prune old partitions instead of scanning the whole history.
+        """
+        queryset = self.filter(start_datetime__lt=end, end_datetime__gt=start)
+        max_span_days = getattr(settings, 'BOOKING_MAX_SPAN_DAYS', None)
+        if max_span_days:
+            queryset = queryset.filter(start_datetime__gt=start - timedelta(days=max_span_days))
+        return queryset
+
+    def overlapping_any(self, ranges):
+        """Bookings overlapping any of the [start, end) ranges, as one query (see overlapping)"""
+        ranges = list(ranges)
+        if not ranges:
+            return self.none()
+        condition = Q()
+        for start, end in ranges:
+            condition |= Q(start_datetime__lt=end, end_datetime__gt=start)
+        queryset = self.filter(condition)
+        max_span_days = getattr(settings, 'BOOKING_MAX_SPAN_DAYS', None)
+        if max_span_days:
+            earliest = min(start for start, _ in ranges)
+            queryset = queryset.filter(start_datetime__gt=earliest - timedelta(days=max_span_days))
+        return queryset
+
+    def bulk_create_with_rooms(self, bookings, room_ids):
+        """
+        Insert unsaved bookings and link booking i to the rooms in room_ids[i], with one
+        INSERT for the bookings and one for the room links. Returns the saved bookings.
+        """
+        if connections[self.db].features.can_return_rows_from_bulk_insert:
+            bookings = self.bulk_create(bookings)
+        else:
+            # MySQL doesn't hand back the new ids
+            for booking in bookings:
+                booking.save(using=self.db)
+        through = self.model.rooms.through
+        through.objects.using(self.db).bulk_create([
+            through(booking_id=booking.id, room_id=room_id)
+            for booking, rooms in zip(bookings, room_ids)
+            for room_id in sorted(rooms)
+        ])
+        return bookings
+
+    # The write methods below keep WeeklyUsage in step with the bookings, in the same
+    # transaction, so quota checks can read the counters instead of summing bookings
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            WeeklyUsage.objects.using(self.db).apply(usage_deltas(added=[booking.usage() for booking in objs]))
+        for booking in objs:
+            booking._usage_state = tuple(getattr(booking, field) for field in USAGE_FIELDS)
+        return objs
+
+    def update(self, **kwargs):
+        if not _USAGE_UPDATE_FIELDS & kwargs.keys():
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            before = list(self.values_list('pk', *USAGE_FIELDS)[:USAGE_DIFF_MAX_ROWS + 1])
+            if len(before) > USAGE_DIFF_MAX_ROWS:
+                return self._update_and_rebuild_usage(kwargs)
+            rows = super().update(**kwargs)
+            changes = {('user_id' if name == 'user' else name): value for name, value in kwargs.items()}
+            if any(hasattr(value, 'resolve_expression') for value in changes.values()):
+                after = Booking.objects.using(self.db).filter(pk__in=[row[0] for row in before]).values_list(*USAGE_FIELDS)
+            else:
+                # Plain values (e.g. status='Cancelled'): no need to read the rows back
+                if 'user_id' in changes:
+                    changes['user_id'] = getattr(changes['user_id'], 'pk', changes['user_id'])
+                after = [
+                    tuple(changes.get(field, value) for field, value in zip(USAGE_FIELDS, row[1:]))
+                    for row in before
+                ]
+            WeeklyUsage.objects.using(self.db).apply(usage_deltas(
+                removed=[booking_usage(*row[1:]) for row in before],
+                added=[booking_usage(*row) for row in after],
+            ))
+        return rows
+
+    update.alters_data = True
+
+    def _update_and_rebuild_usage(self, kwargs):
+        user_ids = set(self.order_by().values_list('user_id', flat=True).distinct())
+        rows = super().update(**kwargs)
+        new_user = kwargs.get('user', kwargs.get('user_id'))
+        if hasattr(new_user, 'resolve_expression'):
+            WeeklyUsage.objects.using(self.db).rebuild()
+            return rows
+        if new_user is not None:
+            user_ids.add(getattr(new_user, 'pk', new_user))
+        WeeklyUsage.objects.using(self.db).rebuild(user_ids)
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db, savepoint=False):
+            if not self.query.where:
+                # Every booking: the counters go with them
+                result = super().delete()
+                WeeklyUsage.objects.using(self.db).all().delete()
+                return result
+            removed = list(self.values_list(*USAGE_FIELDS)[:USAGE_DIFF_MAX_ROWS + 1])
+            if len(removed) > USAGE_DIFF_MAX_ROWS:
+                user_ids = set(self.order_by().values_list('user_id', flat=True).distinct())
+                result = super().delete()
+                WeeklyUsage.objects.using(self.db).rebuild(user_ids)
+                return result
+            result = super().delete()
+            WeeklyUsage.objects.using(self.db).apply(usage_deltas(removed=[booking_usage(*row) for row in removed]))
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Booking(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bookings")
     rooms = models.ManyToManyField("Room", related_name="bookings")
@@ -82,6 +285,12 @@ class Booking(models.Model):
         db_index=True,
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set on the occurrences of a recurring booking
+    series = models.ForeignKey(
+        'BookingSeries', on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences'
+    )
+
+    objects = BookingQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
@@ -92,3 +301,331 @@ class Booking(models.Model):
 
     def __str__(self):
         return f"Booking by {self.user.username} from {self.start_datetime} to {self.end_datetime}"
+
+    def usage(self):
+        """What this booking adds to WeeklyUsage: (user id, week start, minutes), or None"""
+        return booking_usage(*(getattr(self, field) for field in USAGE_FIELDS))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the stored row counts for, so save() and delete() can move the difference
+        if all(field in field_names for field in USAGE_FIELDS):
+            instance._usage_state = tuple(getattr(instance, field) for field in USAGE_FIELDS)
+        return instance
+
+    def _stored_usage(self, using):
+        if self._state.adding:
+            return None
+        state = getattr(self, '_usage_state', None)
+        if state is None:
+            # Loaded with deferred fields: read the stored values
+            state = Booking.objects.using(using).filter(pk=self.pk).values_list(*USAGE_FIELDS).first()
+        return booking_usage(*state) if state else None
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Booking, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            removed = self._stored_usage(using)
+            super().save(*args, **kwargs)
+            WeeklyUsage.objects.using(using).apply(usage_deltas(removed=[removed], added=[self.usage()]))
+        self._usage_state = tuple(getattr(self, field) for field in USAGE_FIELDS)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Booking, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            removed = self._stored_usage(using)
+            result = super().delete(*args, **kwargs)
+            WeeklyUsage.objects.using(using).apply(usage_deltas(removed=[removed]))
+        return result
+
+
+class BookingSeries(models.Model):
+    """
+    A booking that repeats every week or every other week from start_date, until a date
+    and/or for a number of occurrences, skipping the `exceptions` dates (like an RRULE
+    with UNTIL/COUNT and EXDATE: excepted dates still count towards `count`).
+
+    Occurrences only become Booking rows (series=self) as they come within
+    BOOKING_SERIES_HORIZON_DAYS; see booking/series.py.
+    """
+    FREQUENCY_CHOICES = [
+        ('weekly', 'Weekly'),
+        ('biweekly', 'Biweekly'),
+    ]
+    STATUS_CHOICES = [
+        ('Active', 'Active'),
+        ('Cancelled', 'Cancelled'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="booking_series")
+    rooms = models.ManyToManyField("Room", related_name="booking_series")
+    booking_type = models.CharField(max_length=20, choices=Booking.BOOKING_TYPE_CHOICES, default='regular')
+    frequency = models.CharField(max_length=20, choices=FREQUENCY_CHOICES, default='weekly')
+    start_date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    until = models.DateField(null=True, blank=True)
+    count = models.PositiveIntegerField(null=True, blank=True)
+    exceptions = models.JSONField(default=list, blank=True)  # 'YYYY-MM-DD' dates to skip
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Active', db_index=True)
+    # Last date whose occurrences exist as Booking rows
+    materialized_until = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name_plural = "booking series"
+
+    def __str__(self):
+        return f"{self.get_frequency_display()} booking by {self.user.username} from {self.start_date}"
+
+    @property
+    def interval(self):
+        return timedelta(weeks=2 if self.frequency == 'biweekly' else 1)
+
+    @property
+    def last_date(self):
+        """Date of the last occurrence the rule allows, or None if it never ends"""
+        candidates = []
+        if self.count:
+            candidates.append(self.start_date + self.interval * (self.count - 1))
+        if self.until and self.until >= self.start_date:
+            candidates.append(self.start_date + self.interval * ((self.until - self.start_date) // self.interval))
+        return min(candidates) if candidates else None
+
+    def occurrence_dates(self, first=None, last=None):
+        """Dates of the occurrences between first and last (inclusive), without exceptions"""
+        end = self.last_date
+        if last is not None and (end is None or last < end):
+            end = last
+        if end is None:
+            raise ValueError("An open-ended series needs a last date.")
+        day = self.start_date
+        if first is not None and first > day:
+            day += self.interval * -(-(first - day) // self.interval)
+        skipped = set(self.exceptions or [])
+        dates = []
+        while day <= end:
+            if day.isoformat() not in skipped:
+                dates.append(day)
+            day += self.interval
+        return dates
+
+    def occurrence_times(self, day):
+        """(start, end) aware datetimes of the occurrence on a date"""
+        return (
+            localize(datetime.combine(day, self.start_time)),
+            localize(datetime.combine(day, self.end_time)),
+        )
+
+
+class IdempotencyRecord(models.Model):
+    """
+    A request made with an Idempotency-Key header and, once it has finished, its response,
+    so a retry with the same key gets that response back. See booking/idempotency.py.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_records")
+    key = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, path and body
+    # Null while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_data = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='booking_idempotency_user_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.key})"
+
+
+class AdmissionWindow(models.Model):
+    """
+    A period (e.g. the first hours of camp registration) during which create_booking/
+    requests for its rooms are queued and booked in arrival order by
+    `python manage.py process_booking_queue`, instead of contending for the same rows.
+    See booking/admission.py.
+    """
+    name = models.CharField(max_length=100)
+    rooms = models.ManyToManyField(Room, related_name="admission_windows")
+    opens_at = models.DateTimeField()
+    closes_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-opens_at"]
+        indexes = [models.Index(fields=['closes_at', 'opens_at'], name='booking_admission_period')]
+
+    def __str__(self):
+        return f"{self.name} ({self.opens_at:%Y-%m-%d %H:%M} to {self.closes_at:%Y-%m-%d %H:%M})"
+
+
+class QueuedBooking(models.Model):
+    """A create_booking/ request received during an admission window, and its outcome"""
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Booked', 'Booked'),
+        ('Rejected', 'Rejected'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="queued_bookings")
+    window = models.ForeignKey(AdmissionWindow, on_delete=models.SET_NULL, null=True, blank=True, related_name="requests")
+    room_ids = models.JSONField(default=list)
+    start_datetime = models.DateTimeField()
+    end_datetime = models.DateTimeField()
+    booking_type = models.CharField(max_length=20, choices=Booking.BOOKING_TYPE_CHOICES, default='regular')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Queued')
+    # No database constraint: the booking table may be partitioned, and a partitioned table
+    # can't be referenced by a foreign key on `id` (see booking/partitioning.py)
+    booking = models.ForeignKey(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name="+", db_constraint=False
+    )
+    # Why a rejected request wasn't booked: {'detail', 'conflicts'}, as create_booking/'s 409
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # The consumer takes queued requests in arrival (id) order
+        indexes = [models.Index(fields=['status', 'id'], name='booking_queued_status_id')]
+
+    def __str__(self):
+        return f"{self.user.username}'s {self.booking_type} request at {self.created_at:%Y-%m-%d %H:%M:%S} ({self.status})"
+
+
+class WaitlistEntry(models.Model):
+    """
+    A user waiting for a room at a time that is booked. When a booking overlapping it is
+    cancelled, the first eligible entries get the booking automatically; see
+    booking/waitlist.py.
+    """
+    STATUS_CHOICES = [
+        ('Waiting', 'Waiting'),
+        ('Booked', 'Booked'),
+        ('Cancelled', 'Cancelled'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="waitlist_entries")
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="waitlist_entries")
+    start_datetime = models.DateTimeField()
+    end_datetime = models.DateTimeField()
+    booking_type = models.CharField(max_length=20, choices=Booking.BOOKING_TYPE_CHOICES, default='regular')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Waiting')
+    # No database constraint: the booking table may be partitioned, and a partitioned table
+    # can't be referenced by a foreign key on `id` (see booking/partitioning.py)
+    booking = models.ForeignKey(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name="+", db_constraint=False
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    fulfilled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        verbose_name_plural = "waitlist entries"
+        # Cancellation lookups: waiting entries on the freed rooms that start before it ends
+        indexes = [models.Index(fields=['room', 'status', 'start_datetime'], name='booking_waitlist_lookup')]
+
+    def __str__(self):
+        return f"{self.user.username} waiting for {self.room.name} at {self.start_datetime:%Y-%m-%d %H:%M} ({self.status})"
+
+
+class WeeklyUsageQuerySet(models.QuerySet):
+    # Counters per UPDATE in apply(); each adds an OR term, and SQLite limits expression depth
+    APPLY_CHUNK_SIZE = 100
+    # Users whose bookings rebuild() reads per query
+    REBUILD_USER_CHUNK_SIZE = 500
+
+    def _add(self, deltas):
+        """One UPDATE adding each counter's minutes; returns how many counters exist"""
+        if not deltas:
+            return 0
+        whens = [When(user_id=user_id, week_start=week, then=Value(minutes)) for (user_id, week), minutes in deltas.items()]
+        return self.filter(Q(*(Q(user_id=user_id, week_start=week) for user_id, week in deltas), _connector=Q.OR)).update(
+            booked_minutes=F('booked_minutes') + Case(*whens, default=Value(0), output_field=models.IntegerField())
+        )
+
+    def apply(self, deltas):
+        """
+        Add {(user id, week start): minutes} to the counters (negative minutes take away):
+        one UPDATE per APPLY_CHUNK_SIZE counters when they exist, which is the usual case
+        """
+        # In key order, so concurrent transactions lock counters in the same order
+        keys = sorted(deltas)
+        for offset in range(0, len(keys), self.APPLY_CHUNK_SIZE):
+            self._apply_chunk({key: deltas[key] for key in keys[offset:offset + self.APPLY_CHUNK_SIZE]})
+
+    def _apply_chunk(self, deltas):
+        updated = self._add(deltas)
+        if updated == len(deltas):
+            return
+        if updated:
+            existing = set(self.filter(user_id__in={user_id for user_id, _ in deltas}, week_start__in={week for _, week in deltas})
+                           .values_list('user_id', 'week_start'))
+            deltas = {key: minutes for key, minutes in deltas.items() if key not in existing}
+        # Create the missing counters at zero, then add: another transaction may create
+        # the same counter meanwhile, and then both additions must land
+        self.bulk_create([WeeklyUsage(user_id=user_id, week_start=week) for user_id, week in deltas], ignore_conflicts=True)
+        self._add(deltas)
+
+    def rebuild(self, user_ids=None):
+        """
+        Recompute the counters of user_ids (default: everyone) from their bookings, set-wise.
+        Returns {(user id, week start): minutes} as stored.
+        """
+        with transaction.atomic(using=self.db, savepoint=False):
+            if user_ids is None:
+                self.all().delete()
+                totals = weekly_totals(Booking.objects.using(self.db).values_list(*USAGE_FIELDS))
+            else:
+                user_ids = sorted(user_ids)
+                totals = {}
+                for offset in range(0, len(user_ids), self.REBUILD_USER_CHUNK_SIZE):
+                    chunk = user_ids[offset:offset + self.REBUILD_USER_CHUNK_SIZE]
+                    self.filter(user_id__in=chunk).delete()
+                    totals.update(weekly_totals(
+                        Booking.objects.using(self.db).filter(user_id__in=chunk).values_list(*USAGE_FIELDS)
+                    ))
+            self.bulk_create(
+                [WeeklyUsage(user_id=user_id, week_start=week, booked_minutes=minutes) for (user_id, week), minutes in totals.items()],
+                batch_size=1000,
+            )
+        return totals
+
+
+def weekly_totals(rows):
+    """{(user id, week start): minutes} for Booking USAGE_FIELDS rows, streamed from the database"""
+    totals = defaultdict(int)
+    for row in rows.order_by().iterator(chunk_size=2000):
+        usage = booking_usage(*row)
+        if usage:
+            totals[usage[:2]] += usage[2]
+    return {key: minutes for key, minutes in totals.items() if minutes}
+
+
+class WeeklyUsage(models.Model):
+    """
+    Minutes of active regular bookings per user and week (starting Monday, local time),
+    maintained by Booking and BookingQuerySet on every write. Quota checks and
+    auto-approval read these instead of the bookings; see booking/quotas.py.
+    `python manage.py rebuild_weekly_usage` recomputes them.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="weekly_usage")
+    week_start = models.DateField()
+    # Not Positive: a counter that drifted must not make a cancellation fail
+    booked_minutes = models.IntegerField(default=0)
+
+    objects = WeeklyUsageQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["-week_start"]
+        verbose_name_plural = "weekly usage"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'week_start'], name='booking_weekly_usage_user_week'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}, week of {self.week_start}: {self.booked_minutes / 60:g} h"
@@ -0,0 +1,415 @@
+"""
+Monthly range partitioning of the booking table (PostgreSQL only)
+
+Bookings are partitioned by month of start_datetime (UTC month boundaries). Rows outside
+every monthly partition land in a DEFAULT partition.
+
+PostgreSQL requires unique constraints on a partitioned table to include the partition
+key, so after conversion the primary key is (id, start_datetime): start_datetime becomes
+NOT NULL, ids still all come from one sequence, and no foreign key constraint can
+reference the booking table. The constraints into it (the rooms M2M
+table's) are dropped and replaced by triggers: inserting or updating a reference to a
+booking that doesn't exist fails with a foreign key violation, and deleting a booking
+applies each reference's on_delete (CASCADE or SET_NULL) in the database, like retiring a
+partition does.
+
+Conversion refuses to run while bookings have no start_datetime, or while one spans more
+than BOOKING_MAX_SPAN_DAYS: overlap queries only look that far back for the partition
+pruning bound (BookingQuerySet.overlapping), so they would miss it.
+
+A ForeignKey to Booking must be declared with db_constraint=False (the booking.E001
+check enforces it): a migration adding a constraint would fail on a partitioned database.
+The triggers are (re)installed after every `migrate`, so new references are covered.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import logging
+import math
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.db import DEFAULT_DB_ALIAS, connection, models
+from django.db.models import ExpressionWrapper, F, Max
+
+from .models import Booking
+
+logger = logging.getLogger(__name__)
+
+BOOKING_TABLE = Booking._meta.db_table
+ROOMS_TABLE = Booking.rooms.through._meta.db_table
+DEFAULT_PARTITION = f"{BOOKING_TABLE}_default"
+ID_SEQUENCE = f"{BOOKING_TABLE}_part_id_seq"
+DELETE_TRIGGER = f"{BOOKING_TABLE}_delete_references"
+
+# on_delete behaviours the triggers can apply in the database
+SUPPORTED_ON_DELETE = (models.CASCADE, models.SET_NULL, models.DO_NOTHING)
+
+_PARTITION_NAME_RE = re.compile(rf"^{BOOKING_TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def is_supported():
+    """Partitioning needs PostgreSQL declarative partitioning"""
+    return connection.vendor == 'postgresql'
+
+
+def month_start(value):
+    """First day of the month containing the given date/datetime"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Shift a first-of-month date by a number of months"""
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{BOOKING_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def _bound(month):
+    """Partition bound literal for the start of a month in UTC"""
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat()
+
+
+def is_partitioned(cursor):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [BOOKING_TABLE])
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions(cursor):
+    """Return {month: partition_name} for the monthly partitions currently attached"""
+    cursor.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        """,
+        [BOOKING_TABLE],
+    )
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        match = _PARTITION_NAME_RE.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def inbound_foreign_keys():
+    """(model, field) of every foreign key to Booking, including the rooms M2M table's"""
+    return [
+        (model, field)
+        for model in apps.get_models(include_auto_created=True)
+        for field in model._meta.local_concrete_fields
+        if field.many_to_one and field.remote_field.model is Booking
+    ]
+
+
+@register(Tags.models, Tags.database)
+def check_inbound_foreign_keys(app_configs, **kwargs):
+    errors = []
+    for model, field in inbound_foreign_keys():
+        if model is Booking.rooms.through:
+            continue
+        if field.db_constraint:
+            errors.append(
+                Error(
+                    f"{model._meta.label}.{field.name} references Booking with a database constraint, "
+                    "which can't be created once the booking table is partitioned.",
+                    hint="Declare it with db_constraint=False; see booking/partitioning.py.",
+                    obj=field,
+                    id='booking.E001',
+                )
+            )
+        if field.remote_field.on_delete not in SUPPORTED_ON_DELETE:
+            errors.append(
+                Error(
+                    f"{model._meta.label}.{field.name} references Booking with on_delete="
+                    f"{field.remote_field.on_delete.__name__}, which the partitioned booking table's "
+                    "triggers can't apply.",
+                    hint="Use CASCADE, SET_NULL or DO_NOTHING.",
+                    obj=field,
+                    id='booking.E001',
+                )
+            )
+    return errors
+
+
+def _apply_on_delete(bookings):
+    """SQL applying each reference's on_delete to the rows referencing `bookings` (SQL for their ids)"""
+    qn = connection.ops.quote_name
+    statements = []
+    for model, field in inbound_foreign_keys():
+        table, column = qn(model._meta.db_table), qn(field.column)
+        if field.remote_field.on_delete is models.CASCADE:
+            statements.append(f"DELETE FROM {table} WHERE {column} IN ({bookings})")
+        elif field.remote_field.on_delete is models.SET_NULL:
+            statements.append(f"UPDATE {table} SET {column} = NULL WHERE {column} IN ({bookings})")
+    return statements
+
+
+def install_integrity_triggers(run):
+    """
+    (Re)create the triggers standing in for the foreign keys into the partitioned booking
+    table: one checking the references of each referencing table, one applying on_delete.
+    """
+    qn = connection.ops.quote_name
+    for model, field in inbound_foreign_keys():
+        table, column = model._meta.db_table, qn(field.column)
+        name = f"{table}_{field.column}_exists"[:63]
+        run(
+            f"CREATE OR REPLACE FUNCTION {qn(name)}() RETURNS trigger AS $$\n"
+            f"BEGIN\n"
+            f"    IF NEW.{column} IS NOT NULL THEN\n"
+            f"        PERFORM 1 FROM {qn(BOOKING_TABLE)} WHERE id = NEW.{column} FOR KEY SHARE;\n"
+            f"        IF NOT FOUND THEN\n"
+            f"            RAISE EXCEPTION 'insert or update on table \"{table}\" references booking %, "
+            f"which does not exist', NEW.{column} USING ERRCODE = 'foreign_key_violation';\n"
+            f"        END IF;\n"
+            f"    END IF;\n"
+            f"    RETURN NEW;\n"
+            f"END $$ LANGUAGE plpgsql"
+        )
+        run(f"DROP TRIGGER IF EXISTS {qn(name)} ON {qn(table)}")
+        run(
+            f"CREATE TRIGGER {qn(name)} BEFORE INSERT OR UPDATE OF {column} ON {qn(table)} "
+            f"FOR EACH ROW EXECUTE FUNCTION {qn(name)}()"
+        )
+
+    # AFTER triggers run at the end of the statement: a booking moved to another partition
+    # by an update of its start_datetime is deleted and inserted again by then, and keeps
+    # its references
+    actions = ''.join(f"    {statement};\n" for statement in _apply_on_delete('OLD.id'))
+    run(
+        f"CREATE OR REPLACE FUNCTION {qn(DELETE_TRIGGER)}() RETURNS trigger AS $$\n"
+        f"BEGIN\n"
+        f"    PERFORM 1 FROM {qn(BOOKING_TABLE)} WHERE id = OLD.id;\n"
+        f"    IF FOUND THEN\n"
+        f"        RETURN NULL;\n"
+        f"    END IF;\n"
+        f"{actions}"
+        f"    RETURN NULL;\n"
+        f"END $$ LANGUAGE plpgsql"
+    )
+    run(f"DROP TRIGGER IF EXISTS {qn(DELETE_TRIGGER)} ON {qn(BOOKING_TABLE)}")
+    run(
+        f"CREATE TRIGGER {qn(DELETE_TRIGGER)} AFTER DELETE ON {qn(BOOKING_TABLE)} "
+        f"FOR EACH ROW EXECUTE FUNCTION {qn(DELETE_TRIGGER)}()"
+    )
+
+
+def install_triggers_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """post_migrate receiver: cover the references added by the migrations just applied"""
+    if using != DEFAULT_DB_ALIAS or not is_supported():
+        return
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            install_integrity_triggers(cursor.execute)
+
+
+def create_partition(cursor, run, month):
+    """
+    Create the partition for one month.
+    Rows already sitting in the DEFAULT partition for that month are moved into the new
+    partition, otherwise PostgreSQL refuses to attach it.
+    """
+    qn = connection.ops.quote_name
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+
+    stray_rows = 0
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [DEFAULT_PARTITION])
+    if cursor.fetchone()[0]:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {qn(DEFAULT_PARTITION)} WHERE start_datetime >= %s AND start_datetime < %s",
+            [lower, upper],
+        )
+        stray_rows = cursor.fetchone()[0]
+
+    if stray_rows:
+        run(
+            f"CREATE TEMP TABLE _booking_moved ON COMMIT DROP AS "
+            f"SELECT * FROM {qn(DEFAULT_PARTITION)} WHERE start_datetime >= %s AND start_datetime < %s",
+            [lower, upper],
+        )
+        run(
+            f"DELETE FROM {qn(DEFAULT_PARTITION)} WHERE start_datetime >= %s AND start_datetime < %s",
+            [lower, upper],
+        )
+    run(
+        f"CREATE TABLE {qn(partition_name(month))} PARTITION OF {qn(BOOKING_TABLE)} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        [lower, upper],
+    )
+    if stray_rows:
+        run(f"INSERT INTO {qn(BOOKING_TABLE)} SELECT * FROM _booking_moved")
+        run("DROP TABLE _booking_moved")
+
+
+def ensure_partitions(cursor, run, first_month, last_month):
+    """Create any missing monthly partitions between first_month and last_month (inclusive)"""
+    existing = list_partitions(cursor)
+    created = []
+    month = first_month
+    while month <= last_month:
+        if month not in existing:
+            create_partition(cursor, run, month)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def conversion_blockers():
+    """Why the existing bookings can't be converted yet, as messages (empty when they can)"""
+    problems = []
+    missing_start = Booking.objects.filter(start_datetime__isnull=True).count()
+    if missing_start:
+        problems.append(
+            f"{missing_start} booking(s) have no start_datetime, which becomes part of the primary key. "
+            "Set it or delete them."
+        )
+    max_span_days = getattr(settings, 'BOOKING_MAX_SPAN_DAYS', None)
+    if max_span_days:
+        longest = Booking.objects.aggregate(longest=Max(ExpressionWrapper(
+            F('end_datetime') - F('start_datetime'), output_field=models.DurationField(),
+        )))['longest']
+        if longest and longest > timedelta(days=max_span_days):
+            problems.append(
+                f"The longest booking spans {math.ceil(longest / timedelta(days=1))} days, "
+                f"more than BOOKING_MAX_SPAN_DAYS ({max_span_days}), so conflict checks would miss it. "
+                "Raise BOOKING_MAX_SPAN_DAYS."
+            )
+    return problems
+
+
+def convert_to_partitioned(cursor, run, months_ahead, keep_legacy=False):
+    """
+    Rebuild booking_booking as a partitioned table and copy every existing row into it.
+    Must run inside a transaction; the table is locked for the duration of the copy.
+    Raises ValueError if the bookings can't be converted (see conversion_blockers).
+    """
+    qn = connection.ops.quote_name
+    legacy_table = f"{BOOKING_TABLE}_legacy"
+
+    # Keep the rows as they are checked here until they are copied
+    run(f"LOCK TABLE {qn(BOOKING_TABLE)} IN SHARE ROW EXCLUSIVE MODE")
+    problems = conversion_blockers()
+    if problems:
+        raise ValueError("Refusing to convert: " + ' '.join(problems))
+
+    # Secondary indexes to recreate on the new parent (they cascade to every partition)
+    cursor.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = to_regclass(%s) AND NOT x.indisprimary AND NOT x.indisunique
+        """,
+        [BOOKING_TABLE],
+    )
+    indexes = cursor.fetchall()
+
+    # Foreign keys from the booking table (user_id) are kept
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'f' AND conrelid = to_regclass(%s)",
+        [BOOKING_TABLE],
+    )
+    outbound_fks = cursor.fetchall()
+
+    # Foreign keys into the booking table (the rooms M2M table) cannot reference `id` alone:
+    # they are replaced by triggers, which only know the references declared on models
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = to_regclass(%s)",
+        [BOOKING_TABLE],
+    )
+    inbound_fks = cursor.fetchall()
+    known_tables = {qn(model._meta.db_table) for model, _ in inbound_foreign_keys()}
+    unknown = [f"{table}.{constraint}" for table, constraint in inbound_fks if qn(table) not in known_tables]
+    if unknown:
+        raise ValueError(
+            "Refusing to convert: foreign keys reference the booking table from outside the booking "
+            f"models ({', '.join(unknown)}). Drop them first."
+        )
+
+    cursor.execute(
+        f"SELECT MIN(start_datetime), COALESCE(MAX(id), 0) FROM {qn(BOOKING_TABLE)}"
+    )
+    oldest_start, max_id = cursor.fetchone()
+
+    for table, constraint in inbound_fks:
+        run(f"ALTER TABLE {table} DROP CONSTRAINT {qn(constraint)}")
+
+    run(f"ALTER TABLE {qn(BOOKING_TABLE)} RENAME TO {qn(legacy_table)}")
+    for index_name, _ in indexes:
+        run(f"ALTER INDEX {qn(index_name)} RENAME TO {qn(('legacy_' + index_name)[:63])}")
+
+    run(
+        f"CREATE TABLE {qn(BOOKING_TABLE)} (LIKE {qn(legacy_table)} INCLUDING DEFAULTS) "
+        f"PARTITION BY RANGE (start_datetime)"
+    )
+    run(f"CREATE SEQUENCE {qn(ID_SEQUENCE)} OWNED BY {qn(BOOKING_TABLE)}.id")
+    run(f"ALTER TABLE {qn(BOOKING_TABLE)} ALTER COLUMN id SET DEFAULT nextval('{ID_SEQUENCE}')")
+    run(f"SELECT setval('{ID_SEQUENCE}', %s, false)", [max_id + 1])
+    run(f"ALTER TABLE {qn(BOOKING_TABLE)} ALTER COLUMN start_datetime SET NOT NULL")
+    run(
+        f"ALTER TABLE {qn(BOOKING_TABLE)} ADD CONSTRAINT {qn(BOOKING_TABLE + '_id_start_pkey')} "
+        f"PRIMARY KEY (id, start_datetime)"
+    )
+    for _, definition in indexes:
+        run(definition)
+    for constraint, definition in outbound_fks:
+        run(f"ALTER TABLE {qn(BOOKING_TABLE)} ADD CONSTRAINT {qn(constraint)} {definition}")
+
+    run(f"CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(BOOKING_TABLE)} DEFAULT")
+
+    today = month_start(datetime.now(dt_timezone.utc))
+    first_month = month_start(oldest_start) if oldest_start else today
+    ensure_partitions(cursor, run, min(first_month, today), add_months(today, months_ahead))
+
+    run(f"INSERT INTO {qn(BOOKING_TABLE)} SELECT * FROM {qn(legacy_table)}")
+    if not keep_legacy:
+        run(f"DROP TABLE {qn(legacy_table)}")
+    install_integrity_triggers(run)
+
+
+def retire_partitions(cursor, run, before_month, archive_schema=None, drop=False):
+    """
+    Detach monthly partitions that end on or before `before_month`.
+    Detached bookings (and their room links) are either moved into `archive_schema`
+    or dropped, and the other references to them are cleared as if the bookings were
+    deleted. Returns the names of the partitions that were retired.
+    """
+    qn = connection.ops.quote_name
+    retired = []
+
+    for month, name in sorted(list_partitions(cursor).items()):
+        if add_months(month, 1) > before_month:
+            continue
+
+        run(f"ALTER TABLE {qn(BOOKING_TABLE)} DETACH PARTITION {qn(name)}")
+        if drop:
+            retired_table = qn(name)
+        else:
+            schema = archive_schema or 'booking_archive'
+            links_table = f"{ROOMS_TABLE}_y{month.year:04d}m{month.month:02d}"
+            retired_table = f"{qn(schema)}.{qn(name)}"
+            run(f"CREATE SCHEMA IF NOT EXISTS {qn(schema)}")
+            run(f"ALTER TABLE {qn(name)} SET SCHEMA {qn(schema)}")
+            run(
+                f"CREATE TABLE {qn(schema)}.{qn(links_table)} AS "
+                f"SELECT r.* FROM {qn(ROOMS_TABLE)} r "
+                f"WHERE r.booking_id IN (SELECT id FROM {retired_table})"
+            )
+        # Detaching doesn't fire the delete trigger
+        for statement in _apply_on_delete(f"SELECT id FROM {retired_table}"):
+            run(statement)
+        if drop:
+            run(f"DROP TABLE {retired_table}")
+        retired.append(name)
+        logger.info(f"Retired booking partition {name} ({'dropped' if drop else 'archived'})")
+
+    return retired
@@ -0,0 +1,96 @@
+"""
+Storage for on-demand request profiles
+
+A profile is two files in PROFILING_DIR sharing the same id:
+    <id>.prof  - cProfile/pstats dump (open with `python -m pstats` or snakeviz)
+    <id>.json  - request details plus every SQL statement with its duration
+"""
+from django.conf import settings
+from django.utils import timezone
+import json
+import logging
+import os
+import re
+import secrets
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}T[0-9]{6}-[A-Za-z0-9_.-]+-[0-9a-f]{8}$')
+
+
+def get_profiling_dir():
+    return settings.PROFILING_DIR or os.path.join(tempfile.gettempdir(), 'grfs-profiles')
+
+
+def is_valid_profile_id(profile_id):
+    return bool(PROFILE_ID_RE.match(profile_id or ''))
+
+
+def get_profile_path(profile_id, extension):
+    """Path of one of a profile's files, or None if the id is malformed"""
+    if not is_valid_profile_id(profile_id) or extension not in ('prof', 'json'):
+        return None
+    return os.path.join(get_profiling_dir(), f"{profile_id}.{extension}")
+
+
+def save_profile(profiler, request, response, view, duration, queries):
+    """Write the pstats dump and SQL capture for one request; returns the profile id"""
+    directory = get_profiling_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    safe_view = re.sub(r'[^A-Za-z0-9_.-]', '_', view)[:60] or 'view'
+    profile_id = f"{timezone.now().strftime('%Y%m%dT%H%M%S')}-{safe_view}-{secrets.token_hex(4)}"
+
+    profiler.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+    details = {
+        'id': profile_id,
+        'created_at': timezone.now().isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': view,
+        'status_code': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'query_count': len(queries),
+        'query_time_ms': round(sum(query['duration_ms'] for query in queries), 3),
+        'queries': queries,
+    }
+    with open(os.path.join(directory, f"{profile_id}.json"), 'w') as f:
+        json.dump(details, f, indent=2)
+
+    _prune(directory)
+    return profile_id
+
+
+def list_profiles():
+    """Summaries of the stored profiles, newest first"""
+    directory = get_profiling_dir()
+    try:
+        filenames = sorted((name for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+    except FileNotFoundError:
+        return []
+
+    profiles = []
+    for filename in filenames:
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                details = json.load(f)
+        except (OSError, ValueError):
+            continue
+        details.pop('queries', None)
+        profiles.append(details)
+    return profiles
+
+
+def _prune(directory):
+    """Keep only the newest PROFILING_MAX_PROFILES profiles"""
+    profile_ids = sorted(
+        {name.rsplit('.', 1)[0] for name in os.listdir(directory) if name.endswith(('.prof', '.json'))},
+        reverse=True,
+    )
+    for profile_id in profile_ids[settings.PROFILING_MAX_PROFILES:]:
+        for extension in ('prof', 'json'):
+            try:
+                os.remove(os.path.join(directory, f"{profile_id}.{extension}"))
+            except OSError as e:
+                logger.warning(f"Failed to remove old profile {profile_id}.{extension}: {str(e)}")
@@ -0,0 +1,104 @@
+"""
+Weekly booking quotas
+
+Every active regular booking counts towards its user's week (Monday to Sunday, local
+time, by start) in WeeklyUsage. Booking.save()/delete() and the BookingQuerySet write
+methods (bulk_create, update, delete) move the counters in the same transaction as the
+booking change, so a quota check reads one counter row instead of summing the user's
+bookings:
+
+- past BOOKING_AUTO_APPROVE_WEEKLY_HOURS, new bookings are left Pending for an admin
+  instead of auto-approved,
+- past BOOKING_WEEKLY_HOURS_LIMIT, they are refused.
+
+Camps don't count (they always need approval anyway), and admins and coordinators are
+exempt. `python manage.py rebuild_weekly_usage` recomputes the counters from the bookings.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from .db_router import PRIMARY
+from .models import WeeklyUsage, booking_usage, week_start
+
+User = get_user_model()
+
+QUOTA_EXEMPT_ROLES = ('admin', 'coordinator')
+
+
+class QuotaExceeded(ValueError):
+    pass
+
+
+def quotas_enabled():
+    return bool(settings.BOOKING_WEEKLY_HOURS_LIMIT or settings.BOOKING_AUTO_APPROVE_WEEKLY_HOURS)
+
+
+def user_roles(user_ids):
+    """{user id: role}, for WeeklyUsageTracker in the paths that book for several users"""
+    return dict(User.objects.using(PRIMARY).filter(id__in=set(user_ids)).values_list('id', 'role'))
+
+
+class WeeklyUsageTracker:
+    """
+    The counters of the users' weeks being booked, plus what is admitted through the
+    tracker, so a batch of bookings is checked against its own earlier items too.
+
+    Use it inside the transaction.atomic() block that writes the bookings: the counter
+    rows are locked (select_for_update) until it commits, so concurrent bookings by the
+    same user in the same week are checked one after the other instead of both passing.
+    """
+
+    def __init__(self, roles, requests, using=PRIMARY):
+        """requests: (user id, booking type, start) of the bookings to admit or release"""
+        self.roles = roles
+        self.minutes = defaultdict(int)
+        self.keys = {
+            (user_id, week_start(start))
+            for user_id, booking_type, start in requests
+            if start and booking_type == 'regular' and roles.get(user_id) not in QUOTA_EXEMPT_ROLES
+        }
+        if not self.keys or not quotas_enabled():
+            return
+        counters = WeeklyUsage.objects.using(using)
+        # A missing counter can't be locked: create it at zero first
+        counters.bulk_create(
+            [WeeklyUsage(user_id=user_id, week_start=week) for user_id, week in sorted(self.keys)],
+            ignore_conflicts=True,
+        )
+        # In key order, like WeeklyUsageQuerySet.apply(), so transactions lock in the same order
+        self.minutes.update(
+            ((user_id, week), minutes)
+            for user_id, week, minutes in counters.select_for_update()
+            .filter(user_id__in={user_id for user_id, _ in self.keys}, week_start__in={week for _, week in self.keys})
+            .order_by('user_id', 'week_start')
+            .values_list('user_id', 'week_start', 'booked_minutes')
+        )
+
+    def release(self, booking):
+        """Stop counting an existing booking, which is about to be changed"""
+        usage = booking.usage()
+        if usage and usage[:2] in self.keys:
+            self.minutes[usage[:2]] -= usage[2]
+
+    def admit(self, user_id, booking_type, start, end, status):
+        """
+        Count a new or changed booking with the given initial status. Returns the status it
+        should get (Pending once past the auto-approval hours); raises QuotaExceeded past
+        the limit.
+        """
+        usage = booking_usage(user_id, status, booking_type, start, end)
+        if usage is None or self.roles.get(user_id) in QUOTA_EXEMPT_ROLES or not quotas_enabled():
+            return status
+        key, minutes = usage[:2], usage[2]
+        total = self.minutes[key] + minutes
+        limit = settings.BOOKING_WEEKLY_HOURS_LIMIT
+        if limit and total > limit * 60:
+            raise QuotaExceeded(
+                f"This booking would exceed the limit of {limit:g} hours of bookings "
+                f"in the week of {key[1].strftime('%B %d, %Y')}."
+            )
+        auto_approve = settings.BOOKING_AUTO_APPROVE_WEEKLY_HOURS
+        if auto_approve and total > auto_approve * 60:
+            status = 'Pending'
+        self.minutes[key] = total
+        return status
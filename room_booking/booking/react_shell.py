@@ -0,0 +1,100 @@
+"""
+In-memory React shell
+
+Every client-side route is answered with the frontend build's index.html. Instead of
+rendering it through the template engine on each request, it is read once, compressed
+with gzip (and brotli when the brotli package is installed) and served from memory with a
+strong ETag, so repeat visits get a 304. The file is stat'ed again at most every
+REACT_SHELL_CHECK_INTERVAL seconds, which picks up a rebuilt frontend without a restart.
+
+ReactShellMiddleware (booking.middleware) answers these routes before the session, CSRF,
+auth and messages middleware run; serve_react_app uses the same cache for anything that
+still reaches the URLconf.
+"""
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+from .compression import ENCODINGS, choose_encoding, compress
+import hashlib
+import os
+import re
+import threading
+import time
+
+# Paths (without the leading slash) that belong to the React app rather than Django
+REACT_ROUTE_PATTERN = r'^(?!api/|admin/|static/|media/|favicon\.ico|robots\.txt|manifest\.json).*$'
+REACT_ROUTE_RE = re.compile(REACT_ROUTE_PATTERN)
+
+_lock = threading.Lock()
+_shell = None
+_checked_at = 0.0
+
+
+def get_shell_path():
+    return os.path.join(settings.BASE_DIR, 'booking', 'templates', 'index.html')
+
+
+def is_react_route(path_info):
+    return REACT_ROUTE_RE.match(path_info.lstrip('/')) is not None
+
+
+class ReactShell:
+    """index.html with its precompressed variants, each with its own strong ETag"""
+
+    def __init__(self, content, mtime):
+        self.mtime = mtime
+        self.last_modified = http_date(mtime)
+        digest = hashlib.sha256(content).hexdigest()[:20]
+        self.variants = {None: (content, f'"{digest}"')}
+        for encoding in ENCODINGS:
+            body = compress(content, encoding)
+            # Tiny files can grow when compressed
+            if len(body) < len(content):
+                self.variants[encoding] = (body, f'"{digest}-{encoding}"')
+        self.etags = {etag for _, etag in self.variants.values()}
+
+    def response(self, request):
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.variants)
+        body, etag = self.variants[encoding]
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            client_etags = parse_etags(if_none_match)
+            if '*' in client_etags or self.etags.intersection(client_etags):
+                response = HttpResponseNotModified()
+                self._set_headers(response, etag)
+                return response
+
+        response = HttpResponse(b'' if request.method == 'HEAD' else body, content_type='text/html; charset=utf-8')
+        self._set_headers(response, etag)
+        response['Content-Length'] = str(len(body))
+        if encoding:
+            response['Content-Encoding'] = encoding
+        return response
+
+    def _set_headers(self, response, etag):
+        response['ETag'] = etag
+        response['Last-Modified'] = self.last_modified
+        # Hashed bundles can be cached forever; the shell that names them must be revalidated
+        response['Cache-Control'] = 'no-cache'
+        response['Vary'] = 'Accept-Encoding'
+
+
+def get_shell():
+    """
+    The cached ReactShell, reloaded when index.html has changed on disk. Raises OSError
+    if the file is missing.
+    """
+    global _shell, _checked_at
+    now = time.monotonic()
+    if _shell is not None and now - _checked_at < settings.REACT_SHELL_CHECK_INTERVAL:
+        return _shell
+    with _lock:
+        if _shell is None or now - _checked_at >= settings.REACT_SHELL_CHECK_INTERVAL:
+            path = get_shell_path()
+            mtime = os.stat(path).st_mtime
+            if _shell is None or _shell.mtime != mtime:
+                with open(path, 'rb') as f:
+                    _shell = ReactShell(f.read(), mtime)
+            _checked_at = now
+    return _shell
@@ -1,9 +1,47 @@
 from rest_framework import serializers
-from .models import Booking, Room, Floor
+from rest_framework.relations import MANY_RELATION_KWARGS
+from .models import Booking, BookingSeries, QueuedBooking, Room, Floor, WaitlistEntry
+from .quotas import QuotaExceeded, WeeklyUsageTracker
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
 
 User = get_user_model()
 
+# Roles allowed to book camps (multi-day bookings)
+CAMP_BOOKING_ROLES = ['mentor', 'coordinator', 'admin']
+
+
+def booking_window_error(booking_type, start_datetime, end_datetime, now):
+    """
+    The create_booking/ time rules: end after start, not in the past and, for regular
+    bookings, between 1 and 8 hours. Returns the message for the first rule broken, or None.
+    """
+    if end_datetime <= start_datetime:
+        return "End datetime must be after start datetime."
+    if start_datetime < now:
+        return "Cannot create bookings in the past."
+    # For camp bookings, skip duration validation (they can span multiple days)
+    if booking_type != 'camp':
+        if (end_datetime - start_datetime) > timedelta(hours=8):
+            return "Booking duration cannot exceed 8 hours."
+        if (end_datetime - start_datetime) < timedelta(hours=1):
+            return "Booking duration must be at least 1 hour."
+    return None
+
+
+def initial_booking_status(booking_type, start_datetime, end_datetime, room_count):
+    """
+    Status of a new booking. Camps always need admin approval; regular bookings are
+    auto-approved when shorter than 8 hours and for at most 2 rooms.
+    """
+    if booking_type == 'camp' or not (start_datetime and end_datetime):
+        return 'Pending'
+    duration_hours = (end_datetime - start_datetime).total_seconds() / 3600
+    return 'Approved' if duration_hours < 8 and room_count <= 2 else 'Pending'
+
+
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8) # Hide password in responses, enforce minimum length
     
@@ -154,6 +192,45 @@ class UserSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"detail": f"Failed to create user: {str(e)}"})
         
 
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """ManyRelatedField that loads every related object with one query instead of one per id"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        for pk in data:
+            if isinstance(pk, bool) or not isinstance(pk, (int, str)):
+                child.fail('incorrect_type', data_type=type(pk).__name__)
+        try:
+            objects = {str(obj.pk): obj for obj in child.get_queryset().filter(pk__in=data)}
+        except (TypeError, ValueError):
+            child.fail('incorrect_type', data_type=type(data).__name__)
+
+        values = []
+        for pk in data:
+            obj = objects.get(str(pk))
+            if obj is None:
+                child.fail('does_not_exist', pk_value=pk)
+            values.append(obj)
+        return values
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField whose many=True form validates all ids in a single query"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
 class FloorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Floor
@@ -169,10 +246,22 @@ class RoomSerializer(serializers.ModelSerializer):
         model = Room
         fields = ['id', 'name', 'floor', 'floor_id']
 
+class RoomOccupancySerializer(RoomSerializer):
+    """RoomSerializer plus the RoomQuerySet.with_occupancy annotations"""
+    occupied_now = serializers.BooleanField(read_only=True)
+    next_booking_start = serializers.DateTimeField(read_only=True)
+    booked_minutes_today = serializers.SerializerMethodField()
+
+    class Meta(RoomSerializer.Meta):
+        fields = RoomSerializer.Meta.fields + ['occupied_now', 'next_booking_start', 'booked_minutes_today']
+
+    def get_booked_minutes_today(self, room):
+        return int(room.booked_today.total_seconds() // 60) if room.booked_today else 0
+
 class BookingSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     rooms = RoomSerializer(many=True, read_only=True)
-    room_ids = serializers.PrimaryKeyRelatedField(
+    room_ids = BulkPrimaryKeyRelatedField(
         queryset=Room.objects.all(), many=True, write_only=True, source='rooms', required=False
     )
 
@@ -206,40 +295,158 @@ class BookingSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({
                     'end_datetime': 'End datetime must be after start datetime.'
                 })
+            # Overlap queries assume no booking is longer than BOOKING_MAX_SPAN_DAYS
+            # (this is what lets them prune old partitions), so enforce it here
+            max_span_days = getattr(settings, 'BOOKING_MAX_SPAN_DAYS', None)
+            if max_span_days and (end_datetime - start_datetime) > timedelta(days=max_span_days):
+                raise serializers.ValidationError({
+                    'end_datetime': f'Bookings cannot span more than {max_span_days} days.'
+                })
+
+        if 'request' in self.context:
+            self._check_weekly_quota(data)
         
         return data
 
+    def _check_weekly_quota(self, data):
+        """
+        Apply the weekly quota (booking/quotas.py) from the usage counters; for a new
+        booking this also decides its status
+        """
+        booking = self.instance
+        owner = booking.user if booking else self.context['request'].user
+        start_datetime = data.get('start_datetime', booking.start_datetime if booking else None)
+        end_datetime = data.get('end_datetime', booking.end_datetime if booking else None)
+        booking_type = data.get('booking_type', booking.booking_type if booking else 'regular')
+        if booking:
+            status = booking.status
+        else:
+            rooms = data.get('rooms', [])  # room_ids maps to 'rooms' via source, returns Room objects
+            status = initial_booking_status(booking_type, start_datetime, end_datetime, len(rooms) if rooms else 0)
+
+        requests = [(owner.id, booking_type, start_datetime)]
+        if booking:
+            requests.append((owner.id, booking.booking_type, booking.start_datetime))
+        # Locks the counters: the view must validate and save in one transaction
+        tracker = WeeklyUsageTracker({owner.id: owner.role}, requests)
+        if booking:
+            tracker.release(booking)
+        try:
+            status = tracker.admit(owner.id, booking_type, start_datetime, end_datetime, status)
+        except QuotaExceeded as e:
+            raise serializers.ValidationError({'detail': str(e)})
+        if not booking:
+            data['status'] = status
+
     def create(self, validated_data):
         """Automatically assign the logged-in user when creating a booking"""
-        from datetime import timedelta
-        
         user = self.context['request'].user
         validated_data['user'] = user
         
-        # Get booking type (default to 'regular' if not provided)
-        booking_type = validated_data.get('booking_type', 'regular')
-        
-        # Camp bookings always require admin approval
-        if booking_type == 'camp':
-            validated_data['status'] = 'Pending'
-        else:
-            # Determine booking status based on duration and number of rooms for regular bookings
-            # Auto-approve if: duration < 6 hours AND rooms <= 2
-            # Otherwise, require manual approval (Pending)
-            start_datetime = validated_data.get('start_datetime')
-            end_datetime = validated_data.get('end_datetime')
+        if 'status' not in validated_data:
             rooms = validated_data.get('rooms', [])  # room_ids maps to 'rooms' via source, returns Room objects
-            
-            if start_datetime and end_datetime:
-                booking_duration = end_datetime - start_datetime
-                duration_hours = booking_duration.total_seconds() / 3600
-                num_rooms = len(rooms) if rooms else 0
-                
-                if duration_hours < 8 and num_rooms <= 2:
-                    validated_data['status'] = 'Approved'
-                else:
-                    validated_data['status'] = 'Pending'
-            else:
-                validated_data['status'] = 'Pending'
-        
-        return super().create(validated_data)
\ No newline at end of file
+            validated_data['status'] = initial_booking_status(
+                validated_data.get('booking_type', 'regular'),
+                validated_data.get('start_datetime'),
+                validated_data.get('end_datetime'),
+                len(rooms) if rooms else 0,
+            )
+        
+        return super().create(validated_data)
+
+class BookingSeriesSerializer(serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)
+    rooms = RoomSerializer(many=True, read_only=True)
+    room_ids = BulkPrimaryKeyRelatedField(
+        queryset=Room.objects.all(), many=True, write_only=True, source='rooms'
+    )
+    exceptions = serializers.ListField(child=serializers.DateField(), required=False)
+    last_date = serializers.DateField(read_only=True)
+
+    class Meta:
+        model = BookingSeries
+        fields = [
+            'id', 'user', 'rooms', 'room_ids', 'booking_type', 'frequency', 'start_date', 'start_time',
+            'end_time', 'until', 'count', 'exceptions', 'last_date', 'status', 'materialized_until', 'created_at',
+        ]
+        read_only_fields = ['status', 'user', 'materialized_until', 'created_at']
+
+    def validate_room_ids(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one room must be selected.")
+        return value
+
+    def validate_exceptions(self, value):
+        # Stored as ISO strings in the JSON field
+        return sorted({day.isoformat() for day in value})
+
+    def validate(self, data):
+        """The create_booking/ rules for the first occurrence, plus a bounded number of occurrences"""
+        user = self.context['request'].user
+        booking_type = data.get('booking_type', 'regular')
+        if booking_type == 'camp' and user.role not in CAMP_BOOKING_ROLES:
+            raise serializers.ValidationError({'booking_type': "Only mentors, coordinators, and admins can book camps."})
+        if not data.get('until') and not data.get('count'):
+            raise serializers.ValidationError({'until': "Set an end date (until) or a number of occurrences (count)."})
+        if data.get('until') and data['until'] < data['start_date']:
+            raise serializers.ValidationError({'until': "The end date must not be before the start date."})
+
+        series = BookingSeries(**{key: value for key, value in data.items() if key != 'rooms'})
+        start_datetime, end_datetime = series.occurrence_times(series.start_date)
+        window_error = booking_window_error(booking_type, start_datetime, end_datetime, timezone.now())
+        if window_error:
+            raise serializers.ValidationError({'end_time': window_error})
+        max_occurrences = settings.BOOKING_SERIES_MAX_OCCURRENCES
+        if len(series.occurrence_dates()) > max_occurrences:
+            raise serializers.ValidationError({'count': f"A series cannot have more than {max_occurrences} occurrences."})
+        return data
+
+    def create(self, validated_data):
+        validated_data['user'] = self.context['request'].user
+        return super().create(validated_data)
+
+
+class QueuedBookingSerializer(serializers.ModelSerializer):
+    """A queued create_booking/ request; booking_id is set once it has been booked"""
+    booking_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = QueuedBooking
+        fields = [
+            'id', 'status', 'room_ids', 'start_datetime', 'end_datetime', 'booking_type', 'booking_id',
+            'result', 'created_at', 'processed_at',
+        ]
+        read_only_fields = fields
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)
+    room = RoomSerializer(read_only=True)
+    room_id = serializers.PrimaryKeyRelatedField(queryset=Room.objects.select_related('floor'), write_only=True, source='room')
+    booking_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'user', 'room', 'room_id', 'start_datetime', 'end_datetime', 'booking_type', 'status',
+            'booking_id', 'created_at', 'fulfilled_at',
+        ]
+        read_only_fields = ['user', 'status', 'created_at', 'fulfilled_at']
+
+    def validate(self, data):
+        """The create_booking/ rules, so a promoted entry is a booking the user could have made"""
+        user = self.context['request'].user
+        booking_type = data.get('booking_type', 'regular')
+        if booking_type == 'camp' and user.role not in CAMP_BOOKING_ROLES:
+            raise serializers.ValidationError({'booking_type': "Only mentors, coordinators, and admins can book camps."})
+        window_error = booking_window_error(booking_type, data['start_datetime'], data['end_datetime'], timezone.now())
+        if window_error:
+            raise serializers.ValidationError({'end_datetime': window_error})
+        max_span_days = getattr(settings, 'BOOKING_MAX_SPAN_DAYS', None)
+        if max_span_days and data['end_datetime'] - data['start_datetime'] > timedelta(days=max_span_days):
+            raise serializers.ValidationError({'end_datetime': f'Bookings cannot span more than {max_span_days} days.'})
+        return data
+
+    def create(self, validated_data):
+        validated_data['user'] = self.context['request'].user
+        return super().create(validated_data)
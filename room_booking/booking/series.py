@@ -0,0 +1,216 @@
+"""
+Recurring bookings
+
+A BookingSeries is stored once, as its rule. Its occurrences become Booking rows only as
+they come within BOOKING_SERIES_HORIZON_DAYS: creating a series materializes the first
+stretch and `python manage.py materialize_booking_series` (run daily) moves the horizon
+forward, so a year of weekly sessions is a few inserts a month rather than one big one.
+
+Conflicts are checked for the whole series when it is created, with one query against
+existing bookings for every occurrence and one against the occurrences of other series
+that aren't Booking rows yet. Single bookings check that second part too
+(unmaterialized_series_conflicts), so a slot a series holds months ahead can't be taken.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .datetime_utils import to_local
+from .db_router import PRIMARY
+from .models import Booking, BookingSeries
+from .quotas import QuotaExceeded, WeeklyUsageTracker, user_roles
+from .serializers import initial_booking_status
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def horizon_date(days=None):
+    """Last date whose occurrences should exist as Booking rows"""
+    if days is None:
+        days = settings.BOOKING_SERIES_HORIZON_DAYS
+    return timezone.localdate() + timedelta(days=days)
+
+
+def conflict_entry(room_id, room_name, start, end):
+    """One conflict, in the same shape as views.check_booking_conflicts"""
+    return {
+        'room_id': room_id,
+        'room_name': room_name,
+        'existing_start': start.isoformat(),
+        'existing_end': end.isoformat(),
+    }
+
+
+def conflict_response(conflicts):
+    """create_booking/'s 409 body for a list of conflicts"""
+    return {
+        "detail": "Some rooms are already booked during the requested time.",
+        "conflicts": [
+            {
+                'room': conflict['room_name'],
+                'room_id': conflict['room_id'],
+                'start': conflict['existing_start'],
+                'end': conflict['existing_end'],
+            }
+            for conflict in conflicts
+        ],
+        "conflict_messages": [
+            f"Room '{conflict['room_name']}' is already booked from "
+            f"{conflict['existing_start']} to {conflict['existing_end']}"
+            for conflict in conflicts
+        ],
+    }
+
+
+def unmaterialized_occurrences(room_ids, first_day, last_day, exclude_series_id=None, using=PRIMARY):
+    """
+    [(room id, room name, start, end)] for the occurrences of active series on room_ids
+    between two local dates (inclusive) that aren't Booking rows yet
+    """
+    queryset = BookingSeries.objects.using(using).filter(
+        Q(until__isnull=True) | Q(until__gte=first_day),
+        status='Active', rooms__id__in=room_ids, start_date__lte=last_day,
+    ).exclude(materialized_until__gte=last_day).order_by().distinct().prefetch_related('rooms')
+    if exclude_series_id:
+        queryset = queryset.exclude(id=exclude_series_id)
+
+    occurrences = []
+    for series in queryset:
+        first = first_day
+        if series.materialized_until and series.materialized_until >= first:
+            first = series.materialized_until + timedelta(days=1)
+        times = [series.occurrence_times(day) for day in series.occurrence_dates(first, last_day)]
+        for room in series.rooms.all():
+            if room.id in room_ids:
+                occurrences.extend((room.id, room.name, start, end) for start, end in times)
+    return occurrences
+
+
+def unmaterialized_series_conflicts(requests, exclude_series_id=None):
+    """
+    Conflicts between requests, [(room_ids, start, end)], and the occurrences of active
+    series that aren't Booking rows yet. Returns one list of conflicts per request.
+    """
+    results = [[] for _ in requests]
+    room_ids = set().union(*(rooms for rooms, _, _ in requests)) if requests else set()
+    if not room_ids:
+        return results
+    first_day = min(to_local(start).date() for _, start, _ in requests)
+    last_day = max(to_local(end).date() for _, _, end in requests)
+
+    occurrences = unmaterialized_occurrences(room_ids, first_day, last_day, exclude_series_id)
+    for result, (rooms, start, end) in zip(results, requests):
+        for room_id, room_name, occurrence_start, occurrence_end in occurrences:
+            if room_id in rooms and occurrence_start < end and occurrence_end > start:
+                result.append(conflict_entry(room_id, room_name, occurrence_start, occurrence_end))
+    return results
+
+
+def find_conflicts(requests, exclude_series_id=None):
+    """
+    Conflicts for many [(room_ids, start, end)] requests at once: one query for existing
+    bookings and one for unmaterialized series occurrences. One list per request.
+    """
+    results = [[] for _ in requests]
+    room_ids = set().union(*(rooms for rooms, _, _ in requests)) if requests else set()
+    if not room_ids:
+        return results
+
+    existing = {}  # room id -> [(room name, start, end)]
+    rows = Booking.objects.using(PRIMARY).active().filter(rooms__id__in=room_ids).overlapping_any(
+        (start, end) for _, start, end in requests
+    ).values_list('rooms__id', 'rooms__name', 'start_datetime', 'end_datetime')
+    for room_id, room_name, start, end in rows:
+        existing.setdefault(room_id, []).append((room_name, start, end))
+
+    for result, (rooms, start, end) in zip(results, requests):
+        for room_id in sorted(rooms):
+            for room_name, existing_start, existing_end in existing.get(room_id, ()):
+                if existing_start < end and existing_end > start:
+                    result.append(conflict_entry(room_id, room_name, existing_start, existing_end))
+
+    for result, series_conflicts in zip(results, unmaterialized_series_conflicts(requests, exclude_series_id)):
+        result.extend(series_conflicts)
+    return results
+
+
+def series_conflicts(series, room_ids):
+    """
+    Conflicts for every remaining occurrence of a series on room_ids, as
+    [{'date': 'YYYY-MM-DD', **conflict}]
+    """
+    dates = series.occurrence_dates(max(series.start_date, timezone.localdate()))
+    room_ids = set(room_ids)
+    requests = [(room_ids, *series.occurrence_times(day)) for day in dates]
+    conflicts = []
+    for day, found in zip(dates, find_conflicts(requests, exclude_series_id=series.pk)):
+        conflicts.extend({'date': day.isoformat(), **conflict} for conflict in found)
+    return conflicts
+
+
+def materialize_series(series, through=None):
+    """
+    Create the Booking rows of a series' occurrences up to `through` (default: the
+    horizon) that don't exist yet. Occurrences that conflict with a booking made since
+    the series was checked, or that would take the owner past the weekly quota, are
+    skipped and logged. Returns (created, skipped dates).
+    """
+    through = through or horizon_date()
+    with transaction.atomic(using=PRIMARY):
+        # Lock the series so overlapping runs can't materialize the same dates twice
+        series = BookingSeries.objects.using(PRIMARY).select_for_update().get(pk=series.pk)
+        if series.status != 'Active' or (series.materialized_until and series.materialized_until >= through):
+            return [], []
+        first = timezone.localdate()
+        if series.materialized_until and series.materialized_until >= first:
+            first = series.materialized_until + timedelta(days=1)
+        dates = series.occurrence_dates(first, through)
+        room_ids = set(series.rooms.values_list('id', flat=True))
+        requests = [(room_ids, *series.occurrence_times(day)) for day in dates]
+
+        tracker = WeeklyUsageTracker(
+            user_roles([series.user_id]), [(series.user_id, series.booking_type, start) for _, start, _ in requests]
+        )
+        bookings, skipped = [], []
+        for day, (_, start, end), conflicts in zip(dates, requests, find_conflicts(requests, exclude_series_id=series.pk)):
+            if conflicts:
+                skipped.append(day)
+                continue
+            try:
+                status = tracker.admit(
+                    series.user_id, series.booking_type, start, end,
+                    initial_booking_status(series.booking_type, start, end, len(room_ids)),
+                )
+            except QuotaExceeded:
+                skipped.append(day)
+                continue
+            bookings.append(Booking(
+                user_id=series.user_id,
+                series=series,
+                start_datetime=start,
+                end_datetime=end,
+                booking_type=series.booking_type,
+                status=status,
+            ))
+        if skipped:
+            logger.warning(
+                f"Booking series {series.pk}: skipped occurrences on "
+                f"{', '.join(day.isoformat() for day in skipped)} (rooms already booked or weekly quota reached)"
+            )
+        bookings = Booking.objects.using(PRIMARY).bulk_create_with_rooms(bookings, [room_ids] * len(bookings))
+
+        series.materialized_until = through
+        series.save(update_fields=['materialized_until'])
+    return bookings, skipped
+
+
+def cancel_series(series):
+    """Cancel a series and its occurrences that haven't started yet. Returns how many were cancelled"""
+    with transaction.atomic(using=PRIMARY):
+        series.status = 'Cancelled'
+        series.save(update_fields=['status'])
+        return Booking.objects.using(PRIMARY).active().filter(
+            series=series, start_datetime__gt=timezone.now(),
+        ).update(status='Cancelled')
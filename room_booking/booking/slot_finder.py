@@ -0,0 +1,236 @@
+"""
+Slot finder
+
+When create_booking/ answers 409 the user used to guess another time and try again, each
+guess costing a full conflict check. find_slots() answers the two follow-up questions
+directly: when are these rooms next free for this long, and which other rooms on the same
+floor are free at the time asked for.
+
+Everything comes from one bookings query over the search window (plus the series
+occurrences that aren't bookings yet). The busy intervals are merged, sorted once and
+swept together with the bookable hours of each day in the window.
+"""
+from django.db.models import Q
+from .datetime_utils import localize, parse_date, parse_local_datetime, to_local
+from .models import Booking, Room
+from .series import unmaterialized_occurrences
+from datetime import datetime, time, timedelta
+
+# Bookable hours each day, as offered by check_availability/: 8 AM until midnight
+OPEN_HOUR = 8
+DEFAULT_WINDOW_DAYS = 7
+MAX_WINDOW_DAYS = 31
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 20
+MIN_DURATION = timedelta(hours=1)
+MAX_DURATION = timedelta(hours=8)
+# Suggested start times are rounded up to this many minutes
+SLOT_STEP_MINUTES = 15
+
+
+class SlotFinderParamError(ValueError):
+    """Invalid find_slots query parameters; the message is safe to return to the client"""
+
+
+def _parse_bound(value, end_of_day=False):
+    # A window bound is a datetime, or a date meaning its start (or, for the end, its end)
+    try:
+        day = parse_date(value)
+    except ValueError:
+        return parse_local_datetime(value)
+    return localize(datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min))
+
+
+def parse_slot_params(params, now):
+    """
+    Parse the find_slots query string:
+    room_ids=1,2 and/or floor_id=3; duration=<minutes>, or start_datetime and end_datetime
+    (the time that was wanted; also enables alternative_rooms); window_start/window_end
+    (dates or datetimes, default: the next DEFAULT_WINDOW_DAYS days); limit.
+    Returns the keyword arguments for find_slots or raises SlotFinderParamError.
+    """
+    try:
+        room_ids = {int(rid) for rid in params.get('room_ids', '').split(',') if rid.strip()}
+        floor_id = int(params['floor_id']) if params.get('floor_id') else None
+    except ValueError:
+        raise SlotFinderParamError("Invalid room_ids or floor_id format")
+    if not room_ids and not floor_id:
+        raise SlotFinderParamError("Either room_ids or floor_id is required")
+
+    requested = None
+    try:
+        if params.get('start_datetime') and params.get('end_datetime'):
+            requested = (parse_local_datetime(params['start_datetime']), parse_local_datetime(params['end_datetime']))
+            if requested[1] <= requested[0]:
+                raise SlotFinderParamError("end_datetime must be after start_datetime")
+        window_start = _parse_bound(params['window_start']) if params.get('window_start') else None
+        window_end = _parse_bound(params['window_end'], end_of_day=True) if params.get('window_end') else None
+    except (ValueError, AttributeError) as e:
+        if isinstance(e, SlotFinderParamError):
+            raise
+        raise SlotFinderParamError("Invalid datetime format. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS")
+
+    if params.get('duration'):
+        try:
+            duration = timedelta(minutes=int(params['duration']))
+        except ValueError:
+            raise SlotFinderParamError("duration must be a number of minutes")
+    elif requested:
+        duration = requested[1] - requested[0]
+    else:
+        raise SlotFinderParamError("duration (minutes) or start_datetime and end_datetime is required")
+    if not MIN_DURATION <= duration <= MAX_DURATION:
+        raise SlotFinderParamError("duration must be between 1 and 8 hours")
+
+    window_start = max(window_start or (requested[0] if requested else now), now)
+    window_end = window_end or window_start + timedelta(days=DEFAULT_WINDOW_DAYS)
+    if window_end <= window_start:
+        raise SlotFinderParamError("window_end must be after window_start")
+    if window_end - window_start > timedelta(days=MAX_WINDOW_DAYS):
+        raise SlotFinderParamError(f"The search window cannot be longer than {MAX_WINDOW_DAYS} days")
+
+    try:
+        limit = min(int(params.get('limit') or DEFAULT_LIMIT), MAX_LIMIT)
+    except ValueError:
+        raise SlotFinderParamError("limit must be a number")
+
+    return {
+        'room_ids': room_ids,
+        'floor_id': floor_id,
+        'duration': duration,
+        'window_start': window_start,
+        'window_end': window_end,
+        'limit': max(limit, 1),
+        'requested': requested,
+    }
+
+
+def opening_windows(window_start, window_end):
+    """[(start, end)] bookable hours of each local day in the window, clipped to it"""
+    windows = []
+    day = to_local(window_start).date()
+    while True:
+        open_at = localize(datetime.combine(day, time(OPEN_HOUR)))
+        if open_at >= window_end:
+            return windows
+        close_at = localize(datetime.combine(day + timedelta(days=1), time.min))
+        start, end = max(open_at, window_start), min(close_at, window_end)
+        if start < end:
+            windows.append((start, end))
+        day += timedelta(days=1)
+
+
+def round_up(value):
+    """value rounded up to the next SLOT_STEP_MINUTES boundary"""
+    offset = timedelta(minutes=value.minute % SLOT_STEP_MINUTES, seconds=value.second, microseconds=value.microsecond)
+    return value if not offset else value - offset + timedelta(minutes=SLOT_STEP_MINUTES)
+
+
+def merge_intervals(intervals):
+    """Sorted union of [(start, end)] intervals, with overlapping and touching ones joined"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_slots(busy, windows, duration, limit):
+    """
+    The first `limit` gaps of at least `duration` between the busy intervals, inside the
+    sorted windows. Returns [(start, free_until)].
+    """
+    busy = merge_intervals(busy)
+    slots = []
+    i = 0
+    for window_start, window_end in windows:
+        # Busy intervals only move forward, so each is looked at once or twice (if it
+        # spans two windows)
+        while i < len(busy) and busy[i][1] <= window_start:
+            i += 1
+        cursor, j = window_start, i
+        while cursor < window_end:
+            if j < len(busy) and busy[j][0] < window_end:
+                gap_end, next_cursor = max(busy[j][0], cursor), max(busy[j][1], cursor)
+                j += 1
+            else:
+                gap_end = next_cursor = window_end
+            start = round_up(cursor)
+            if gap_end - start >= duration:
+                slots.append((start, gap_end))
+                if len(slots) >= limit:
+                    return slots
+            cursor = next_cursor
+    return slots
+
+
+def find_slots(room_ids, duration, window_start, window_end, floor_id=None, limit=DEFAULT_LIMIT,
+               requested=None, using=None):
+    """
+    Free times for booking every room in room_ids (and on floor_id) together, and, when
+    `requested` (start, end) is given, the other rooms on their floors free at that time.
+    Raises SlotFinderParamError for unknown rooms or floors.
+    """
+    # Every room on the floors involved: the requested ones and the alternatives
+    floors = Room.objects.using(using).filter(Q(id__in=room_ids) | Q(floor_id=floor_id)).values('floor_id')
+    rooms = list(Room.objects.using(using).filter(floor_id__in=floors).order_by('floor_id', 'name').values_list('id', 'name', 'floor_id'))
+    wanted = set(room_ids) | {room_id for room_id, _, room_floor in rooms if room_floor == floor_id}
+    if not wanted or wanted - {room_id for room_id, _, _ in rooms}:
+        raise SlotFinderParamError("Some rooms are invalid.")
+
+    search_start, search_end = window_start, window_end
+    if requested:
+        search_start, search_end = min(search_start, requested[0]), max(search_end, requested[1])
+    all_ids = [room_id for room_id, _, _ in rooms]
+    rows = list(
+        Booking.objects.using(using).active().filter(rooms__id__in=all_ids)
+        .overlapping(search_start, search_end)
+        .values_list('rooms__id', 'start_datetime', 'end_datetime')
+    )
+    rows += [
+        (room_id, start, end)
+        for room_id, _, start, end in unmaterialized_occurrences(
+            set(all_ids), to_local(search_start).date(), to_local(search_end).date(), using=using,
+        )
+    ]
+    busy_by_room = {}
+    for room_id, start, end in rows:
+        busy_by_room.setdefault(room_id, []).append((start, end))
+
+    busy = [interval for room_id in wanted for interval in busy_by_room.get(room_id, ())]
+    slots = free_slots(busy, opening_windows(window_start, window_end), duration, limit)
+    result = {
+        'room_ids': sorted(wanted),
+        'duration_minutes': int(duration.total_seconds() // 60),
+        'window_start': to_local(window_start).isoformat(),
+        'window_end': to_local(window_end).isoformat(),
+        'free_slots': [
+            {
+                'start_datetime': to_local(start).isoformat(),
+                'end_datetime': to_local(start + duration).isoformat(),
+                'free_until': to_local(free_until).isoformat(),
+            }
+            for start, free_until in slots
+        ],
+    }
+    if requested:
+        start, end = requested
+        result['alternative_rooms'] = [
+            {'room_id': room_id, 'room_name': name, 'floor_id': room_floor}
+            for room_id, name, room_floor in rooms
+            if room_id not in wanted
+            and not any(s < end and e > start for s, e in busy_by_room.get(room_id, ()))
+        ]
+    return result
+
+
+def conflict_suggestions(room_ids, start, end, now):
+    """find_slots for a booking that just conflicted: the next DEFAULT_WINDOW_DAYS from its start"""
+    duration = min(max(end - start, MIN_DURATION), MAX_DURATION)
+    window_start = max(start, now)
+    return find_slots(
+        room_ids, duration, window_start, window_start + timedelta(days=DEFAULT_WINDOW_DAYS), requested=(start, end),
+    )
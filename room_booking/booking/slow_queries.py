@@ -0,0 +1,191 @@
+"""
+Slow query capture
+
+An execute wrapper is attached to every database connection as it is opened. Queries
+slower than SLOW_QUERY_THRESHOLD_MS are appended as JSON lines to SLOW_QUERY_LOG with
+their normalized SQL, call site, parameter fingerprint and duration. On PostgreSQL a
+sample of slow SELECTs (SLOW_QUERY_EXPLAIN_SAMPLE_RATE) is re-run in a background thread
+under EXPLAIN (ANALYZE, BUFFERS) and the plan is stored with the record.
+
+Use `python manage.py slow_queries` to print the slowest query shapes.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from django.views import View
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames from these modules wrap every query, so they never count as the call site
+_SKIPPED_FILES = {os.path.abspath(__file__), os.path.join(_PACKAGE_DIR, 'middleware.py')}
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|\?")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_local = threading.local()
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+_log_lock = threading.Lock()
+_log_handler = None
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape: literals and placeholders become ?, IN lists collapse"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+def shape_id(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode('utf-8')).hexdigest()[:12]
+
+
+def fingerprint_params(params):
+    """Short hash of the parameter values, so repeated identical calls can be spotted without logging values"""
+    if params is None:
+        return None
+    return hashlib.sha1(repr(params).encode('utf-8')).hexdigest()[:12]
+
+
+def find_call_site():
+    """The innermost booking app function and the DRF/Django view class on the current stack"""
+    function = None
+    view = None
+    frame = sys._getframe(2)
+    while frame is not None and (function is None or view is None):
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if function is None and filename.startswith(_PACKAGE_DIR) and filename not in _SKIPPED_FILES:
+            module = os.path.relpath(filename, os.path.dirname(_PACKAGE_DIR))
+            function = f"{module}:{frame.f_code.co_name}:{frame.f_lineno}"
+        if view is None:
+            candidate = frame.f_locals.get('self')
+            if isinstance(candidate, View):
+                view = type(candidate).__name__
+        frame = frame.f_back
+    return function, view
+
+
+def _get_log_handler():
+    global _log_handler
+    if _log_handler is None:
+        path = settings.SLOW_QUERY_LOG or os.path.join(tempfile.gettempdir(), 'grfs-slow-queries.jsonl')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _log_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES, backupCount=3, encoding='utf-8'
+        )
+    return _log_handler
+
+
+def get_log_paths():
+    """The current slow query log followed by its rotated backups"""
+    path = settings.SLOW_QUERY_LOG or os.path.join(tempfile.gettempdir(), 'grfs-slow-queries.jsonl')
+    return [path] + [f"{path}.{index}" for index in range(1, 4)]
+
+
+def _write(record):
+    try:
+        handler = _get_log_handler()
+        with _log_lock:
+            handler.emit(logging.makeLogRecord({'msg': json.dumps(record, default=str)}))
+    except Exception as e:
+        logger.error(f"Failed to write slow query record: {str(e)}")
+
+
+def _explain(alias, sql, params, record):
+    """Runs on the background thread: EXPLAIN ANALYZE the statement read-only, then log the record"""
+    _local.capturing = True
+    try:
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute("SET TRANSACTION READ ONLY")
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+            record['plan'] = cursor.fetchone()[0]
+    except Exception as e:
+        record['plan_error'] = str(e)
+    finally:
+        _local.capturing = False
+        connections[alias].close()
+    _write(record)
+
+
+class SlowQueryWrapper:
+    """Execute wrapper that records statements slower than SLOW_QUERY_THRESHOLD_MS"""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'capturing', False):
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+                self._record(sql, params, many, context, duration_ms)
+
+    def _record(self, sql, params, many, context, duration_ms):
+        _local.capturing = True
+        try:
+            normalized = normalize_sql(sql)
+            function, view = find_call_site()
+            record = {
+                'time': timezone.now().isoformat(),
+                'database': self.alias,
+                'shape_id': shape_id(normalized),
+                'sql': normalized,
+                'duration_ms': round(duration_ms, 3),
+                'params_fingerprint': fingerprint_params(params),
+                'param_count': len(params) if params is not None and not many else None,
+                'many': many,
+                'function': function,
+                'view': view,
+            }
+
+            connection = context['connection']
+            should_explain = (
+                not many
+                and connection.vendor == 'postgresql'
+                and sql.lstrip()[:6].upper() == 'SELECT'
+                and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+            )
+            if should_explain:
+                _explain_executor.submit(_explain, self.alias, sql, params, record)
+            else:
+                _write(record)
+        except Exception as e:
+            logger.error(f"Failed to record slow query: {str(e)}")
+        finally:
+            _local.capturing = False
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    if not any(isinstance(wrapper, SlowQueryWrapper) for wrapper in connection.execute_wrappers):
+        # Insert rather than append: the connection may be opened inside a
+        # `with connection.execute_wrapper(...)` block, which pops the last wrapper on exit
+        connection.execute_wrappers.insert(0, SlowQueryWrapper(connection.alias))
+
+
+def install():
+    """Attach the wrapper to every connection opened from now on (no-op when the threshold is 0)"""
+    if settings.SLOW_QUERY_THRESHOLD_MS > 0:
+        connection_created.connect(_install_wrapper, dispatch_uid='booking.slow_queries')
@@ -1,3 +1,1194 @@
-from django.test import TestCase
+"""
+Query-count and wall-time budgets for every API endpoint
 
-# Create your tests here.
+Each URL in booking/urls.py is requested as a regular user and as an admin against a
+seeded dataset. A request that issues more queries than its budget (typically an N+1
+introduced in a view, serializer or email helper) or runs longer than its time budget
+fails the test. The time budget is generous, since wall time depends on the machine;
+requests over a tenth of it are flagged as slow. A per-endpoint table is printed after
+the run (QUERY_BUDGET_REPORT=0 turns it off).
+
+The other test cases cover what the endpoints do.
+
+Run with: python manage.py test booking
+"""
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import (
+    USAGE_FIELDS, AdmissionWindow, Booking, BookingSeries, Floor, IdempotencyRecord, QueuedBooking, Room, CustomUser,
+    WaitlistEntry, WeeklyUsage, weekly_totals,
+)
+from . import coalescing, compression, metrics, partitioning, react_shell, urls as booking_urls
+from .admission import process_queue
+from .coalescing import SingleFlight, coalesce
+from .datetime_utils import localize, parse_local_datetime
+from .db_router import PRIMARY, REPLICA
+from .renderers import FastJSONParser, FastJSONRenderer
+from .throttling import CostWeightedThrottle
+
+# Wall-time budget per request, in seconds (QUERY_BUDGET_WALL_TIME overrides it)
+WALL_TIME_BUDGET = float(os.getenv('QUERY_BUDGET_WALL_TIME', '5'))
+# Requests slower than this are flagged in the report without failing
+SLOW_REQUEST_SECONDS = WALL_TIME_BUDGET / 10
+
+# Print the per-endpoint query/time table after QueryBudgetTests
+QUERY_BUDGET_REPORT = os.getenv('QUERY_BUDGET_REPORT', '1').lower() not in ('0', 'false')
+
+# (url name, role, method, query budget)
+# URL kwargs and request bodies are built in QueryBudgetTests.build_request
+QUERY_BUDGETS = [
+    ('create-booking', 'user', 'post', 17),
+    ('create-booking', 'admin', 'post', 17),
+    ('check-availability', 'user', 'get', 3),
+    ('check-availability', 'admin', 'get', 3),
+    ('find-slots', 'user', 'get', 4),
+    ('find-slots', 'admin', 'get', 4),
+    ('floor-list', 'user', 'get', 2),
+    ('floor-list', 'admin', 'get', 2),
+    ('floor-heatmap', 'user', 'get', 3),
+    ('floor-heatmap', 'admin', 'get', 3),
+    ('room-list', 'user', 'get', 2),
+    ('room-list', 'admin', 'get', 2),
+    ('room-list', 'anonymous', 'get', 1),
+    ('booking-list-create', 'user', 'get', 4),
+    ('booking-list-create', 'admin', 'get', 4),
+    ('booking-list-create', 'user', 'post', 12),
+    ('my-bookings', 'user', 'get', 4),
+    ('my-bookings', 'admin', 'get', 4),
+    ('booking-batch-create', 'user', 'post', 14),
+    ('booking-series-list-create', 'user', 'get', 4),
+    ('booking-series-list-create', 'admin', 'get', 4),
+    ('booking-series-list-create', 'user', 'post', 25),
+    ('booking-series-detail', 'user', 'get', 4),
+    ('booking-series-detail', 'admin', 'get', 4),
+    ('booking-series-detail', 'user', 'delete', 9),
+    ('queued-booking-detail', 'user', 'get', 3),
+    ('queued-booking-detail', 'admin', 'get', 3),
+    ('waitlist-list-create', 'user', 'get', 2),
+    ('waitlist-list-create', 'admin', 'get', 2),
+    ('waitlist-list-create', 'user', 'post', 7),
+    ('waitlist-detail', 'user', 'delete', 3),
+    ('booking-detail', 'user', 'get', 4),
+    ('booking-detail', 'admin', 'get', 4),
+    ('booking-detail', 'user', 'put', 14),
+    ('booking-detail', 'user', 'delete', 13),
+    ('booking-detail', 'admin', 'delete', 13),
+    ('register', 'anonymous', 'post', 4),
+    ('login', 'anonymous', 'post', 1),
+    ('token_refresh', 'anonymous', 'post', 1),
+    ('user-detail', 'user', 'get', 1),
+    ('user-detail', 'admin', 'get', 1),
+    ('pending-users', 'user', 'get', 1),
+    ('pending-users', 'admin', 'get', 2),
+    ('approve-user', 'user', 'post', 1),
+    ('approve-user', 'admin', 'post', 3),
+    ('update-booking-status', 'user', 'post', 1),
+    ('update-booking-status', 'admin', 'post', 5),
+    ('delete-all-bookings', 'user', 'delete', 1),
+    ('delete-all-bookings', 'admin', 'delete', 11),
+    ('async-check-availability', 'user', 'get', 3),
+    ('async-check-availability', 'admin', 'get', 3),
+    ('async-floor-list', 'anonymous', 'get', 1),
+    ('async-room-list', 'anonymous', 'get', 1),
+    ('async-room-list', 'user', 'get', 2),
+    ('async-my-bookings', 'user', 'get', 4),
+    ('async-my-bookings', 'admin', 'get', 4),
+    ('metrics', 'user', 'get', 1),
+    ('metrics', 'admin', 'get', 1),
+    ('db-pool', 'user', 'get', 1),
+    ('db-pool', 'admin', 'get', 1),
+    ('profile-list', 'user', 'get', 1),
+    ('profile-list', 'admin', 'get', 1),
+    ('profile-download', 'user', 'get', 1),
+    ('profile-download', 'admin', 'get', 1),
+]
+
+PASSWORD = 'budget-pass-123'
+
+
+def local_slot(days_ahead, hour, hours=1):
+    """Naive local (EST/EDT) start/end strings in the format the frontend sends"""
+    start = (timezone.localtime() + timedelta(days=days_ahead)).replace(hour=hour, minute=0, second=0, microsecond=0)
+    end = start + timedelta(hours=hours)
+    return start.strftime('%Y-%m-%dT%H:%M:%S'), end.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+# Budgets count queries on the primary connection, so keep replica reads there too, and
+# use a fresh in-memory cache so throttle counters and a database cache don't leak in
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    DATABASE_ROUTERS=[],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'query-budgets'}},
+)
+class QueryBudgetTests(TestCase):
+    results = []
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.floors = Floor.objects.bulk_create([Floor(name=f"Floor {i}") for i in range(1, 4)])
+        cls.rooms = Room.objects.bulk_create([
+            Room(name=f"Room {floor.id}-{i}", floor=floor) for floor in cls.floors for i in range(1, 6)
+        ])
+
+        cls.regular = CustomUser.objects.create_user(
+            email='regular@example.com', username='regular', password=PASSWORD,
+            role='mentor', approval_status='approved',
+        )
+        cls.admin = CustomUser.objects.create_user(
+            email='admin@example.com', username='admin', password=PASSWORD,
+            role='admin', approval_status='approved',
+        )
+        others = [
+            CustomUser(email=f"user{i}@example.com", username=f"user{i}", role='user', approval_status='approved')
+            for i in range(20)
+        ]
+        others += [
+            CustomUser(email=f"pending{i}@example.com", username=f"pending{i}", role='user', approval_status='pending')
+            for i in range(10)
+        ]
+        cls.others = CustomUser.objects.bulk_create(others)
+        owners = [cls.regular, cls.admin] + cls.others[:20]
+
+        # 300 bookings over the next 30 days: peak hours, some multi-room, camps and cancellations
+        start_of_today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        bookings = []
+        for i in range(300):
+            start = start_of_today + timedelta(days=1 + i % 30, hours=(9, 10, 14, 15, 16, 18)[i % 6])
+            duration = timedelta(days=3) if i % 25 == 0 else timedelta(hours=1 + i % 3)
+            bookings.append(Booking(
+                user=owners[i % len(owners)],
+                start_datetime=start,
+                end_datetime=start + duration,
+                status=('Approved', 'Approved', 'Pending', 'Cancelled')[i % 4],
+                booking_type='camp' if i % 25 == 0 else 'regular',
+            ))
+        cls.bookings = Booking.objects.bulk_create(bookings)
+
+        through = Booking.rooms.through
+        links = []
+        for i, booking in enumerate(cls.bookings):
+            for offset in range(1 + i % 3):
+                links.append(through(booking_id=booking.id, room_id=cls.rooms[(i + offset * 7) % len(cls.rooms)].id))
+        through.objects.bulk_create(links)
+
+        # A weekly series far enough ahead that none of it is materialized
+        cls.series = BookingSeries.objects.create(
+            user=cls.regular, start_date=timezone.localdate() + timedelta(days=300),
+            start_time=dt_time(10), end_time=dt_time(12), count=10,
+        )
+        cls.series.rooms.set([cls.rooms[10]])
+
+        # A request waiting in the admission queue
+        cls.queued_booking = QueuedBooking.objects.create(
+            user=cls.regular, room_ids=[cls.rooms[12].id],
+            start_datetime=start_of_today + timedelta(days=40, hours=10),
+            end_datetime=start_of_today + timedelta(days=40, hours=12),
+        )
+
+        # A waitlist entry for a booked slot (the first booking's first room)
+        cls.waitlist_entry = WaitlistEntry.objects.create(
+            user=cls.regular, room_id=links[0].room_id,
+            start_datetime=cls.bookings[0].start_datetime, end_datetime=cls.bookings[0].end_datetime,
+        )
+
+        cls.regular_booking = next(b for b in cls.bookings if b.user_id == cls.regular.id and b.status != 'Cancelled')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if QUERY_BUDGET_REPORT and cls.results:
+            header = f"{'endpoint':<28}{'role':<11}{'method':<8}{'status':>6}{'queries':>10}{'time ms':>14}"
+            lines = ["", "Endpoint query/time budgets", header, '-' * len(header)]
+            for row in cls.results:
+                if row['queries'] > row['budget'] or row['elapsed'] > WALL_TIME_BUDGET:
+                    flag = '  <-- OVER BUDGET'
+                else:
+                    flag = '  <-- slow' if row['elapsed'] > SLOW_REQUEST_SECONDS else ''
+                lines.append(
+                    f"{row['name']:<28}{row['role']:<11}{row['method'].upper():<8}{row['status']:>6}"
+                    f"{row['queries']:>5}/{row['budget']:<4}"
+                    f"{row['elapsed'] * 1000:>8.1f}/{WALL_TIME_BUDGET * 1000:<5.0f}{flag}"
+                )
+            sys.stderr.write('\n'.join(lines) + '\n')
+
+    def client_for(self, role):
+        client = APIClient()
+        user = {'user': self.regular, 'admin': self.admin}.get(role)
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        return client
+
+    def build_request(self, name, role):
+        """URL kwargs and request body for one budget entry"""
+        room_ids = [self.rooms[0].id, self.rooms[1].id]
+        kwargs, data = {}, None
+
+        if name == 'create-booking':
+            start, end = local_slot(200, 10, hours=2)
+            data = {'room_ids': room_ids, 'start_datetime': start, 'end_datetime': end}
+        elif name in ('check-availability', 'async-check-availability'):
+            day = (timezone.localtime() + timedelta(days=3)).strftime('%Y-%m-%d')
+            return kwargs, None, f"?date={day}&room_ids={','.join(str(room.id) for room in self.rooms)}"
+        elif name == 'find-slots':
+            start, end = local_slot(3, 14, hours=2)
+            return kwargs, None, f"?room_ids={self.rooms[0].id}&start_datetime={start}&end_datetime={end}"
+        elif name in ('room-list', 'async-room-list') and role == 'anonymous':
+            # Occupancy annotations must not add queries
+            return kwargs, None, '?occupancy=true'
+        elif name == 'floor-heatmap':
+            kwargs = {'floor_id': self.floors[0].id}
+            first_day = timezone.localdate() + timedelta(days=1)
+            return kwargs, None, f"?start_date={first_day}&end_date={first_day + timedelta(days=6)}"
+        elif name == 'booking-list-create':
+            start = timezone.now() + timedelta(days=210)
+            data = {'room_ids': room_ids, 'start_datetime': start.isoformat(), 'end_datetime': (start + timedelta(hours=1)).isoformat()}
+        elif name == 'booking-batch-create':
+            data = {'items': [
+                dict(zip(('start_datetime', 'end_datetime'), local_slot(230 + 7 * week, 10)), room_ids=room_ids)
+                for week in range(8)
+            ]}
+        elif name == 'booking-series-list-create':
+            data = {
+                'room_ids': room_ids, 'start_date': (timezone.localdate() + timedelta(days=20)).isoformat(),
+                'start_time': '13:00', 'end_time': '14:00', 'frequency': 'weekly', 'count': 12,
+            }
+        elif name == 'booking-series-detail':
+            kwargs = {'series_id': self.series.id}
+        elif name == 'queued-booking-detail':
+            kwargs = {'request_id': self.queued_booking.id}
+        elif name == 'waitlist-list-create':
+            booking = self.bookings[1]
+            data = {
+                'room_id': booking.rooms.first().id,
+                'start_datetime': booking.start_datetime.isoformat(),
+                'end_datetime': booking.end_datetime.isoformat(),
+            }
+        elif name == 'waitlist-detail':
+            kwargs = {'entry_id': self.waitlist_entry.id}
+        elif name == 'booking-detail':
+            kwargs = {'booking_id': self.regular_booking.id}
+            start, end = local_slot(220, 11, hours=2)
+            data = {'room_ids': room_ids, 'start_datetime': start, 'end_datetime': end}
+        elif name == 'register':
+            data = {'email': 'new.person@example.com', 'username': 'newperson', 'password': PASSWORD}
+        elif name == 'login':
+            data = {'email': self.regular.email, 'password': PASSWORD}
+        elif name == 'token_refresh':
+            data = {'refresh': str(RefreshToken.for_user(self.regular))}
+        elif name == 'approve-user':
+            kwargs = {'user_id': self.others[-1].id}
+            data = {'action': 'approve', 'role': 'mentor'}
+        elif name == 'update-booking-status':
+            kwargs = {'booking_id': self.regular_booking.id}
+            data = {'status': 'Approved'}
+        elif name == 'profile-download':
+            kwargs = {'profile_id': '20250101T000000-room-list-0badc0de'}
+        return kwargs, data, ''
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in booking_urls.urlpatterns}
+        budgeted = {entry[0] for entry in QUERY_BUDGETS}
+        self.assertEqual(names - budgeted, set(), "Add a QUERY_BUDGETS entry for every new URL")
+
+    def test_query_and_time_budgets(self):
+        for name, role, method, budget in QUERY_BUDGETS:
+            with self.subTest(endpoint=name, role=role, method=method):
+                client = self.client_for(role)
+                kwargs, data, query_string = self.build_request(name, role)
+                url = reverse(name, kwargs=kwargs) + query_string
+
+                # Each request runs in its own savepoint so writes don't leak into the next one
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        response = getattr(client, method)(url, data, format='json')
+                        elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+
+                queries = len(captured.captured_queries)
+                self.results.append({
+                    'name': name, 'role': role, 'method': method, 'status': response.status_code,
+                    'queries': queries, 'budget': budget, 'elapsed': elapsed,
+                })
+                self.assertLess(response.status_code, 500, f"{method.upper()} {url} failed: {response.content[:300]}")
+                self.assertLessEqual(
+                    queries, budget,
+                    f"{method.upper()} {url} as {role} ran {queries} queries (budget {budget}):\n"
+                    + '\n'.join(query['sql'] for query in captured.captured_queries)
+                )
+                self.assertLessEqual(elapsed, WALL_TIME_BUDGET, f"{method.upper()} {url} as {role} took {elapsed:.3f}s")
+
+
+def local_time(day, hour, minute=0):
+    """Naive local string for a date and hour, in the format the frontend sends"""
+    return f"{day.isoformat()}T{hour:02d}:{minute:02d}:00"
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    DATABASE_ROUTERS=[],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'booking-features'}},
+)
+class BookingFeatureTestCase(TestCase):
+    """Three rooms on one floor, a mentor, two users and an admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.floor = Floor.objects.create(name="Feature floor")
+        cls.rooms = Room.objects.bulk_create([Room(name=f"Feature room {i}", floor=cls.floor) for i in range(3)])
+        cls.mentor = CustomUser.objects.create_user(
+            email='mentor@example.com', username='mentor', password=PASSWORD, role='mentor', approval_status='approved',
+        )
+        cls.users = [
+            CustomUser.objects.create_user(
+                email=f"member{i}@example.com", username=f"member{i}", password=PASSWORD, role='user',
+                approval_status='approved',
+            )
+            for i in range(3)
+        ]
+        cls.admin = CustomUser.objects.create_user(
+            email='boss@example.com', username='boss', password=PASSWORD, role='admin', approval_status='approved',
+        )
+        # A weekday a month ahead, so every slot in a test is in the future and in one week
+        day = timezone.localdate() + timedelta(days=30)
+        cls.monday = day - timedelta(days=day.weekday())
+        cls.day = cls.monday + timedelta(days=2)
+
+    def client_for(self, user):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        return client
+
+    def book(self, user, rooms, day, start_hour, end_hour, status='Approved'):
+        booking = Booking.objects.create(
+            user=user,
+            start_datetime=parse_local_datetime(local_time(day, start_hour)),
+            end_datetime=parse_local_datetime(local_time(day, end_hour)),
+            status=status,
+        )
+        booking.rooms.set(rooms)
+        return booking
+
+    def post(self, user, name, data, **extra):
+        return self.client_for(user).post(reverse(name), data, format='json', secure=True, **extra)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    DATABASE_ROUTERS=['booking.db_router.PrimaryReplicaRouter'],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'replica-routing'}},
+    REPLICA_STICKY_SECONDS=15,
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """The 'replica' alias mirrors the primary in tests; the queries show which one was read"""
+    databases = {PRIMARY, REPLICA}
+
+    def setUp(self):
+        caches['default'].clear()
+        self.room = Room.objects.create(name="Replica room", floor=Floor.objects.create(name="Replica floor"))
+        self.users = [
+            CustomUser.objects.create_user(
+                email=f"replica{i}@example.com", username=f"replica{i}", password=PASSWORD, role='mentor',
+                approval_status='approved',
+            )
+            for i in range(2)
+        ]
+        self.day = timezone.localdate() + timedelta(days=30)
+
+    def request(self, user, method, name, data=None):
+        """The response and the tables each database was queried for"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        with CaptureQueriesContext(connections[PRIMARY]) as primary, CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = getattr(client, method)(reverse(name), data, format='json', secure=True)
+        return response, ' '.join(q['sql'] for q in primary), ' '.join(q['sql'] for q in replica)
+
+    def test_reads_go_to_the_replica(self):
+        response, primary, replica = self.request(self.users[0], 'get', 'floor-list')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('booking_floor', replica)
+        self.assertNotIn('booking_floor', primary)
+        # Authentication still reads the user from the primary
+        self.assertIn('booking_customuser', primary)
+
+    def test_writer_is_pinned_to_the_primary(self):
+        data = {'room_ids': [self.room.id], 'start_datetime': local_time(self.day, 10), 'end_datetime': local_time(self.day, 11)}
+        response, primary, replica = self.request(self.users[0], 'post', 'create-booking', data)
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('booking_booking', primary)
+        self.assertEqual(replica, '')
+
+        response, primary, replica = self.request(self.users[0], 'get', 'my-bookings')
+        self.assertEqual(len(response.data), 1)
+        self.assertIn('booking_booking', primary)
+        self.assertEqual(replica, '')
+        # Other users aren't pinned
+        _, primary, replica = self.request(self.users[1], 'get', 'my-bookings')
+        self.assertIn('booking_booking', replica)
+
+        # The pin expires after REPLICA_STICKY_SECONDS
+        later = time.time() + 16
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            _, primary, replica = self.request(self.users[0], 'get', 'my-bookings')
+        self.assertIn('booking_booking', replica)
+        self.assertNotIn('booking_booking', primary)
+
+
+@override_settings(REACT_SHELL_CHECK_INTERVAL=0)
+class ReactShellTests(TestCase):
+    """ReactShellMiddleware serving a temporary index.html"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'index.html')
+        self.write_shell('<div id="root"></div>')
+        for patcher in (
+            mock.patch.object(react_shell, 'get_shell_path', return_value=self.path),
+            mock.patch.object(react_shell, '_shell', None),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_shell(self, body):
+        with open(self.path, 'w') as f:
+            f.write(f"<!doctype html><html><body>{body}{'<script></script>' * 100}</body></html>")
+
+    def get(self, path='/', **headers):
+        return self.client.get(path, secure=True, headers=headers)
+
+    def test_shell_has_an_etag(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<div id="root"></div>', response.content)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_matching_etag_gets_a_304(self):
+        etag = self.get()['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(if_none_match='"stale"').status_code, 200)
+
+    def test_compressed_variant_has_its_own_etag(self):
+        plain = self.get()
+        response = self.get(accept_encoding='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotEqual(response['ETag'], plain['ETag'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_client_side_routes_get_the_shell(self):
+        self.assertIn(b'id="root"', self.get('/bookings/42/edit').content)
+        # Django's own routes don't
+        self.assertEqual(self.get('/api/floors/')['Content-Type'], 'application/json')
+        self.assertNotIn(b'id="root"', self.get('/admin/login/').content)
+
+    def test_rebuilt_shell_is_picked_up(self):
+        etag = self.get()['ETag']
+        self.write_shell('<div id="app"></div>')
+        os.utime(self.path, (time.time() + 10, time.time() + 10))
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<div id="app"></div>', response.content)
+
+
+class ApiCompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Floor.objects.bulk_create([Floor(name=f"Compressed floor {i}") for i in range(30)])
+
+    def get(self, **headers):
+        return self.client.get(reverse('floor-list'), secure=True, headers=headers)
+
+    def test_large_responses_are_compressed(self):
+        plain = self.get()
+        self.assertGreater(len(plain.content), 1024)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        # The uncompressed response depends on Accept-Encoding too
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.get(accept_encoding='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_small_responses_are_not(self):
+        with override_settings(API_COMPRESSION_MIN_BYTES=len(self.get().content) + 1):
+            response = self.get(accept_encoding='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('Accept-Encoding', response.get('Vary', ''))
+
+    def test_refused_encoding_is_not_used(self):
+        self.assertFalse(self.get(accept_encoding='gzip;q=0, identity').has_header('Content-Encoding'))
+
+    @skipUnless(compression.brotli, "brotli is not installed")
+    def test_brotli_is_preferred(self):
+        response = self.get(accept_encoding='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), self.get().content)
+
+    def test_encoding_negotiation(self):
+        available = ('br', 'gzip')
+        with mock.patch.object(compression, 'ENCODINGS', available):
+            self.assertEqual(compression.choose_encoding('gzip, deflate, br', available), 'br')
+            self.assertEqual(compression.choose_encoding('gzip, br;q=0', available), 'gzip')
+            self.assertEqual(compression.choose_encoding('GZIP;q=0.5', available), 'gzip')
+            self.assertEqual(compression.choose_encoding('*', available), 'br')
+            self.assertEqual(compression.choose_encoding('br', ('gzip',)), None)
+            self.assertIsNone(compression.choose_encoding('identity, deflate', available))
+            self.assertIsNone(compression.choose_encoding('', available))
+
+
+class FastJSONTests(SimpleTestCase):
+    data = {
+        'price': Decimal('12.50'), 'id': uuid.UUID(int=1), 'rooms': [1, 2], 'counts': {1: 2},
+        'name': 'line\u2028separator', 'nothing': None,
+    }
+
+    def test_renders_like_drf(self):
+        body = FastJSONRenderer().render(self.data)
+        self.assertEqual(json.loads(body), json.loads(JSONRenderer().render(self.data)))
+        # Invalid inside JavaScript strings, so escaped as DRF does
+        self.assertIn(b'\\u2028', body)
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indent(self):
+        renderer = FastJSONRenderer()
+        self.assertEqual(renderer.render(self.data, 'application/json; indent=2').count(b'\n  "'), len(self.data))
+        # orjson only indents by 2
+        self.assertEqual(
+            renderer.render(self.data, 'application/json; indent=4'),
+            JSONRenderer().render(self.data, 'application/json; indent=4'),
+        )
+
+    def test_parses_json(self):
+        self.assertEqual(FastJSONParser().parse(BytesIO(b'{"room_ids": [1, 2]}')), {'room_ids': [1, 2]})
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"room_ids": '))
+
+
+class CostWeightedThrottleTests(BookingFeatureTestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def check_availability(self, client):
+        rooms = ','.join(str(room.id) for room in self.rooms)
+        return client.get(f"{reverse('check-availability')}?date={self.day}&room_ids={rooms}", secure=True)
+
+    @mock.patch.object(CostWeightedThrottle, 'THROTTLE_RATES', {'cost_mentor': '5/hour'})
+    def test_requests_are_charged_their_cost(self):
+        client = self.client_for(self.mentor)
+        response = self.check_availability(client)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-RateLimit-Limit'], '5')
+        self.assertEqual(response['X-RateLimit-Cost'], '2')
+        self.assertEqual(response['X-RateLimit-Remaining'], '3')
+        self.assertEqual(response['X-RateLimit-Reset'], str(2 * 3600 // 5))
+        self.assertEqual(self.check_availability(client)['X-RateLimit-Remaining'], '1')
+
+        response = self.check_availability(client)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['X-RateLimit-Remaining'], '1')
+        # One more unit of cost refills in an hour / 5
+        self.assertEqual(response['Retry-After'], str(3600 // 5))
+        # Other users have their own budget
+        self.assertEqual(self.check_availability(self.client_for(self.users[0])).status_code, 200)
+
+    @mock.patch.object(CostWeightedThrottle, 'THROTTLE_RATES', {'cost_mentor': '4/hour'})
+    def test_concurrent_requests_share_one_budget(self):
+        cache = caches['default']
+
+        class SlowCache:
+            """Holds every read long enough for the other threads to read the same budget"""
+            def __getattr__(self, name):
+                return getattr(cache, name)
+
+            def get(self, *args, **kwargs):
+                value = cache.get(*args, **kwargs)
+                time.sleep(0.02)
+                return value
+
+        request = mock.Mock(user=self.mentor)
+        view = mock.Mock(spec=['throttle_cost'], throttle_cost=1)
+        results = []
+
+        def allow():
+            throttle = CostWeightedThrottle()
+            throttle.cache = SlowCache()
+            results.append(throttle.allow_request(request, view))
+
+        threads = [threading.Thread(target=allow) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(sorted(results), [False] * 4 + [True] * 4)
+
+
+class BatchCreateBookingTests(BookingFeatureTestCase):
+    def items(self):
+        """Two valid bookings and a third overlapping the first"""
+        return [
+            {'room_ids': [self.rooms[0].id], 'start_datetime': local_time(self.day, 10), 'end_datetime': local_time(self.day, 12)},
+            {'room_ids': [self.rooms[0].id], 'start_datetime': local_time(self.day, 13), 'end_datetime': local_time(self.day, 14)},
+            {'room_ids': [self.rooms[0].id], 'start_datetime': local_time(self.day, 11), 'end_datetime': local_time(self.day, 12)},
+        ]
+
+    def test_all_or_nothing_creates_nothing_when_an_item_fails(self):
+        response = self.post(self.mentor, 'booking-batch-create', {'items': self.items()})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.data['results']], ['not_created', 'not_created', 'failed'])
+        self.assertEqual(response.data['results'][2]['detail'], "Overlaps item 0 of this batch.")
+        self.assertFalse(Booking.objects.exists())
+
+    def test_best_effort_creates_the_valid_items(self):
+        response = self.post(self.mentor, 'booking-batch-create', {'items': self.items(), 'mode': 'best_effort'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'created', 'failed'])
+        created = {result['booking_id'] for result in response.data['results'][:2]}
+        self.assertEqual(set(Booking.objects.values_list('id', flat=True)), created)
+
+    def test_conflict_with_an_existing_booking(self):
+        self.book(self.users[0], [self.rooms[0]], self.day, 13, 15)
+        response = self.post(self.mentor, 'booking-batch-create', {'items': self.items()[:2]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['results'][1]['status'], 'failed')
+        self.assertEqual(response.data['results'][1]['conflicts'][0]['room_id'], self.rooms[0].id)
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class BookingSeriesConflictTests(BookingFeatureTestCase):
+    def setUp(self):
+        # Weekly, far beyond the materialization horizon: none of it is a Booking row
+        self.series_start = self.day + timedelta(days=300)
+        response = self.post(self.mentor, 'booking-series-list-create', {
+            'room_ids': [self.rooms[0].id], 'start_date': self.series_start.isoformat(),
+            'start_time': '10:00', 'end_time': '12:00', 'frequency': 'weekly', 'count': 4,
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_single_booking_conflicts_with_an_unmaterialized_occurrence(self):
+        occurrence = self.series_start + timedelta(weeks=2)
+        data = {'room_ids': [self.rooms[0].id], 'start_datetime': local_time(occurrence, 11), 'end_datetime': local_time(occurrence, 13)}
+        response = self.post(self.users[0], 'create-booking', data)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['conflicts'][0]['room_id'], self.rooms[0].id)
+
+        # Outside the occurrences the room is free
+        data.update(start_datetime=local_time(occurrence, 12), end_datetime=local_time(occurrence, 14))
+        self.assertEqual(self.post(self.users[0], 'create-booking', data).status_code, 201)
+
+    def test_series_conflicts_with_another_series(self):
+        response = self.post(self.users[0], 'booking-series-list-create', {
+            'room_ids': [self.rooms[0].id], 'start_date': (self.series_start - timedelta(weeks=1)).isoformat(),
+            'start_time': '11:00', 'end_time': '12:00', 'frequency': 'weekly', 'count': 3,
+        })
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            [conflict['date'] for conflict in response.data['conflicts']],
+            [self.series_start.isoformat(), (self.series_start + timedelta(weeks=1)).isoformat()],
+        )
+
+
+class FindSlotsTests(BookingFeatureTestCase):
+    def test_next_free_times_and_alternative_rooms(self):
+        self.book(self.users[0], [self.rooms[0]], self.day, 8, 12)
+        self.book(self.users[1], [self.rooms[1]], self.day, 10, 11)
+        response = self.client_for(self.mentor).get(reverse('find-slots'), {
+            'room_ids': self.rooms[0].id,
+            'start_datetime': local_time(self.day, 9),
+            'end_datetime': local_time(self.day, 11),
+            'limit': 2,
+        }, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['duration_minutes'], 120)
+        self.assertEqual(
+            [(slot['start_datetime'], slot['free_until']) for slot in response.data['free_slots']],
+            [
+                (localize(datetime.combine(self.day, dt_time(12))).isoformat(),
+                 localize(datetime.combine(self.day + timedelta(days=1), dt_time.min)).isoformat()),
+                (localize(datetime.combine(self.day + timedelta(days=1), dt_time(8))).isoformat(),
+                 localize(datetime.combine(self.day + timedelta(days=2), dt_time.min)).isoformat()),
+            ],
+        )
+        self.assertEqual([room['room_id'] for room in response.data['alternative_rooms']], [self.rooms[2].id])
+
+    def test_invalid_parameters(self):
+        response = self.client_for(self.mentor).get(reverse('find-slots'), {'room_ids': self.rooms[0].id}, secure=True)
+        self.assertEqual(response.status_code, 400)
+
+
+class FloorHeatmapTests(BookingFeatureTestCase):
+    def test_busy_and_free_rooms_per_bucket(self):
+        self.book(self.users[0], [self.rooms[0], self.rooms[1]], self.day, 10, 12)
+        self.book(self.users[1], [self.rooms[1]], self.day, 11, 13)
+        self.book(self.users[2], [self.rooms[2]], self.day, 10, 11, status='Cancelled')
+        response = self.client_for(self.mentor).get(
+            reverse('floor-heatmap', kwargs={'floor_id': self.floor.id}),
+            {'start_date': self.day.isoformat(), 'end_date': self.day.isoformat(), 'bucket': 60},
+            secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_rooms'], 3)
+        buckets = {parse_datetime(bucket['start']): bucket for bucket in response.data['buckets']}
+        self.assertEqual(len(buckets), 16)  # 8 AM to midnight
+
+        def busy_free(hour):
+            bucket = buckets[localize(datetime.combine(self.day, dt_time(hour)))]
+            return bucket['busy_rooms'], bucket['free_rooms']
+
+        self.assertEqual([busy_free(hour) for hour in (9, 10, 11, 12, 13)], [(0, 3), (2, 1), (2, 1), (1, 2), (0, 3)])
+
+    def test_range_too_long(self):
+        response = self.client_for(self.mentor).get(
+            reverse('floor-heatmap', kwargs={'floor_id': self.floor.id}),
+            {'start_date': self.day.isoformat(), 'end_date': (self.day + timedelta(days=60)).isoformat()},
+            secure=True,
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class RoomOccupancyTests(BookingFeatureTestCase):
+    def test_occupancy_annotations(self):
+        now = timezone.now()
+        current = Booking.objects.create(
+            user=self.users[0], start_datetime=now - timedelta(minutes=30), end_datetime=now + timedelta(minutes=30),
+            status='Approved',
+        )
+        current.rooms.set([self.rooms[0]])
+        upcoming = self.book(self.users[1], [self.rooms[1]], self.day, 10, 12)
+        self.book(self.users[2], [self.rooms[2]], self.day, 9, 10, status='Cancelled')
+
+        response = self.client_for(None).get(reverse('room-list'), {'floor': self.floor.id, 'occupancy': 'true'}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        rooms = {room['id']: room for room in response.data}
+        self.assertEqual(
+            [rooms[room.id]['occupied_now'] for room in self.rooms], [True, False, False]
+        )
+        self.assertEqual(parse_datetime(rooms[self.rooms[1].id]['next_booking_start']), upcoming.start_datetime)
+        self.assertIsNone(rooms[self.rooms[2].id]['next_booking_start'])
+
+        day_start = localize(datetime.combine(timezone.localdate(now), dt_time.min))
+        booked_today = min(current.end_datetime, day_start + timedelta(days=1)) - max(current.start_datetime, day_start)
+        self.assertEqual(rooms[self.rooms[0].id]['booked_minutes_today'], int(booked_today.total_seconds() // 60))
+        self.assertEqual(rooms[self.rooms[1].id]['booked_minutes_today'], 0)
+
+
+class IdempotencyKeyTests(BookingFeatureTestCase):
+    def create(self, key, start_hour=10):
+        data = {
+            'room_ids': [self.rooms[0].id],
+            'start_datetime': local_time(self.day, start_hour),
+            'end_datetime': local_time(self.day, start_hour + 1),
+        }
+        return self.post(self.mentor, 'create-booking', data, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_response(self):
+        first = self.create('retry-key')
+        self.assertEqual(first.status_code, 201)
+        replay = self.create('retry-key')
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data['id'], first.data['id'])
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.assertEqual(self.create('reused-key').status_code, 201)
+        self.assertEqual(self.create('reused-key', start_hour=14).status_code, 422)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_key_of_a_request_still_running(self):
+        self.assertEqual(self.create('running-key').status_code, 201)
+        # As if the first request hadn't finished yet
+        IdempotencyRecord.objects.filter(key='running-key').update(status_code=None, response_data=None)
+        self.assertEqual(self.create('running-key').status_code, 409)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_failed_request_releases_its_key(self):
+        self.book(self.users[0], [self.rooms[0]], self.day, 10, 11)
+        self.assertEqual(self.create('conflict-key').status_code, 409)
+        self.assertFalse(IdempotencyRecord.objects.filter(key='conflict-key').exists())
+
+
+@override_settings(
+    COALESCE_SECONDS=30,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'coalescing'}},
+)
+class CoalescingTests(TestCase):
+    def test_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        waiting = threading.Semaphore(0)
+        calls, results = [], []
+
+        class WaiterCountingEvent(threading.Event):
+            def wait(self, timeout=None):
+                waiting.release()
+                return super().wait(timeout)
+
+        class CountedCall(coalescing._Call):
+            def __init__(self):
+                super().__init__()
+                self.done = WaiterCountingEvent()
+
+        def compute():
+            calls.append(threading.get_ident())
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        def call():
+            results.append(flight.do('key', compute))
+
+        with mock.patch.object(coalescing, '_Call', CountedCall):
+            threads = [threading.Thread(target=call) for _ in range(4)]
+            threads[0].start()
+            self.assertTrue(started.wait(5))
+            for thread in threads[1:]:
+                thread.start()
+            # Only let the first call finish once the others are waiting on it
+            for _ in threads[1:]:
+                self.assertTrue(waiting.acquire(timeout=5))
+            release.set()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(results, ['result'] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_result_is_shared_through_the_cache(self):
+        self.assertEqual(coalesce('shared-key', lambda: 'first'), 'first')
+
+        def recompute():
+            self.fail("A published result should be reused")
+
+        self.assertEqual(coalesce('shared-key', recompute), 'first')
+
+
+class AdmissionQueueTests(BookingFeatureTestCase):
+    def test_queued_requests_are_booked_in_arrival_order(self):
+        window = AdmissionWindow.objects.create(
+            name="Registration", opens_at=timezone.now() - timedelta(minutes=5), closes_at=timezone.now() + timedelta(hours=1),
+        )
+        window.rooms.set([self.rooms[0]])
+        data = {'room_ids': [self.rooms[0].id], 'start_datetime': local_time(self.day, 10), 'end_datetime': local_time(self.day, 12)}
+
+        first = self.post(self.users[0], 'create-booking', data)
+        second = self.post(self.users[1], 'create-booking', data)
+        self.assertEqual((first.status_code, second.status_code), (202, 202))
+        self.assertEqual((first.data['status'], first.data['position']), ('Queued', 1))
+        self.assertEqual((second.data['status'], second.data['position']), ('Queued', 2))
+        self.assertFalse(Booking.objects.exists())
+
+        processed, bookings = process_queue()
+        self.assertEqual((len(processed), len(bookings)), (2, 1))
+
+        def poll(user, queued):
+            response = self.client_for(user).get(
+                reverse('queued-booking-detail', kwargs={'request_id': queued.data['id']}), secure=True,
+            )
+            self.assertEqual(response.status_code, 200)
+            return response.data
+
+        booked = poll(self.users[0], first)
+        self.assertEqual((booked['status'], booked['booking_id']), ('Booked', bookings[0].id))
+        self.assertEqual(Booking.objects.get().user, self.users[0])
+        rejected = poll(self.users[1], second)
+        self.assertEqual(rejected['status'], 'Rejected')
+        self.assertEqual(rejected['result']['conflicts'][0]['room_id'], self.rooms[0].id)
+
+
+@override_settings(BOOKING_AUTO_APPROVE_WEEKLY_HOURS=0, BOOKING_WEEKLY_HOURS_LIMIT=3)
+class WaitlistTests(BookingFeatureTestCase):
+    def test_cancellation_books_the_first_eligible_entries(self):
+        booking = self.book(self.admin, [self.rooms[0]], self.day, 10, 12)
+        # users[0] has already booked 2 of their 3 hours this week
+        self.book(self.users[0], [self.rooms[1]], self.day + timedelta(days=1), 10, 12)
+        data = {
+            'room_id': self.rooms[0].id,
+            'start_datetime': booking.start_datetime.isoformat(),
+            'end_datetime': booking.end_datetime.isoformat(),
+        }
+        entries = []
+        for user in self.users:
+            response = self.post(user, 'waitlist-list-create', data)
+            self.assertEqual(response.status_code, 201, response.data)
+            entries.append(response.data['id'])
+
+        response = self.client_for(self.admin).delete(
+            reverse('booking-detail', kwargs={'booking_id': booking.id}), secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # users[0] would go over the weekly limit and keeps waiting; users[1] was next and
+        # gets the room; users[2]'s entry overlaps that booking
+        statuses = dict(WaitlistEntry.objects.filter(id__in=entries).values_list('user_id', 'status'))
+        self.assertEqual([statuses[user.id] for user in self.users], ['Waiting', 'Booked', 'Waiting'])
+        promoted = WaitlistEntry.objects.get(user=self.users[1]).booking
+        self.assertEqual((promoted.user, list(promoted.rooms.all())), (self.users[1], [self.rooms[0]]))
+        self.assertEqual(promoted.start_datetime, booking.start_datetime)
+
+    def test_cancelling_twice_promotes_once(self):
+        booking = self.book(self.admin, [self.rooms[0]], self.day, 10, 12, status='Cancelled')
+        with mock.patch('booking.views.on_booking_cancelled') as on_booking_cancelled, \
+                mock.patch('booking.email_utils.send_booking_cancellation_email') as send_email, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client_for(self.admin).delete(
+                reverse('booking-detail', kwargs={'booking_id': booking.id}), secure=True,
+            )
+        self.assertEqual(response.status_code, 200)
+        on_booking_cancelled.assert_not_called()
+        send_email.assert_not_called()
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE')])
+
+    def test_cannot_wait_for_a_free_room(self):
+        data = {
+            'room_id': self.rooms[0].id,
+            'start_datetime': local_time(self.day, 10),
+            'end_datetime': local_time(self.day, 12),
+        }
+        self.assertEqual(self.post(self.users[0], 'waitlist-list-create', data).status_code, 400)
+
+
+class WeeklyUsageTests(TestCase):
+    """The usage counters stay equal to a recount through bulk writes of thousands of bookings"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = CustomUser.objects.bulk_create([
+            CustomUser(email=f"usage{i}@example.com", username=f"usage{i}", role='user', approval_status='approved')
+            for i in range(60)
+        ])
+
+    def assertCountersMatchBookings(self):
+        stored = {
+            (user_id, week): minutes
+            for user_id, week, minutes in WeeklyUsage.objects.values_list('user_id', 'week_start', 'booked_minutes')
+            if minutes
+        }
+        self.assertEqual(stored, weekly_totals(Booking.objects.values_list(*USAGE_FIELDS)))
+
+    def test_bulk_create_update_and_delete(self):
+        start_of_today = timezone.localtime().replace(hour=8, minute=0, second=0, microsecond=0)
+        Booking.objects.bulk_create([
+            Booking(
+                user=self.users[i % len(self.users)],
+                start_datetime=start_of_today + timedelta(days=i % 700, hours=i % 10),
+                end_datetime=start_of_today + timedelta(days=i % 700, hours=i % 10 + 1 + i % 3),
+                status=('Approved', 'Pending', 'Cancelled')[i % 3],
+                booking_type='camp' if i % 50 == 0 else 'regular',
+            )
+            for i in range(3000)
+        ], batch_size=500)
+        self.assertGreater(WeeklyUsage.objects.count(), 1000)
+        self.assertCountersMatchBookings()
+
+        # Small and large (rebuilding) updates and deletes
+        Booking.objects.filter(user=self.users[0]).update(status='Cancelled')
+        self.assertCountersMatchBookings()
+        Booking.objects.filter(user__in=self.users[:40]).update(status='Approved')
+        self.assertCountersMatchBookings()
+        Booking.objects.filter(user=self.users[1]).delete()
+        self.assertCountersMatchBookings()
+        Booking.objects.filter(user__in=self.users[:40]).delete()
+        self.assertCountersMatchBookings()
+
+        Booking.objects.all().delete()
+        self.assertFalse(WeeklyUsage.objects.exists())
+
+    @override_settings(BOOKING_AUTO_APPROVE_WEEKLY_HOURS=3, BOOKING_WEEKLY_HOURS_LIMIT=6)
+    def test_quota_checks_read_the_counters(self):
+        floor = Floor.objects.create(name="Quota floor")
+        rooms = Room.objects.bulk_create([Room(name=f"Quota room {i}", floor=floor) for i in range(4)])
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.users[0]).access_token}")
+        # 2-hour bookings on consecutive days of one week, past the other tests' bookings
+        day_400 = timezone.localdate() + timedelta(days=400)
+        monday = day_400 - timedelta(days=day_400.weekday())
+        statuses = []
+        for day in range(4):
+            start = f"{monday + timedelta(days=day)}T10:00:00"
+            end = f"{monday + timedelta(days=day)}T12:00:00"
+            response = client.post(
+                reverse('create-booking'),
+                {'room_ids': [rooms[day].id], 'start_datetime': start, 'end_datetime': end},
+                format='json', secure=True,
+            )
+            statuses.append(response.data.get('status') if response.status_code == 201 else response.status_code)
+        # Auto-approved up to 3 hours, Pending up to 6, refused past the limit
+        self.assertEqual(statuses, ['Approved', 'Pending', 'Pending', 400])
+        self.assertEqual(WeeklyUsage.objects.get(user=self.users[0], week_start=monday).booked_minutes, 360)
+
+
+@override_settings(
+    DATABASE_ROUTERS=[],
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'request-metrics'}},
+)
+class RequestMetricsTests(TestCase):
+    """Per-request query metrics count the ORM work of ASGI requests, which runs on executor threads"""
+
+    @classmethod
+    def setUpTestData(cls):
+        floor = Floor.objects.create(name="Metrics floor")
+        Room.objects.create(name="Metrics room", floor=floor)
+
+    def observed(self, view):
+        """(requests, total queries) recorded in db_queries_per_request for view"""
+        for name, labels, histogram in metrics.registry.snapshot()['histograms']:
+            if name == 'db_queries_per_request' and labels == {'view': view}:
+                return histogram['count'], histogram['sum']
+        return 0, 0
+
+    async def test_asgi_requests_count_queries(self):
+        for view in ('async-room-list', 'room-list'):
+            with self.subTest(view=view):
+                requests_before, queries_before = self.observed(view)
+                response = await AsyncClient().get(reverse(view), secure=True)
+                self.assertEqual(response.status_code, 200)
+                requests_after, queries_after = self.observed(view)
+                self.assertEqual(requests_after, requests_before + 1)
+                self.assertGreater(queries_after, queries_before)
+
+    async def test_asgi_snapshot_is_written_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        flush_threads = []
+        with mock.patch.object(metrics.registry, '_last_flush', 0.0), \
+                mock.patch.object(metrics.registry, 'flush', side_effect=lambda: flush_threads.append(threading.get_ident())):
+            response = await AsyncClient().get(reverse('async-room-list'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(flush_threads), 1)
+        self.assertNotEqual(flush_threads[0], loop_thread)
+
+
+class MetricsSnapshotTests(TestCase):
+    """collect() merges the snapshots of live workers and removes those of exited ones"""
+
+    def write_snapshot(self, directory, filename, requests, age=0):
+        path = os.path.join(directory, filename)
+        with open(path, 'w') as f:
+            json.dump({'counters': [['http_requests_total', {'view': 'snapshot-test'}, requests]], 'histograms': []}, f)
+        if age:
+            os.utime(path, (time.time() - age, time.time() - age))
+
+    def test_collect_prunes_exited_workers(self):
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            METRICS_DIR=directory, METRICS_SNAPSHOT_TTL=3600
+        ):
+            self.write_snapshot(directory, f"metrics-{os.getppid()}-aaaa.json", 2)
+            self.write_snapshot(directory, f"metrics-{exited.pid}-bbbb.json", 30)
+            self.write_snapshot(directory, f"metrics-{os.getppid()}-cccc.json", 400, age=7200)
+
+            counters, _ = metrics.collect()
+            self.assertEqual(counters[('http_requests_total', (('view', 'snapshot-test'),))], 2)
+            self.assertEqual(
+                sorted(name for name in os.listdir(directory) if name.startswith('metrics-')),
+                sorted([f"metrics-{os.getppid()}-aaaa.json", f"metrics-{os.getpid()}-{metrics.registry._token}.json"]),
+            )
+
+
+class BookingQueueConsumerLockTests(TestCase):
+    def test_single_consumer(self):
+        from .management.commands.process_booking_queue import ConsumerLock
+        first, second = ConsumerLock(), ConsumerLock()
+        self.assertTrue(first.acquire())
+        try:
+            self.assertTrue(first.acquire(), "The holder can re-check its lock")
+            self.assertFalse(second.acquire())
+        finally:
+            first.release()
+        self.assertTrue(second.acquire())
+        second.release()
+
+
+class BookingPartitioningTests(TransactionTestCase):
+    def test_references_to_bookings_have_no_constraint(self):
+        self.assertEqual(partitioning.check_inbound_foreign_keys(None), [])
+
+    @override_settings(BOOKING_MAX_SPAN_DAYS=62)
+    def test_conversion_blockers(self):
+        user = CustomUser.objects.create_user(
+            email="legacy@example.com", username="legacy", password="x", role='user', approval_status='approved',
+        )
+        start = timezone.now() + timedelta(days=1)
+        Booking.objects.create(user=user, start_datetime=start, end_datetime=start + timedelta(days=62))
+        self.assertEqual(partitioning.conversion_blockers(), [])
+
+        Booking.objects.create(user=user, start_datetime=start, end_datetime=start + timedelta(days=62, hours=1))
+        Booking.objects.create(user=user, start_datetime=None, end_datetime=None)
+        problems = partitioning.conversion_blockers()
+        self.assertEqual(len(problems), 2)
+        self.assertIn("1 booking(s) have no start_datetime", problems[0])
+        self.assertIn("spans 63 days", problems[1])
+
+    @skipUnless(connection.vendor == 'postgresql', "Booking partitioning needs PostgreSQL")
+    @override_settings(BOOKING_PARTITIONING=True)
+    def test_convert_then_migrate(self):
+        # Convert before the migrations that add references to bookings, then apply them
+        call_command('migrate', 'booking', '0010', verbosity=0)
+        call_command('manage_booking_partitions', '--convert', stdout=StringIO())
+        call_command('migrate', 'booking', verbosity=0)
+
+        user = CustomUser.objects.create_user(
+            email="partitioned@example.com", username="partitioned", password="x", role='user',
+            approval_status='approved',
+        )
+        room = Room.objects.create(name="Partitioned room", floor=Floor.objects.create(name="Partitioned floor"))
+        start = timezone.now() + timedelta(days=1)
+        booking = Booking.objects.create(user=user, start_datetime=start, end_datetime=start + timedelta(hours=1))
+        booking.rooms.add(room)
+        entry = WaitlistEntry.objects.create(
+            user=user, room=room, start_datetime=start, end_datetime=start + timedelta(hours=1), booking=booking,
+        )
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Booking.objects.create(user=user, start_datetime=None, end_datetime=None)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Booking.rooms.through.objects.create(booking_id=booking.pk + 1000, room=room)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            WaitlistEntry.objects.filter(pk=entry.pk).update(booking_id=booking.pk + 1000)
+
+        # Moving a booking to another month's partition keeps its references
+        Booking.objects.filter(pk=booking.pk).update(
+            start_datetime=start + timedelta(days=40), end_datetime=start + timedelta(days=40, hours=1)
+        )
+        self.assertEqual(list(booking.rooms.all()), [room])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {partitioning.BOOKING_TABLE} WHERE id = %s", [booking.pk])
+        self.assertFalse(Booking.rooms.through.objects.filter(booking_id=booking.pk).exists())
+        entry.refresh_from_db()
+        self.assertIsNone(entry.booking_id)
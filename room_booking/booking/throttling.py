@@ -0,0 +1,133 @@
+"""
+Cost-weighted throttling
+
+DRF's AnonRateThrottle/UserRateThrottle count every request the same, so a client hammering
+check_availability/ or the admin bookings list pays no more than one polling auth/user/.
+CostWeightedThrottle charges each request a cost instead: a view declares `throttle_cost`
+(default 1), or `get_throttle_cost(request)` when the charge depends on the request (how
+many rooms, how many days, how many rows).
+
+Each user gets a budget of cost units per period from the `cost_<role>` rate in
+DEFAULT_THROTTLE_RATES ('cost_anon' for anonymous clients, keyed by IP). The budget
+refills continuously (GCRA, one float per client in the shared cache), so a heavy client
+runs out without holding anyone else back. The read-modify-write of that float happens
+under a short-lived per-client lock in the shared cache (cache.add), so concurrent
+requests from one client can't all spend the same budget; a request that can't get the
+lock within LOCK_WAIT_SECONDS is throttled. Every response carries X-RateLimit-Limit,
+-Remaining, -Cost and -Reset (seconds until the budget is full again).
+"""
+from rest_framework.throttling import SimpleRateThrottle
+from .cache_utils import make_key
+from .datetime_utils import parse_local_datetime
+import math
+import time
+
+# The per-client lock around the budget update: held for a cache round trip, expires
+# after LOCK_SECONDS if its holder dies
+LOCK_SECONDS = 2
+LOCK_WAIT_SECONDS = 0.5
+LOCK_POLL_SECONDS = 0.005
+
+
+def availability_cost(params):
+    """check_availability: 2, plus 1 for every 5 rooms asked about"""
+    room_count = len([rid for rid in params.get('room_ids', '').split(',') if rid.strip()])
+    return 2 + room_count // 5
+
+
+def booking_write_cost(data):
+    """
+    Creating a booking: 3, plus 1 per extra room, 5 for a whole floor and 1 per extra day
+    the booking spans (camps)
+    """
+    cost = 3
+    room_ids = data.get('room_ids') or []
+    if isinstance(room_ids, list):
+        cost += max(0, len(room_ids) - 1)
+    if data.get('floor_id'):
+        cost += 5
+    try:
+        span = parse_local_datetime(data['end_datetime']) - parse_local_datetime(data['start_datetime'])
+        cost += max(0, span.days)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        pass
+    return cost
+
+
+class CostWeightedThrottle(SimpleRateThrottle):
+    scope_prefix = 'cost'
+
+    def __init__(self):
+        # The scope, and so the rate, depends on who is asking; see allow_request
+        pass
+
+    def get_scope(self, request):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return f"{self.scope_prefix}_anon"
+        return f"{self.scope_prefix}_{getattr(user, 'role', 'user')}"
+
+    def get_rate(self):
+        return self.THROTTLE_RATES.get(self.scope) or self.THROTTLE_RATES.get(f"{self.scope_prefix}_user")
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return make_key('throttle', self.scope, request.user.pk)
+        return make_key('throttle', self.scope, self.get_ident(request))
+
+    def get_cost(self, request, view):
+        get_throttle_cost = getattr(view, 'get_throttle_cost', None)
+        if get_throttle_cost is not None:
+            return max(1, get_throttle_cost(request))
+        return getattr(view, 'throttle_cost', 1)
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        self.scope = self.get_scope(request)
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        limit, period = self.parse_rate(self.rate)
+        # A request can never cost more than the whole budget
+        cost = min(self.get_cost(request, view), limit)
+        interval = period / limit  # Seconds for one unit of cost to refill
+
+        key = self.get_cache_key(request, view)
+        lock_key = f"{key}:lock"
+        if not self.acquire(lock_key):
+            self.wait_seconds = LOCK_WAIT_SECONDS
+            return False
+        try:
+            now = self.timer()
+            # Theoretical arrival time: when the budget would be completely full again
+            tat = max(self.cache.get(key, now), now)
+            new_tat = tat + cost * interval
+            allowed = new_tat - now <= period
+            if allowed:
+                self.cache.set(key, new_tat, math.ceil(period))
+            else:
+                new_tat = tat
+                self.wait_seconds = tat + cost * interval - period - now
+        finally:
+            self.cache.delete(lock_key)
+
+        remaining = max(0, math.floor((period - (new_tat - now)) / interval + 1e-9))
+        headers = getattr(view, 'headers', None)
+        if headers is not None:
+            headers['X-RateLimit-Limit'] = str(limit)
+            headers['X-RateLimit-Remaining'] = str(remaining)
+            headers['X-RateLimit-Cost'] = str(cost)
+            headers['X-RateLimit-Reset'] = str(math.ceil(new_tat - now))
+        return allowed
+
+    def acquire(self, lock_key):
+        """Take the client's budget lock, waiting up to LOCK_WAIT_SECONDS for it"""
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while not self.cache.add(lock_key, True, LOCK_SECONDS):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(LOCK_POLL_SECONDS)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,144 @@
+"""
+API traffic capture
+
+TrafficCaptureMiddleware (booking.middleware) calls record_request() for every /api/
+request when TRAFFIC_CAPTURE_ENABLED is set. Each request becomes one JSON line in
+TRAFFIC_CAPTURE_LOG holding the method, path, route, redacted query and body, the body's
+shape, the response status and timing, and the caller's role. Users are identified only
+by a keyed hash so a replay can keep one caller's requests together without knowing who
+they were. Credentials and personal fields are never written.
+
+Use `python manage.py replay_traffic` to re-issue a capture against a local instance.
+"""
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+REDACTED = '<redacted>'
+# Request fields that identify a person or carry a secret
+SENSITIVE_KEYS = {
+    'password', 'email', 'username', 'first_name', 'last_name', 'name',
+    'refresh', 'access', 'token', 'gender',
+}
+MAX_CAPTURED_BODY_BYTES = 64 * 1024
+
+_log_lock = threading.Lock()
+_log_handler = None
+
+
+def get_log_path():
+    return settings.TRAFFIC_CAPTURE_LOG or os.path.join(tempfile.gettempdir(), 'grfs-traffic.jsonl')
+
+
+def get_log_paths():
+    """Rotated backups oldest first, then the current capture file (chronological order)"""
+    path = get_log_path()
+    return [f"{path}.{index}" for index in range(settings.TRAFFIC_CAPTURE_BACKUP_COUNT, 0, -1)] + [path]
+
+
+def _get_log_handler():
+    global _log_handler
+    if _log_handler is None:
+        path = get_log_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _log_handler = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=settings.TRAFFIC_CAPTURE_LOG_MAX_BYTES,
+            backupCount=settings.TRAFFIC_CAPTURE_BACKUP_COUNT,
+            encoding='utf-8',
+        )
+    return _log_handler
+
+
+def pseudonymize_user(user_id):
+    """Stable per-deployment alias for a user id (HMAC keyed with SECRET_KEY)"""
+    digest = hmac.new(settings.SECRET_KEY.encode('utf-8'), str(user_id).encode('utf-8'), hashlib.sha256)
+    return digest.hexdigest()[:12]
+
+
+def redact(value, key=None):
+    """Copy of a parsed JSON value with sensitive keys replaced by REDACTED"""
+    if key is not None and key.lower() in SENSITIVE_KEYS:
+        return REDACTED
+    if isinstance(value, dict):
+        return {k: redact(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def shape_of(value):
+    """Structure of a JSON value without its contents: {'room_ids': ['int'], 'start_datetime': 'str'}"""
+    if isinstance(value, dict):
+        return {k: shape_of(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [shape_of(value[0])] if value else []
+    if value is None:
+        return 'null'
+    return type(value).__name__
+
+
+def read_body(request):
+    """
+    Parsed JSON body of a request, or None. Must run before the view reads the stream.
+    """
+    if request.method in ('GET', 'HEAD', 'OPTIONS') or request.content_type != 'application/json':
+        return None
+    try:
+        if int(request.META.get('CONTENT_LENGTH') or 0) > MAX_CAPTURED_BODY_BYTES:
+            return None
+        return json.loads(request.body or b'null')
+    except ValueError:
+        return None
+
+
+def record_request(request, body, response, started_at, duration, view):
+    """Append one anonymized trace line for a finished request"""
+    user = getattr(request, 'user', None)
+    authenticated = user is not None and user.is_authenticated
+    record = {
+        'time': started_at.isoformat(),
+        'method': request.method,
+        'path': request.path,
+        'route': view,
+        'query': {key: redact(request.GET.getlist(key), key) for key in request.GET},
+        'body': redact(body),
+        'shape': shape_of(body),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 3),
+        'role': user.role if authenticated else 'anonymous',
+        'user': pseudonymize_user(user.pk) if authenticated else None,
+    }
+    try:
+        handler = _get_log_handler()
+        with _log_lock:
+            handler.emit(logging.makeLogRecord({'msg': json.dumps(record, default=str)}))
+    except Exception as e:
+        logger.error(f"Failed to write traffic capture record: {str(e)}")
+
+
+def read_traces(paths=None, since=None):
+    """Yield captured trace records in the order they were written (default: the capture log)"""
+    for path in paths or get_log_paths():
+        try:
+            with open(path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            continue
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if since and parse_datetime(record['time']) < since:
+                continue
+            yield record
@@ -1,15 +1,24 @@
 from django.urls import path
 from .views import *
+from .async_views import AsyncCheckAvailabilityView, AsyncFloorListView, AsyncRoomListView, AsyncMyBookingView
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     path('create_booking/', CreateBookingView.as_view(), name='create-booking'),
     path('check_availability/', CheckAvailabilityView.as_view(), name='check-availability'),
+    path('find_slots/', FindSlotsView.as_view(), name='find-slots'),
     path('floors/', FloorListView.as_view(), name='floor-list'),
+    path('floors/<int:floor_id>/heatmap/', FloorHeatmapView.as_view(), name='floor-heatmap'),
     path('rooms/', RoomListView.as_view(), name='room-list'),
     path('bookings/', BookingListCreateView.as_view(), name='booking-list-create'),
     path('bookings/my', MyBookingView.as_view(), name='my-bookings'),
+    path('bookings/batch/', BatchCreateBookingView.as_view(), name='booking-batch-create'),
     path('bookings/<int:booking_id>/', BookingDetailView.as_view(), name='booking-detail'),
+    path('booking-series/', BookingSeriesListCreateView.as_view(), name='booking-series-list-create'),
+    path('booking-series/<int:series_id>/', BookingSeriesDetailView.as_view(), name='booking-series-detail'),
+    path('booking-queue/<int:request_id>/', QueuedBookingDetailView.as_view(), name='queued-booking-detail'),
+    path('waitlist/', WaitlistListCreateView.as_view(), name='waitlist-list-create'),
+    path('waitlist/<int:entry_id>/', WaitlistEntryDetailView.as_view(), name='waitlist-detail'),
     path('auth/register/', RegisterView.as_view(), name='register'),
     path('auth/login/', LoginView.as_view(), name='login'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -18,4 +27,13 @@ urlpatterns = [
     path('admin/approve-user/<int:user_id>/', ApproveUserView.as_view(), name='approve-user'),
     path('admin/bookings/<int:booking_id>/status/', UpdateBookingStatusView.as_view(), name='update-booking-status'),
     path('admin/bookings/delete-all/', DeleteAllBookingsView.as_view(), name='delete-all-bookings'),
+    # Async versions of the read-heavy endpoints, for ASGI deployments
+    path('async/check_availability/', AsyncCheckAvailabilityView.as_view(), name='async-check-availability'),
+    path('async/floors/', AsyncFloorListView.as_view(), name='async-floor-list'),
+    path('async/rooms/', AsyncRoomListView.as_view(), name='async-room-list'),
+    path('async/bookings/my', AsyncMyBookingView.as_view(), name='async-my-bookings'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('admin/db-pool/', DatabasePoolView.as_view(), name='db-pool'),
+    path('admin/profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('admin/profiles/<str:profile_id>/', ProfileDownloadView.as_view(), name='profile-download'),
 ]
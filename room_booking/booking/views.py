@@ -1,24 +1,30 @@
-from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions, generics
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed, ValidationError as DRFValidationError
-from .models import Booking, Room, Floor
+from .models import Booking, BookingSeries, QueuedBooking, Room, Floor, WaitlistEntry
 from .serializers import *
+from .coalescing import coalesce
+from .datetime_utils import local_day_bounds, local_hour_slots, parse_date, parse_local_datetime, to_local
+from .db_router import PRIMARY, ReplicaReadMixin
+from .idempotency import IdempotentMixin
+from .throttling import availability_cost, booking_write_cost
+from . import admission, batch, heatmap, react_shell, slot_finder
+from .series import cancel_series, conflict_response, materialize_series, series_conflicts, unmaterialized_series_conflicts
+from .waitlist import on_booking_cancelled
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.db.models import Q
-from django.db import IntegrityError, DatabaseError
-from django.http import HttpResponse
+from django.db.models import Count, Q, prefetch_related_objects
+from django.db import IntegrityError, DatabaseError, connections
+from django.http import HttpResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-import pytz
 import logging
 import os
 
@@ -35,35 +41,25 @@ def serve_react_app(request):
     # Only handle GET and HEAD requests
     if request.method not in ['GET', 'HEAD']:
         return HttpResponse('Method not allowed', status=405)
-    
+
+    # Normally answered by ReactShellMiddleware; served from the same in-memory copy here
     try:
-        # Use Django's template system to render the template
-        # This is more reliable than manually reading the file
-        return render(request, 'index.html', {}, content_type='text/html')
+        return react_shell.get_shell().response(request)
+    except FileNotFoundError:
+        error_msg = f"React template not found at: {react_shell.get_shell_path()}. BASE_DIR: {settings.BASE_DIR}"
+        logger.error(error_msg)
+        return HttpResponse(
+            f"React app template not found. Please rebuild the frontend.\n{error_msg}",
+            status=500,
+            content_type='text/plain'
+        )
     except Exception as e:
-        # Fallback: try to read the file directly if template rendering fails
-        try:
-            template_path = os.path.join(settings.BASE_DIR, 'booking', 'templates', 'index.html')
-            if os.path.exists(template_path):
-                with open(template_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    return HttpResponse(content, content_type='text/html; charset=utf-8')
-            else:
-                error_msg = f"React template not found at: {template_path}. BASE_DIR: {settings.BASE_DIR}"
-                logger.error(error_msg)
-                return HttpResponse(
-                    f"React app template not found. Please rebuild the frontend.\n{error_msg}",
-                    status=500,
-                    content_type='text/plain'
-                )
-        except Exception as e2:
-            error_msg = f"Error serving React app: {str(e)} (fallback also failed: {str(e2)})"
-            logger.error(error_msg, exc_info=True)
-            return HttpResponse(
-                f"Error loading React app: {str(e)}",
-                status=500,
-                content_type='text/plain'
-            )
+        logger.error(f"Error serving React app: {str(e)}", exc_info=True)
+        return HttpResponse(
+            f"Error loading React app: {str(e)}",
+            status=500,
+            content_type='text/plain'
+        )
 
 def check_booking_conflicts(room_ids, start_datetime, end_datetime, exclude_booking_id=None):
     """
@@ -71,29 +67,17 @@ def check_booking_conflicts(room_ids, start_datetime, end_datetime, exclude_book
     Returns a list of conflicting bookings with details.
     """
     try:
-        if isinstance(start_datetime, str):
-            start_dt = datetime.fromisoformat(start_datetime.replace('Z', '+00:00'))
-        else:
-            start_dt = start_datetime
-        if isinstance(end_datetime, str):
-            end_dt = datetime.fromisoformat(end_datetime.replace('Z', '+00:00'))
-        else:
-            end_dt = end_datetime
-    except (ValueError, AttributeError) as e:
-        # If parsing fails and it's not already a datetime, raise error
-        if not isinstance(start_datetime, datetime) or not isinstance(end_datetime, datetime):
-            raise ValueError(f"Invalid datetime format: {str(e)}")
-        start_dt = start_datetime
-        end_dt = end_datetime
+        start_dt = parse_local_datetime(start_datetime) if isinstance(start_datetime, str) else start_datetime
+        end_dt = parse_local_datetime(end_datetime) if isinstance(end_datetime, str) else end_datetime
+    except ValueError as e:
+        raise ValueError(f"Invalid datetime format: {str(e)}")
     
     # Find bookings that overlap with the requested time for any of the rooms
     # Overlap occurs when: existing_start < requested_end AND existing_end > requested_start
-    conflicting_bookings = Booking.objects.filter(
+    # Always read from the primary: a lagging replica could miss a booking made moments ago
+    conflicting_bookings = Booking.objects.using(PRIMARY).active().filter(
         rooms__id__in=room_ids,
-        status__in=['Pending', 'Approved']  # Only check active bookings
-    ).filter(
-        Q(start_datetime__lt=end_dt) & Q(end_datetime__gt=start_dt)
-    ).prefetch_related('rooms').distinct()
+    ).overlapping(start_dt, end_dt).prefetch_related('rooms').distinct()
     
     if exclude_booking_id:
         conflicting_bookings = conflicting_bookings.exclude(id=exclude_booking_id)
@@ -109,11 +93,17 @@ def check_booking_conflicts(room_ids, start_datetime, end_datetime, exclude_book
                 'existing_start': booking.start_datetime.isoformat() if booking.start_datetime else None,
                 'existing_end': booking.end_datetime.isoformat() if booking.end_datetime else None,
             })
+
+    # Occurrences of recurring bookings that aren't Booking rows yet
+    conflicts.extend(unmaterialized_series_conflicts([(set(room_ids), start_dt, end_dt)])[0])
     
     return conflicts
 
-class CreateBookingView(APIView):
+class CreateBookingView(IdempotentMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+
+    def get_throttle_cost(self, request):
+        return booking_write_cost(request.data)
     
     def post(self, request):
         try:
@@ -157,7 +147,7 @@ class CreateBookingView(APIView):
             # Check permissions for camp bookings
             if booking_type == 'camp':
                 user_role = request.user.role
-                if user_role not in ['mentor', 'coordinator', 'admin']:
+                if user_role not in CAMP_BOOKING_ROLES:
                     return Response(
                         {"detail": "Only mentors, coordinators, and admins can book camps."}, 
                         status=status.HTTP_403_FORBIDDEN
@@ -173,81 +163,28 @@ class CreateBookingView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Parse datetime strings and convert to EST timezone-aware datetimes
-            est = pytz.timezone('America/New_York')
+            # The frontend sends times in EST/EDT (YYYY-MM-DDTHH:MM:SS), so we treat them as such
             try:
-                # Parse the datetime string (format: YYYY-MM-DDTHH:MM:SS)
-                # The frontend sends times in EST/EDT, so we treat them as such
-                start_dt_naive = datetime.strptime(start_datetime_str, '%Y-%m-%dT%H:%M:%S')
-                end_dt_naive = datetime.strptime(end_datetime_str, '%Y-%m-%dT%H:%M:%S')
-                
-                # Use localize() to treat naive datetime as being in EST timezone
-                # This preserves the exact time the user selected
-                # is_dst=None raises error on ambiguous times (DST transitions)
-                # which is safer than guessing
-                try:
-                    start_datetime = est.localize(start_dt_naive, is_dst=None)
-                    end_datetime = est.localize(end_dt_naive, is_dst=None)
-                except pytz.AmbiguousTimeError:
-                    # If ambiguous (DST transition), use the later occurrence (DST=True)
-                    start_datetime = est.localize(start_dt_naive, is_dst=True)
-                    end_datetime = est.localize(end_dt_naive, is_dst=True)
-                except pytz.NonExistentTimeError:
-                    # If time doesn't exist (spring forward), use the next valid time
-                    start_datetime = est.localize(start_dt_naive, is_dst=False)
-                    end_datetime = est.localize(end_dt_naive, is_dst=False)
-            except ValueError:
-                # Try parsing with timezone if provided
-                try:
-                    start_datetime = datetime.fromisoformat(start_datetime_str.replace('Z', '+00:00'))
-                    end_datetime = datetime.fromisoformat(end_datetime_str.replace('Z', '+00:00'))
-                    # Convert to EST
-                    if start_datetime.tzinfo is None:
-                        start_datetime = timezone.make_aware(start_datetime, est)
-                    else:
-                        start_datetime = start_datetime.astimezone(est)
-                    if end_datetime.tzinfo is None:
-                        end_datetime = timezone.make_aware(end_datetime, est)
-                    else:
-                        end_datetime = end_datetime.astimezone(est)
-                except (ValueError, AttributeError) as e:
-                    return Response(
-                        {"detail": f"Invalid datetime format. Use YYYY-MM-DDTHH:MM:SS. Error: {str(e)}"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # Validate that end time is after start time
-            if end_datetime <= start_datetime:
-                return Response(
-                    {"detail": "End datetime must be after start datetime."}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Validate that start_datetime is not in the past
-            now = timezone.now()
-            if start_datetime < now:
+                start_datetime = parse_local_datetime(start_datetime_str)
+                end_datetime = parse_local_datetime(end_datetime_str)
+            except (ValueError, AttributeError) as e:
                 return Response(
-                    {"detail": "Cannot create bookings in the past."}, 
+                    {"detail": f"Invalid datetime format. Use YYYY-MM-DDTHH:MM:SS. Error: {str(e)}"}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # For camp bookings, skip duration validation (they can span multiple days)
-            if booking_type != 'camp':
-                # Validate maximum booking duration (e.g., 8 hours) for regular bookings
-                max_duration = timedelta(hours=8)
-                if (end_datetime - start_datetime) > max_duration:
-                    return Response(
-                        {"detail": "Booking duration cannot exceed 8 hours."}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Validate minimum booking duration (e.g., 1 hour) for regular bookings
-                min_duration = timedelta(hours=1)
-                if (end_datetime - start_datetime) < min_duration:
-                    return Response(
-                        {"detail": "Booking duration must be at least 1 hour."}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+            # End after start, not in the past, 1-8 hours unless it's a camp
+            window_error = booking_window_error(booking_type, start_datetime, end_datetime, timezone.now())
+            if window_error:
+                return Response({"detail": window_error}, status=status.HTTP_400_BAD_REQUEST)
+
+            # While an admission window is open for these rooms (e.g. camp registration),
+            # queue the request to be booked in arrival order instead of contending for
+            # the same rows; the client polls booking-queue/<id>/ for the outcome
+            window = admission.open_window(room_ids, timezone.now())
+            if window is not None:
+                queued = admission.enqueue(request.user, window, room_ids, start_datetime, end_datetime, booking_type)
+                return Response(admission.queued_booking_data(queued), status=status.HTTP_202_ACCEPTED)
 
             # Check for booking conflicts - use database transaction to prevent race conditions
             from django.db import transaction
@@ -256,27 +193,17 @@ class CreateBookingView(APIView):
                 conflicts = check_booking_conflicts(room_ids, start_datetime, end_datetime)
                 if conflicts:
                     # Format conflict details for user-friendly error message
-                    conflict_details = []
-                    unavailable_hours = []
-                    for conflict in conflicts:
-                        conflict_details.append(
-                            f"Room '{conflict['room_name']}' is already booked from "
-                            f"{conflict['existing_start']} to {conflict['existing_end']}"
-                        )
-                        unavailable_hours.append({
-                            'room': conflict['room_name'],
-                            'start': conflict['existing_start'],
-                            'end': conflict['existing_end']
-                        })
-                    
-                    return Response(
-                        {
-                            "detail": "Some rooms are already booked during the requested time.",
-                            "conflicts": unavailable_hours,
-                            "conflict_messages": conflict_details
-                        }, 
-                        status=status.HTTP_409_CONFLICT
-                    )
+                    response_data = conflict_response(conflicts)
+                    # Optionally include the next free times and free rooms nearby, so the
+                    # client doesn't have to guess and retry
+                    if str(request.data.get('suggest', request.query_params.get('suggest', ''))).lower() in ('1', 'true', 'yes'):
+                        try:
+                            response_data["suggestions"] = slot_finder.conflict_suggestions(
+                                room_ids, start_datetime, end_datetime, timezone.now()
+                            )
+                        except Exception as e:
+                            logger.error(f"Failed to compute booking suggestions: {str(e)}", exc_info=True)
+                    return Response(response_data, status=status.HTTP_409_CONFLICT)
 
                 # Create the booking (single booking for both regular and camp bookings)
                 # For camp bookings, this will be one booking covering the entire time period
@@ -290,6 +217,8 @@ class CreateBookingView(APIView):
                 serializer = BookingSerializer(data=booking_data, context={'request': request})
                 if serializer.is_valid():
                     booking = serializer.save()  # Create booking
+                    # Load rooms and floors once for both the response and the email
+                    prefetch_related_objects([booking], 'rooms__floor')
                     
                     # Send booking creation email
                     try:
@@ -315,12 +244,207 @@ class CreateBookingView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-class FloorListView(APIView):
+class BatchCreateBookingView(IdempotentMixin, APIView):
+    """
+    Create many bookings in one request (see booking/batch.py).
+
+    Body: {"items": [{room_ids, floor_id, start_datetime, end_datetime, booking_type}, ...],
+    "mode": "all_or_nothing" (default) | "best_effort"}. Each item follows the
+    create_booking/ rules. Returns 201 when anything was created, otherwise 409 if an item
+    conflicts with an existing booking and 400 for invalid items; `results` has one entry
+    per item, in order.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_throttle_cost(self, request):
+        items = request.data.get('items') if isinstance(request.data, dict) else None
+        if not isinstance(items, list):
+            return 1
+        return sum(booking_write_cost(item) for item in items if isinstance(item, dict))
+
+    def post(self, request):
+        try:
+            items = request.data.get('items')
+            mode = request.data.get('mode') or batch.MODE_ALL_OR_NOTHING
+            if not isinstance(items, list) or not items:
+                return Response(
+                    {"detail": "items must be a non-empty list of bookings."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if len(items) > settings.BOOKING_BATCH_MAX_ITEMS:
+                return Response(
+                    {"detail": f"At most {settings.BOOKING_BATCH_MAX_ITEMS} bookings can be created at once."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if mode not in batch.MODES:
+                return Response(
+                    {"detail": f"mode must be one of: {', '.join(batch.MODES)}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            batch_items = batch.create_batch(request.user, items, mode)
+            results = [item.result() for item in batch_items]
+            bookings = [item.booking for item in batch_items if item.booking is not None]
+            if bookings:
+                # Load rooms and floors once for both the response and the email
+                prefetch_related_objects(bookings, 'rooms__floor')
+                serialized = iter(BookingSerializer(bookings, many=True).data)
+                for result in results:
+                    if result['status'] == 'created':
+                        result['booking'] = next(serialized)
+                try:
+                    from .email_utils import send_batch_booking_creation_email
+                    send_batch_booking_creation_email(request.user, bookings)
+                except Exception as e:
+                    logger.error(f"Failed to send batch booking email: {str(e)}")
+                response_status = status.HTTP_201_CREATED
+            elif any(item.conflicts for item in batch_items):
+                response_status = status.HTTP_409_CONFLICT
+            else:
+                response_status = status.HTTP_400_BAD_REQUEST
+
+            return Response(
+                {
+                    "mode": mode,
+                    "created": len(bookings),
+                    "failed": sum(1 for result in results if result['status'] == 'failed'),
+                    "results": results,
+                },
+                status=response_status
+            )
+        except (ValueError, TypeError, AttributeError) as e:
+            return Response(
+                {"detail": f"Invalid input: {str(e)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Error creating batch bookings: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while creating the bookings. Please try again later."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class BookingSeriesListCreateView(IdempotentMixin, APIView):
+    """
+    GET: the user's recurring bookings (every series for admins).
+    POST: create a series (see booking/series.py). Every occurrence is checked for
+    conflicts up front; the ones within the horizon are created right away.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_throttle_cost(self, request):
+        return 10 if request.method == 'POST' else 2
+
+    def get(self, request):
+        try:
+            series = BookingSeries.objects.select_related('user').prefetch_related('rooms__floor')
+            if request.user.role != 'admin':
+                series = series.filter(user=request.user)
+            serializer = BookingSeriesSerializer(series, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error fetching booking series: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while fetching recurring bookings. Please try again later."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def post(self, request):
+        try:
+            serializer = BookingSeriesSerializer(data=request.data, context={'request': request})
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+            from django.db import transaction
+            with transaction.atomic(using=PRIMARY):
+                series = serializer.save()
+                room_ids = [room.id for room in serializer.validated_data['rooms']]
+                conflicts = series_conflicts(series, room_ids)
+                if conflicts:
+                    transaction.set_rollback(True, using=PRIMARY)
+                    return Response(
+                        {
+                            "detail": "Some occurrences conflict with existing bookings.",
+                            "conflicts": conflicts,
+                        },
+                        status=status.HTTP_409_CONFLICT
+                    )
+                materialize_series(series)
+
+            series.refresh_from_db(fields=['materialized_until'])
+            prefetch_related_objects([series], 'rooms__floor')
+            return Response(BookingSeriesSerializer(series).data, status=status.HTTP_201_CREATED)
+        except (ValueError, TypeError, AttributeError) as e:
+            return Response(
+                {"detail": f"Invalid input: {str(e)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Error creating booking series: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while creating the recurring booking. Please try again later."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class BookingSeriesDetailView(IdempotentMixin, APIView):
+    """GET a recurring booking; DELETE cancels it and its occurrences that haven't started"""
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_cost = 2
+
+    def get_object(self, series_id, user):
+        series = BookingSeries.objects.select_related('user').prefetch_related('rooms__floor').filter(id=series_id).first()
+        if series is None or (series.user != user and user.role != 'admin'):
+            return None
+        return series
+
+    def get(self, request, series_id):
+        try:
+            series = self.get_object(series_id, request.user)
+            if not series:
+                return Response(
+                    {"detail": "Recurring booking not found or you don't have permission to view it."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(BookingSeriesSerializer(series).data, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error fetching booking series: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while fetching the recurring booking."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def delete(self, request, series_id):
+        try:
+            series = self.get_object(series_id, request.user)
+            if not series:
+                return Response(
+                    {"detail": "Recurring booking not found or you don't have permission to cancel it."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if series.status == 'Cancelled':
+                return Response(
+                    {"detail": "Recurring booking is already cancelled."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            cancelled = cancel_series(series)
+            return Response(
+                {"detail": "Recurring booking cancelled successfully.", "cancelled_occurrences": cancelled},
+                status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            logger.error(f"Error cancelling booking series: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while cancelling the recurring booking."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class FloorListView(ReplicaReadMixin, APIView):
     permission_classes = [permissions.AllowAny]  # Anyone can view floors
 
     def get(self, request):
         try:
-            floors = Floor.objects.prefetch_related('rooms').all()
+            floors = Floor.objects.all()
             serializer = FloorSerializer(floors, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except (ValueError, TypeError) as e:
@@ -337,9 +461,68 @@ class FloorListView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class RoomListView(APIView):
+class FloorHeatmapView(ReplicaReadMixin, APIView):
+    """
+    How many rooms on a floor are free in each time bucket over a date range
+    (start_date, end_date: YYYY-MM-DD, default today; bucket: minutes, default 60).
+    See booking/heatmap.py.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_cost = 3
+
+    def get(self, request, floor_id):
+        try:
+            floor = Floor.objects.annotate(room_count=Count('rooms')).filter(id=floor_id).first()
+            if floor is None:
+                return Response({"detail": f"Floor with id {floor_id} does not exist."}, status=status.HTTP_404_NOT_FOUND)
+            try:
+                today = timezone.localdate()
+                first_day = parse_date(request.GET['start_date']) if request.GET.get('start_date') else today
+                last_day = parse_date(request.GET['end_date']) if request.GET.get('end_date') else first_day
+                bucket_minutes = int(request.GET.get('bucket') or heatmap.DEFAULT_BUCKET_MINUTES)
+            except ValueError:
+                return Response(
+                    {"detail": "Invalid parameters. Use start_date/end_date=YYYY-MM-DD and bucket=<minutes>"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                buckets = heatmap.floor_heatmap(floor.id, floor.room_count, first_day, last_day, bucket_minutes)
+            except heatmap.HeatmapParamError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(
+                {
+                    'floor_id': floor.id,
+                    'floor_name': floor.name,
+                    'total_rooms': floor.room_count,
+                    'start_date': first_day.isoformat(),
+                    'end_date': last_day.isoformat(),
+                    'bucket_minutes': bucket_minutes,
+                    'buckets': buckets,
+                },
+                status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            logger.error(f"Error building floor heatmap: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while building the floor heatmap. Please try again later."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+def wants_occupancy(params):
+    """Whether a rooms/ request asked for the occupancy annotations (?occupancy=true)"""
+    return params.get('occupancy', '').lower() in ('1', 'true', 'yes')
+
+
+class RoomListView(ReplicaReadMixin, APIView):
+    """
+    Rooms, optionally of one floor (?floor=<id>). With ?occupancy=true each room also has
+    occupied_now, next_booking_start and booked_minutes_today, from the same query.
+    """
     permission_classes = [permissions.AllowAny]  # Anyone can view rooms
 
+    def get_throttle_cost(self, request):
+        return 2 if wants_occupancy(request.GET) else 1
+
     def get(self, request):
         try:
             floor_id = request.GET.get('floor', None)
@@ -362,7 +545,10 @@ class RoomListView(APIView):
                 rooms = Room.objects.select_related('floor').filter(floor_id=floor_id)  # Filter rooms by floor
             else:
                 rooms = Room.objects.select_related('floor').all()  # Return all rooms if no floor ID is provided
-            serializer = RoomSerializer(rooms, many=True)
+            if wants_occupancy(request.GET):
+                serializer = RoomOccupancySerializer(rooms.with_occupancy(timezone.now()), many=True)
+            else:
+                serializer = RoomSerializer(rooms, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except (ValueError, TypeError) as e:
             return Response(
@@ -378,8 +564,14 @@ class RoomListView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-class BookingListCreateView(APIView):
+class BookingListCreateView(IdempotentMixin, ReplicaReadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+
+    def get_throttle_cost(self, request):
+        if request.method == 'POST':
+            return booking_write_cost(request.data)
+        # Admins get every booking in the system
+        return 10 if request.user.role == 'admin' else 2
     
     def get(self, request):
         try:
@@ -404,11 +596,15 @@ class BookingListCreateView(APIView):
     
     def post(self, request):
         try:
-            serializer = BookingSerializer(data=request.data, context={'request': request})
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # Validation locks the user's weekly usage counters until the booking is saved
+            from django.db import transaction
+            with transaction.atomic(using=PRIMARY):
+                serializer = BookingSerializer(data=request.data, context={'request': request})
+                if not serializer.is_valid():
+                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+                booking = serializer.save()
+            prefetch_related_objects([booking], 'rooms__floor')
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
         except (ValueError, TypeError, AttributeError) as e:
             return Response(
                 {"detail": f"Invalid input: {str(e)}"}, 
@@ -423,8 +619,9 @@ class BookingListCreateView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class MyBookingView(APIView):
+class MyBookingView(ReplicaReadMixin, APIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_cost = 2
     
     def get(self, request):
         try:
@@ -444,9 +641,97 @@ class MyBookingView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class BookingDetailView(APIView):
+class WaitlistListCreateView(IdempotentMixin, APIView):
+    """
+    GET: the user's waitlist entries (every entry for admins).
+    POST: wait for a booked room and time; a cancellation books it automatically
+    (see booking/waitlist.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            entries = WaitlistEntry.objects.select_related('user', 'room__floor')
+            if request.user.role != 'admin':
+                entries = entries.filter(user=request.user)
+            return Response(WaitlistEntrySerializer(entries, many=True).data, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error fetching waitlist entries: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while fetching your waitlist. Please try again later."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def post(self, request):
+        try:
+            serializer = WaitlistEntrySerializer(data=request.data, context={'request': request})
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            room = serializer.validated_data['room']
+            start_datetime = serializer.validated_data['start_datetime']
+            end_datetime = serializer.validated_data['end_datetime']
+
+            waiting = WaitlistEntry.objects.using(PRIMARY).filter(user=request.user, status='Waiting').aggregate(
+                same_slot=Count('id', filter=Q(room=room, start_datetime__lt=end_datetime, end_datetime__gt=start_datetime)),
+                upcoming=Count('id', filter=Q(start_datetime__gt=timezone.now())),
+            )
+            if waiting['same_slot']:
+                return Response(
+                    {"detail": "You are already on the waitlist for this room at that time."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            max_entries = settings.WAITLIST_MAX_ENTRIES_PER_USER
+            if waiting['upcoming'] >= max_entries:
+                return Response(
+                    {"detail": f"You can be on the waitlist for at most {max_entries} bookings at a time."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if not check_booking_conflicts([room.id], start_datetime, end_datetime):
+                return Response(
+                    {"detail": "This room is available at that time. Book it instead."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            entry = serializer.save()
+            return Response(WaitlistEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            logger.error(f"Error joining the waitlist: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while joining the waitlist. Please try again later."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class WaitlistEntryDetailView(IdempotentMixin, APIView):
+    """DELETE: leave the waitlist"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def delete(self, request, entry_id):
+        try:
+            entry = WaitlistEntry.objects.using(PRIMARY).filter(id=entry_id).first()
+            if entry is None or (entry.user_id != request.user.id and request.user.role != 'admin'):
+                return Response(
+                    {"detail": "Waitlist entry not found or you don't have permission to remove it."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if entry.status != 'Waiting':
+                return Response(
+                    {"detail": f"This waitlist entry is already {entry.status.lower()}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            entry.status = 'Cancelled'
+            entry.save(update_fields=['status'])
+            return Response({"detail": "Removed from the waitlist."}, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error leaving the waitlist: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while leaving the waitlist."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class BookingDetailView(IdempotentMixin, APIView):
     """View to retrieve, update, or delete a specific booking"""
     permission_classes = [permissions.IsAuthenticated]
+    throttle_cost = 2
     
     def get_object(self, booking_id, user):
         """Get booking object and verify ownership"""
@@ -494,43 +779,15 @@ class BookingDetailView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Parse datetime if provided
-            est = pytz.timezone('America/New_York')
+            # Parse datetimes if provided (EST/EDT wall time, with or without seconds)
             data = request.data.copy()
             
-            if 'start_datetime' in data and isinstance(data['start_datetime'], str):
-                try:
-                    # Try parsing with datetime-local format (YYYY-MM-DDTHH:MM)
-                    if 'T' in data['start_datetime'] and len(data['start_datetime']) == 16:
-                        start_dt_naive = datetime.strptime(data['start_datetime'], '%Y-%m-%dT%H:%M')
-                    else:
-                        start_dt_naive = datetime.strptime(data['start_datetime'], '%Y-%m-%dT%H:%M:%S')
-                    try:
-                        data['start_datetime'] = est.localize(start_dt_naive, is_dst=None)
-                    except (pytz.AmbiguousTimeError, pytz.NonExistentTimeError):
-                        try:
-                            data['start_datetime'] = est.localize(start_dt_naive, is_dst=True)
-                        except:
-                            data['start_datetime'] = est.localize(start_dt_naive, is_dst=False)
-                except ValueError:
-                    pass  # Keep original value if parsing fails
-            
-            if 'end_datetime' in data and isinstance(data['end_datetime'], str):
-                try:
-                    # Try parsing with datetime-local format (YYYY-MM-DDTHH:MM)
-                    if 'T' in data['end_datetime'] and len(data['end_datetime']) == 16:
-                        end_dt_naive = datetime.strptime(data['end_datetime'], '%Y-%m-%dT%H:%M')
-                    else:
-                        end_dt_naive = datetime.strptime(data['end_datetime'], '%Y-%m-%dT%H:%M:%S')
+            for field in ('start_datetime', 'end_datetime'):
+                if field in data and isinstance(data[field], str):
                     try:
-                        data['end_datetime'] = est.localize(end_dt_naive, is_dst=None)
-                    except (pytz.AmbiguousTimeError, pytz.NonExistentTimeError):
-                        try:
-                            data['end_datetime'] = est.localize(end_dt_naive, is_dst=True)
-                        except:
-                            data['end_datetime'] = est.localize(end_dt_naive, is_dst=False)
-                except ValueError:
-                    pass  # Keep original value if parsing fails
+                        data[field] = parse_local_datetime(data[field])
+                    except ValueError:
+                        pass  # Keep original value; the serializer reports it
             
             # Check for conflicts (excluding current booking)
             if 'room_ids' in data and 'start_datetime' in data and 'end_datetime' in data:
@@ -538,11 +795,6 @@ class BookingDetailView(APIView):
                 start_dt = data.get('start_datetime')
                 end_dt = data.get('end_datetime')
                 
-                if isinstance(start_dt, str):
-                    start_dt = datetime.fromisoformat(start_dt.replace('Z', '+00:00'))
-                if isinstance(end_dt, str):
-                    end_dt = datetime.fromisoformat(end_dt.replace('Z', '+00:00'))
-                
                 conflicts = check_booking_conflicts(room_ids, start_dt, end_dt, exclude_booking_id=booking_id)
                 if conflicts:
                     return Response(
@@ -557,19 +809,24 @@ class BookingDetailView(APIView):
                 'status': booking.status,
             }
             
-            serializer = BookingSerializer(booking, data=data, partial=True, context={'request': request})
-            if serializer.is_valid():
+            # Validation locks the owner's weekly usage counters until the booking is saved
+            from django.db import transaction
+            with transaction.atomic(using=PRIMARY):
+                serializer = BookingSerializer(booking, data=data, partial=True, context={'request': request})
+                if not serializer.is_valid():
+                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
                 updated_booking = serializer.save()
-                
-                # Send booking update email
-                try:
-                    from .email_utils import send_booking_update_email
-                    send_booking_update_email(updated_booking, updated_by_admin=False, old_data=old_data)
-                except Exception as e:
-                    logger.error(f"Failed to send booking update email: {str(e)}")
-                
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # Changing room_ids drops the prefetched rooms; reload them (with floors) in one go
+            prefetch_related_objects([updated_booking], 'rooms__floor')
+            
+            # Send booking update email
+            try:
+                from .email_utils import send_booking_update_email
+                send_booking_update_email(updated_booking, updated_by_admin=False, old_data=old_data)
+            except Exception as e:
+                logger.error(f"Failed to send booking update email: {str(e)}")
+            
+            return Response(serializer.data, status=status.HTTP_200_OK)
             
         except (ValueError, TypeError, AttributeError) as e:
             return Response(
@@ -593,9 +850,19 @@ class BookingDetailView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
             
+            # Cancelling twice is a no-op: no save, no second promotion or email
+            if booking.status == 'Cancelled':
+                return Response(
+                    {"detail": "Booking is already cancelled."}, 
+                    status=status.HTTP_200_OK
+                )
+            
             # Instead of deleting, mark as cancelled
             booking.status = 'Cancelled'
             booking.save()
+
+            # Book the freed time for whoever is waiting for it
+            on_booking_cancelled(booking)
             
             # Send booking cancellation email
             try:
@@ -765,152 +1032,168 @@ class UserDetailView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class CheckAvailabilityView(APIView):
+class AvailabilityParamError(ValueError):
+    """Invalid check_availability query parameters; the message is safe to return to the client"""
+
+
+def parse_availability_params(params):
+    """
+    Parse the check_availability query string (date=YYYY-MM-DD, room_ids=1,2,3).
+    Returns (date_str, check_date, room_ids) or raises AvailabilityParamError.
+    """
+    date_str = params.get('date')  # Format: YYYY-MM-DD
+    room_ids = params.get('room_ids', '').split(',')  # Comma-separated room IDs
+
+    if not date_str:
+        raise AvailabilityParamError("Date parameter is required (format: YYYY-MM-DD)")
+
+    if not room_ids or room_ids == ['']:
+        raise AvailabilityParamError("room_ids parameter is required (comma-separated)")
+
+    # Parse date
+    try:
+        check_date = parse_date(date_str)
+    except ValueError:
+        raise AvailabilityParamError("Invalid date format. Use YYYY-MM-DD")
+
+    # Convert room_ids to integers
+    try:
+        room_ids = [int(rid) for rid in room_ids if rid.strip()]
+    except ValueError:
+        raise AvailabilityParamError("Invalid room_ids format")
+
+    return date_str, check_date, room_ids
+
+
+def availability_queryset(check_date, room_ids):
+    """Active bookings touching any of the rooms on check_date (EST), with rooms prefetched"""
+    start_of_day, end_of_day = local_day_bounds(check_date)
+
+    # Prefetch rooms to avoid N+1 queries
+    return Booking.objects.active().filter(
+        rooms__id__in=room_ids,
+    ).overlapping(start_of_day, end_of_day).distinct().prefetch_related('rooms')
+
+
+def availability_key(date_str, room_ids):
+    """Coalescing key (booking/coalescing.py) for one check_availability query"""
+    return f"availability:{date_str}:{','.join(str(room_id) for room_id in room_ids)}"
+
+
+def compute_availability(date_str, check_date, room_ids, bookings):
+    """
+    Build the check_availability response body from the bookings returned by
+    availability_queryset. Pure Python, so the sync and async views can share it.
+    """
+    # Generate all possible hour slots (e.g., 8 AM to 11 PM)
+    all_hours = list(range(8, 24))  # 8 AM to 11 PM (midnight is 24)
+    unavailable_slots = []
+    bookings_list = []
+
+    # Collect all bookings with their room information
+    for booking in bookings:
+        if booking.start_datetime and booking.end_datetime:
+            # Convert to EST
+            start_est = to_local(booking.start_datetime)
+            end_est = to_local(booking.end_datetime)
+            
+            # Include booking if it overlaps with the check_date
+            # This handles bookings that start before, end after, or span the check_date
+            if start_est.date() <= check_date <= end_est.date():
+                # Use prefetched rooms instead of querying
+                for room in booking.rooms.all():
+                    if room.id in room_ids:
+                        bookings_list.append({
+                            'room_id': room.id,
+                            'room_name': room.name,
+                            'start_datetime': booking.start_datetime,
+                            'end_datetime': booking.end_datetime,
+                            'start_est': start_est,
+                            'end_est': end_est,
+                        })
+    
+    # Remove duplicates and create separate lists for calculation and response
+    seen_bookings = set()
+    booking_slots_for_calculation = []  # Keep datetime objects for hour checking
+    for booking_info in bookings_list:
+        # Create a unique key for each booking
+        key = (booking_info['room_id'], booking_info['start_datetime'], booking_info['end_datetime'])
+        if key not in seen_bookings:
+            seen_bookings.add(key)
+            # Store for hour calculation (with datetime objects)
+            booking_slots_for_calculation.append({
+                'room_id': booking_info['room_id'],
+                'start_est': booking_info['start_est'],
+                'end_est': booking_info['end_est'],
+            })
+            # Store for response (without datetime objects, only strings)
+            unavailable_slots.append({
+                'room_id': booking_info['room_id'],
+                'room_name': booking_info['room_name'],
+                'start_time': booking_info['start_est'].strftime('%I:%M %p'),
+                'end_time': booking_info['end_est'].strftime('%I:%M %p'),
+                'start_datetime': booking_info['start_est'].isoformat(),
+                'end_datetime': booking_info['end_est'].isoformat(),
+                'start_hour': booking_info['start_est'].hour,
+                'end_hour': booking_info['end_est'].hour,
+            })
+    
+    # Generate available hours (hours that are not in unavailable_slots for all rooms)
+    available_hours = []
+    for hour, hour_datetime, hour_end_datetime in local_hour_slots(check_date, all_hours):
+        # Check if this hour is available for all requested rooms
+        unavailable_for_rooms = set()
+        
+        for slot in booking_slots_for_calculation:
+            slot_start_est = slot['start_est']
+            slot_end_est = slot['end_est']
+            slot_room_id = slot['room_id']
+            
+            # Check if this hour overlaps with the booking
+            # A booking blocks an hour if the booking overlaps with that hour slot
+            # This properly handles camp bookings that span multiple days
+            if slot_start_est < hour_end_datetime and slot_end_est > hour_datetime:
+                unavailable_for_rooms.add(slot_room_id)
+        
+        # An hour is available if at least one requested room is not unavailable
+        if len(unavailable_for_rooms) < len(room_ids):
+            available_hours.append(hour)
+
+    return {
+        'date': date_str,
+        'room_ids': room_ids,
+        'available_hours': available_hours,
+        'unavailable_slots': unavailable_slots,
+        'all_hours': all_hours
+    }
+
+
+class CheckAvailabilityView(ReplicaReadMixin, APIView):
     """
     Check availability of rooms for a specific date.
     Returns available time slots for the given rooms on the specified date.
     """
     permission_classes = [permissions.IsAuthenticated]
+
+    def get_throttle_cost(self, request):
+        return availability_cost(request.GET)
     
     def get(self, request):
         try:
-            date_str = request.GET.get('date')  # Format: YYYY-MM-DD
-            room_ids = request.GET.get('room_ids', '').split(',')  # Comma-separated room IDs
-            
-            if not date_str:
-                return Response(
-                    {"detail": "Date parameter is required (format: YYYY-MM-DD)"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            if not room_ids or room_ids == ['']:
-                return Response(
-                    {"detail": "room_ids parameter is required (comma-separated)"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Parse date
             try:
-                check_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            except ValueError:
-                return Response(
-                    {"detail": "Invalid date format. Use YYYY-MM-DD"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Convert room_ids to integers
-            try:
-                room_ids = [int(rid) for rid in room_ids if rid.strip()]
-            except ValueError:
-                return Response(
-                    {"detail": "Invalid room_ids format"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Get all bookings for these rooms on this date
-            # Use EST timezone for consistency
-            est = pytz.timezone('America/New_York')
-            start_of_day = est.localize(datetime.combine(check_date, datetime.min.time()))
-            end_of_day = est.localize(datetime.combine(check_date, datetime.max.time()))
-            
-            bookings = Booking.objects.filter(
-                rooms__id__in=room_ids,
-                status__in=['Pending', 'Approved'],
-                start_datetime__lt=end_of_day,
-                end_datetime__gt=start_of_day
-            ).distinct()
-            
-            # Convert to EST timezone
-            est = pytz.timezone('America/New_York')
-            
-            # Generate all possible hour slots (e.g., 8 AM to 11 PM)
-            all_hours = list(range(8, 24))  # 8 AM to 11 PM (midnight is 24)
-            unavailable_slots = []
-            bookings_list = []
-            
-            # Prefetch rooms to avoid N+1 queries
-            bookings = bookings.prefetch_related('rooms')
+                date_str, check_date, room_ids = parse_availability_params(request.GET)
+            except AvailabilityParamError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Collect all bookings with their room information
-            for booking in bookings:
-                if booking.start_datetime and booking.end_datetime:
-                    # Convert to EST
-                    start_est = booking.start_datetime.astimezone(est)
-                    end_est = booking.end_datetime.astimezone(est)
-                    
-                    # Include booking if it overlaps with the check_date
-                    # This handles bookings that start before, end after, or span the check_date
-                    if start_est.date() <= check_date <= end_est.date():
-                        # Use prefetched rooms instead of querying
-                        for room in booking.rooms.all():
-                            if room.id in room_ids:
-                                bookings_list.append({
-                                    'room_id': room.id,
-                                    'room_name': room.name,
-                                    'start_datetime': booking.start_datetime,
-                                    'end_datetime': booking.end_datetime,
-                                    'start_est': start_est,
-                                    'end_est': end_est,
-                                })
-            
-            # Remove duplicates and create separate lists for calculation and response
-            seen_bookings = set()
-            booking_slots_for_calculation = []  # Keep datetime objects for hour checking
-            for booking_info in bookings_list:
-                # Create a unique key for each booking
-                key = (booking_info['room_id'], booking_info['start_datetime'], booking_info['end_datetime'])
-                if key not in seen_bookings:
-                    seen_bookings.add(key)
-                    # Store for hour calculation (with datetime objects)
-                    booking_slots_for_calculation.append({
-                        'room_id': booking_info['room_id'],
-                        'start_est': booking_info['start_est'],
-                        'end_est': booking_info['end_est'],
-                    })
-                    # Store for response (without datetime objects, only strings)
-                    unavailable_slots.append({
-                        'room_id': booking_info['room_id'],
-                        'room_name': booking_info['room_name'],
-                        'start_time': booking_info['start_est'].strftime('%I:%M %p'),
-                        'end_time': booking_info['end_est'].strftime('%I:%M %p'),
-                        'start_datetime': booking_info['start_est'].isoformat(),
-                        'end_datetime': booking_info['end_est'].isoformat(),
-                        'start_hour': booking_info['start_est'].hour,
-                        'end_hour': booking_info['end_est'].hour,
-                    })
-            
-            # Generate available hours (hours that are not in unavailable_slots for all rooms)
-            available_hours = []
-            for hour in all_hours:
-                # Check if this hour is available for all requested rooms
-                unavailable_for_rooms = set()
-                
-                for slot in booking_slots_for_calculation:
-                    slot_start_est = slot['start_est']
-                    slot_end_est = slot['end_est']
-                    slot_room_id = slot['room_id']
-                    
-                    # Create datetime for this hour on the check_date
-                    hour_datetime = est.localize(datetime.combine(check_date, datetime.min.time().replace(hour=hour)))
-                    hour_end_datetime = hour_datetime + timedelta(hours=1)
-                    
-                    # Check if this hour overlaps with the booking
-                    # A booking blocks an hour if the booking overlaps with that hour slot
-                    # This properly handles camp bookings that span multiple days
-                    if slot_start_est < hour_end_datetime and slot_end_est > hour_datetime:
-                        unavailable_for_rooms.add(slot_room_id)
-                
-                # An hour is available if at least one requested room is not unavailable
-                if len(unavailable_for_rooms) < len(room_ids):
-                    available_hours.append(hour)
-            
-            return Response({
-                'date': date_str,
-                'room_ids': room_ids,
-                'available_hours': available_hours,
-                'unavailable_slots': unavailable_slots,
-                'all_hours': all_hours
-            }, status=status.HTTP_200_OK)
+            def compute():
+                # Get all bookings for these rooms on this date
+                bookings = availability_queryset(check_date, room_ids)
+                return compute_availability(date_str, check_date, room_ids, bookings)
+
+            # Users who just wrote get a fresh computation; everyone else shares one
+            # with identical concurrent requests
+            data = compute() if self.pinned_to_primary else coalesce(availability_key(date_str, room_ids), compute)
+            return Response(data, status=status.HTTP_200_OK)
             
         except (ValueError, TypeError, AttributeError) as e:
             return Response(
@@ -926,6 +1209,53 @@ class CheckAvailabilityView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class QueuedBookingDetailView(APIView):
+    """
+    Status of a create_booking/ request queued during an admission window
+    (booking/admission.py). Read from the primary: clients poll it for a change.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, request_id):
+        try:
+            queued = QueuedBooking.objects.filter(id=request_id).first()
+            if queued is None or (queued.user_id != request.user.id and request.user.role != 'admin'):
+                return Response(
+                    {"detail": "Queued booking request not found or you don't have permission to view it."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(admission.queued_booking_data(queued), status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error fetching queued booking request: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while fetching the booking request."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class FindSlotsView(ReplicaReadMixin, APIView):
+    """
+    Next free times for a set of rooms (or a floor), and other rooms on the same floor free
+    at a wanted time. See booking/slot_finder.py for the parameters.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_throttle_cost(self, request):
+        return availability_cost(request.GET)
+
+    def get(self, request):
+        try:
+            try:
+                options = slot_finder.parse_slot_params(request.GET, timezone.now())
+                return Response(slot_finder.find_slots(**options), status=status.HTTP_200_OK)
+            except slot_finder.SlotFinderParamError as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error finding free slots: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while finding free times. Please try again later."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class PendingUsersView(APIView):
     """View to list all pending users - Admin only"""
     permission_classes = [permissions.IsAuthenticated]
@@ -1014,7 +1344,7 @@ class ApproveUserView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class UpdateBookingStatusView(APIView):
+class UpdateBookingStatusView(IdempotentMixin, APIView):
     """View to update booking status - Admin only"""
     permission_classes = [permissions.IsAuthenticated]
     
@@ -1027,7 +1357,10 @@ class UpdateBookingStatusView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            booking = get_object_or_404(Booking, id=booking_id)
+            booking = get_object_or_404(
+                Booking.objects.select_related('user').prefetch_related('rooms__floor'),
+                id=booking_id
+            )
             new_status = request.data.get('status')
             
             # Validate status
@@ -1044,6 +1377,10 @@ class UpdateBookingStatusView(APIView):
             # Update status
             booking.status = new_status
             booking.save()
+
+            # Book the freed time for whoever is waiting for it
+            if new_status == 'Cancelled' and old_status != 'Cancelled':
+                on_booking_cancelled(booking)
             
             # Send email notification based on status change
             try:
@@ -1073,7 +1410,7 @@ class UpdateBookingStatusView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class DeleteAllBookingsView(APIView):
+class DeleteAllBookingsView(IdempotentMixin, APIView):
     """View to delete all bookings - Admin only"""
     permission_classes = [permissions.IsAuthenticated]
     
@@ -1101,4 +1438,127 @@ class DeleteAllBookingsView(APIView):
             return Response(
                 {"detail": "An error occurred while deleting all bookings."}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+class MetricsView(APIView):
+    """Per-view latency, database and email metrics in Prometheus text format - Admin only"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            if request.user.role != 'admin':
+                return Response(
+                    {"detail": "You do not have permission to view metrics."}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+            from .metrics import render_prometheus
+            return HttpResponse(
+                render_prometheus(),
+                content_type='text/plain; version=0.0.4; charset=utf-8'
+            )
+        except Exception as e:
+            logger.error(f"Error rendering metrics: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while collecting metrics."}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class DatabasePoolView(APIView):
+    """
+    Connection settings and pool statistics for each configured database - Admin only.
+    Pools are per worker process, so the numbers are for the worker that answered.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            if request.user.role != 'admin':
+                return Response(
+                    {"detail": "You do not have permission to view database pool statistics."}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+            databases = {}
+            for alias in connections:
+                connection = connections[alias]
+                # Only the PostgreSQL backend has a pool (None when pooling is off)
+                pool = getattr(connection, 'pool', None)
+                databases[alias] = {
+                    'vendor': connection.vendor,
+                    'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+                    'conn_health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+                    'pooled': pool is not None,
+                    'pool': pool.get_stats() if pool is not None else None,
+                }
+            return Response({'pid': os.getpid(), 'databases': databases}, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error reading database pool statistics: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while reading database pool statistics."}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class ProfileListView(APIView):
+    """List stored request profiles - Admin only"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            if request.user.role != 'admin':
+                return Response(
+                    {"detail": "You do not have permission to view profiles."}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+            from .profiling import list_profiles
+            return Response(
+                {"enabled": settings.PROFILING_ENABLED, "profiles": list_profiles()},
+                status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            logger.error(f"Error listing profiles: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while listing profiles."}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class ProfileDownloadView(APIView):
+    """
+    Download a stored request profile - Admin only
+    Returns the pstats dump by default, or the captured SQL with ?type=sql
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, profile_id):
+        try:
+            if request.user.role != 'admin':
+                return Response(
+                    {"detail": "You do not have permission to download profiles."}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+            from .profiling import get_profile_path
+            extension = 'json' if request.GET.get('type') == 'sql' else 'prof'
+            path = get_profile_path(profile_id, extension)
+            if not path or not os.path.exists(path):
+                return Response(
+                    {"detail": "Profile not found."}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            return FileResponse(
+                open(path, 'rb'),
+                as_attachment=True,
+                filename=os.path.basename(path),
+                content_type='application/json' if extension == 'json' else 'application/octet-stream'
+            )
+        except Exception as e:
+            logger.error(f"Error downloading profile: {str(e)}", exc_info=True)
+            return Response(
+                {"detail": "An error occurred while downloading the profile."}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
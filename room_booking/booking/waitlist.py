@@ -0,0 +1,117 @@
+"""
+Waitlist
+
+Users who found a room taken used to keep polling check_availability/ in case the booking
+was cancelled. Instead they can join the waitlist for that room and time (waitlist/), and
+when a booking is cancelled (BookingDetailView.delete or an admin setting it to Cancelled)
+on_booking_cancelled() hands the freed time to the waiting entries:
+
+- one query finds the waiting entries on the freed rooms that overlap the cancelled
+  booking and haven't started, oldest first,
+- one query (series.find_conflicts) checks all of them against the remaining bookings
+  and series, since an entry can span more than the freed time,
+- in order, each entry still free, not overlapping an earlier promoted one and within
+  its user's weekly quota is booked, with one bulk insert, and its user gets an email.
+  Entries over the quota keep waiting.
+
+Entries are booked directly rather than offered: joining the waitlist is the user's
+request to book, and they can cancel the booking like any other.
+"""
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from .db_router import PRIMARY
+from .models import Booking, WaitlistEntry
+from .quotas import QuotaExceeded, WeeklyUsageTracker, user_roles
+from .serializers import initial_booking_status
+from .series import find_conflicts
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def promote_waitlist(room_ids, start, end):
+    """
+    Book the freed rooms between start and end for the first eligible waitlist entries.
+    Returns the bookings created.
+    """
+    now = timezone.now()
+    with transaction.atomic(using=PRIMARY):
+        entries = list(
+            WaitlistEntry.objects.using(PRIMARY).select_for_update()
+            .filter(
+                room_id__in=room_ids, status='Waiting',
+                start_datetime__lt=end, end_datetime__gt=start, start_datetime__gt=now,
+            )
+            .order_by('created_at', 'id')
+        )
+        if not entries:
+            return []
+
+        requests = [({entry.room_id}, entry.start_datetime, entry.end_datetime) for entry in entries]
+        tracker = WeeklyUsageTracker(
+            user_roles(entry.user_id for entry in entries),
+            [(entry.user_id, entry.booking_type, entry.start_datetime) for entry in entries],
+        )
+        promoted = []
+        statuses = []
+        taken = {}  # room id -> [(start, end)] promoted in this pass
+        for entry, conflicts in zip(entries, find_conflicts(requests)):
+            if conflicts or any(
+                taken_start < entry.end_datetime and taken_end > entry.start_datetime
+                for taken_start, taken_end in taken.get(entry.room_id, ())
+            ):
+                continue
+            try:
+                statuses.append(tracker.admit(
+                    entry.user_id, entry.booking_type, entry.start_datetime, entry.end_datetime,
+                    initial_booking_status(entry.booking_type, entry.start_datetime, entry.end_datetime, 1),
+                ))
+            except QuotaExceeded:
+                continue
+            taken.setdefault(entry.room_id, []).append((entry.start_datetime, entry.end_datetime))
+            promoted.append(entry)
+        if not promoted:
+            return []
+
+        bookings = Booking.objects.using(PRIMARY).bulk_create_with_rooms(
+            [
+                Booking(
+                    user_id=entry.user_id,
+                    start_datetime=entry.start_datetime,
+                    end_datetime=entry.end_datetime,
+                    booking_type=entry.booking_type,
+                    status=entry_status,
+                )
+                for entry, entry_status in zip(promoted, statuses)
+            ],
+            [{entry.room_id} for entry in promoted],
+        )
+        for entry, booking in zip(promoted, bookings):
+            entry.status = 'Booked'
+            entry.booking = booking
+            entry.fulfilled_at = now
+        WaitlistEntry.objects.using(PRIMARY).bulk_update(promoted, ['status', 'booking', 'fulfilled_at'])
+
+    # Load users, rooms and floors once for all the emails
+    prefetch_related_objects(bookings, 'user', 'rooms__floor')
+    from .email_utils import send_waitlist_booking_email
+    for booking in bookings:
+        send_waitlist_booking_email(booking)
+    return bookings
+
+
+def on_booking_cancelled(booking):
+    """
+    promote_waitlist for a booking that was just cancelled. Failures are logged rather than
+    raised: the cancellation itself has already succeeded.
+    """
+    try:
+        room_ids = {room.id for room in booking.rooms.all()}
+        bookings = promote_waitlist(room_ids, booking.start_datetime, booking.end_datetime)
+        if bookings:
+            logger.info(f"Booking {booking.id} cancelled: booked {len(bookings)} waitlist entries")
+        return bookings
+    except Exception as e:
+        logger.error(f"Failed to promote the waitlist for cancelled booking {booking.id}: {str(e)}", exc_info=True)
+        return []
@@ -3,6 +3,16 @@ ASGI config for room_booking project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The async views in booking/async_views.py (/api/async/...) only help under an ASGI
+server, e.g.:
+
+    uvicorn room_booking.asgi:application --host 0.0.0.0 --port $PORT --workers 2
+
+Set DB_CONN_MAX_AGE=0 (or DB_POOL_ENABLED=True) when serving over ASGI: each request
+runs in its own thread context there, so persistent connections would pile up instead
+of being reused.
+Compare with the sync stack using `python manage.py load_test --mode async`.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
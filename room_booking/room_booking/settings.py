@@ -12,8 +12,11 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+import tempfile
 from dotenv import load_dotenv
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -71,9 +74,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'booking.middleware.PerformanceMetricsMiddleware',  # First, so it times the whole stack
+    'booking.middleware.ProfilingMiddleware',
+    'booking.middleware.TrafficCaptureMiddleware',
+    'booking.middleware.ReplicaStickinessMiddleware',
+    'booking.middleware.ApiCompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add whitenoise for static files
+    'booking.middleware.AsyncWhiteNoiseMiddleware',  # Whitenoise for static files (also async-capable)
+    'booking.middleware.ReactShellMiddleware',  # In-memory index.html for React routes (production)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -125,7 +134,8 @@ DB_ENGINE = os.getenv('DB_ENGINE', 'postgresql').lower()
 
 if DATABASE_URL:
     DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        # Use DB_CONN_MAX_AGE=0 under ASGI (see asgi.py)
+        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', '600')))
     }
 else:
     # Local fallback (if no DATABASE_URL is set)
@@ -140,6 +150,124 @@ else:
         }
     }
 
+# Drop dead persistent connections before use instead of failing the next request
+# (with a pool, this makes the pool check each connection before handing it out)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Connection pooling (PostgreSQL only), using Django's psycopg pool support. Each worker
+# process keeps one pool shared by its threads/async requests; connections are checked
+# before being handed out and recycled after DB_POOL_MAX_LIFETIME seconds.
+# Stats are available to admins at /api/admin/db-pool/.
+DB_POOL_ENABLED = os.getenv('DB_POOL_ENABLED', 'False').lower() == 'true'
+if DB_POOL_ENABLED and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # Django requires this with a pool
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),  # Seconds to wait for a free connection
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+    }
+
+# Optional read replica. GET requests to the availability, floor, room and booking list
+# endpoints read from it; everything else (including the booking conflict check) uses
+# the primary. A user who just wrote is kept on the primary for REPLICA_STICKY_SECONDS.
+REPLICA_DATABASE_URL = os.getenv('REPLICA_DATABASE_URL')
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '15'))
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        REPLICA_DATABASE_URL, conn_max_age=DATABASES['default'].get('CONN_MAX_AGE', 0)
+    )
+    DATABASES['replica']['CONN_HEALTH_CHECKS'] = True
+    if 'pool' in DATABASES['default'].get('OPTIONS', {}):
+        DATABASES['replica'].setdefault('OPTIONS', {})['pool'] = dict(DATABASES['default']['OPTIONS']['pool'])
+    # Tests run against the primary only
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['booking.db_router.PrimaryReplicaRouter']
+elif len(sys.argv) > 1 and sys.argv[1] == 'test':
+    # `manage.py test` always gets a replica alias mirroring the primary, so the routing
+    # tests run without a real replica; they install the router themselves
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+# Booking table partitioning (PostgreSQL only)
+# When enabled, `python manage.py manage_booking_partitions --convert` turns booking_booking
+# into a table partitioned by month of start_datetime; run the command periodically
+# (e.g. daily via cron) to create future partitions and detach/archive old ones.
+BOOKING_PARTITIONING = os.getenv('BOOKING_PARTITIONING', 'False').lower() == 'true'
+BOOKING_PARTITION_MONTHS_AHEAD = int(os.getenv('BOOKING_PARTITION_MONTHS_AHEAD', '3'))
+BOOKING_PARTITION_RETENTION_MONTHS = int(os.getenv('BOOKING_PARTITION_RETENTION_MONTHS', '24'))
+BOOKING_PARTITION_ARCHIVE_SCHEMA = os.getenv('BOOKING_PARTITION_ARCHIVE_SCHEMA', 'booking_archive')
+
+# Longest allowed booking (camps included). Overlap queries use it as a lower bound on
+# start_datetime so old partitions are pruned. Defaults to 62 days when partitioning is on.
+BOOKING_MAX_SPAN_DAYS = int(os.getenv('BOOKING_MAX_SPAN_DAYS') or ('62' if BOOKING_PARTITIONING else '0')) or None
+
+# Most bookings accepted by one bookings/batch/ request
+BOOKING_BATCH_MAX_ITEMS = int(os.getenv('BOOKING_BATCH_MAX_ITEMS', '100'))
+
+# Recurring bookings: occurrences become Booking rows this many days ahead
+# (`python manage.py materialize_booking_series`, daily); longest series allowed
+BOOKING_SERIES_HORIZON_DAYS = int(os.getenv('BOOKING_SERIES_HORIZON_DAYS', '28'))
+BOOKING_SERIES_MAX_OCCURRENCES = int(os.getenv('BOOKING_SERIES_MAX_OCCURRENCES', '104'))
+
+# How long a response stored for an Idempotency-Key is replayed to retries
+# (`python manage.py purge_idempotency_keys` deletes expired ones)
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+# Admission queue (booking/admission.py): requests process_booking_queue books per batch,
+# and how long it sleeps when the queue is empty
+ADMISSION_QUEUE_BATCH_SIZE = int(os.getenv('ADMISSION_QUEUE_BATCH_SIZE', '200'))
+ADMISSION_QUEUE_POLL_SECONDS = float(os.getenv('ADMISSION_QUEUE_POLL_SECONDS', '1'))
+
+# Upcoming waitlist entries a user may hold at once (booking/waitlist.py)
+WAITLIST_MAX_ENTRIES_PER_USER = int(os.getenv('WAITLIST_MAX_ENTRIES_PER_USER', '10'))
+
+# Weekly quotas on regular bookings (booking/quotas.py), in hours per user per week:
+# past the first, new bookings wait for admin approval; past the second they are
+# refused. 0 turns either off.
+BOOKING_AUTO_APPROVE_WEEKLY_HOURS = float(os.getenv('BOOKING_AUTO_APPROVE_WEEKLY_HOURS', '10'))
+BOOKING_WEEKLY_HOURS_LIMIT = float(os.getenv('BOOKING_WEEKLY_HOURS_LIMIT', '20'))
+
+# Cache shared by every worker: DRF throttle counters, replica read pins, app caches and
+# the cross-worker locks of coalescing (see booking/cache_utils.py). REDIS_URL wins when
+# set; otherwise CACHE_BACKEND picks 'database' (default in production; run
+# `python manage.py createcachetable`), 'file' (plain caching only: its add() isn't
+# atomic and culling can evict live keys, so locks and throttle state aren't reliable)
+# or 'locmem' (per process; the default with DEBUG).
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem' if DEBUG else 'database').lower()
+CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'grfs')
+if REDIS_URL:
+    default_cache = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+elif CACHE_BACKEND in ('file', 'database', 'locmem'):
+    default_cache = {
+        'BACKEND': {
+            'file': 'django.core.cache.backends.filebased.FileBasedCache',
+            'database': 'django.core.cache.backends.db.DatabaseCache',
+            'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+        }[CACHE_BACKEND],
+        'LOCATION': {
+            'file': os.getenv('CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'grfs-cache'),
+            'database': 'booking_cache',
+            'locmem': 'grfs-cache',
+        }[CACHE_BACKEND],
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000'))},
+    }
+else:
+    raise ValueError(f"CACHE_BACKEND must be 'file', 'database' or 'locmem', not {CACHE_BACKEND!r}")
+CACHES = {
+    'default': dict(default_cache, KEY_PREFIX=CACHE_KEY_PREFIX),
+}
+
+# Identical concurrent check_availability/ requests share one computation (booking/coalescing.py).
+# Across workers the result is published in the cache for COALESCE_SECONDS (0 turns that off);
+# waiters give up on the computing worker after COALESCE_LOCK_SECONDS
+COALESCE_SECONDS = float(os.getenv('COALESCE_SECONDS', '1'))
+COALESCE_LOCK_SECONDS = int(os.getenv('COALESCE_LOCK_SECONDS', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -183,6 +311,10 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # WhiteNoise configuration for serving static files
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# The React shell (booking/templates/index.html) is served from memory; how often, in
+# seconds, to check the file for a new frontend build
+REACT_SHELL_CHECK_INTERVAL = float(os.getenv('REACT_SHELL_CHECK_INTERVAL', '5'))
+
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -200,15 +332,33 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed when orjson is installed, DRF's stock JSON otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'booking.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'booking.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'rest_framework.throttling.UserRateThrottle',
+        'booking.throttling.CostWeightedThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        # Cost units per role (see booking/throttling.py); check_availability costs 2+,
+        # the admin bookings list 10, creating a booking 3+
+        'cost_anon': os.getenv('THROTTLE_COST_ANON', '200/hour'),
+        'cost_user': os.getenv('THROTTLE_COST_USER', '3000/hour'),
+        'cost_mentor': os.getenv('THROTTLE_COST_MENTOR', '3000/hour'),
+        'cost_coordinator': os.getenv('THROTTLE_COST_COORDINATOR', '5000/hour'),
+        'cost_admin': os.getenv('THROTTLE_COST_ADMIN', '10000/hour'),
     }
 }
 
@@ -221,6 +371,10 @@ CORS_ALLOWED_ORIGINS = os.getenv(
 # Allow credentials for CORS
 CORS_ALLOW_CREDENTIALS = True
 
+# Idempotency-Key lets clients retry writes safely (see booking/idempotency.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
+
 # Additional CORS settings for production
 if not DEBUG:
     CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if os.getenv('CORS_ALLOWED_ORIGINS') else []
@@ -258,6 +412,43 @@ else:
 
 SERVER_EMAIL = DEFAULT_FROM_EMAIL
 
+# Performance metrics (exposed in Prometheus format at /api/metrics, admins only)
+# Each worker writes its numbers to METRICS_DIR so the endpoint can merge all workers.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', '')  # Defaults to <tmp>/grfs-metrics
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+# Snapshots not written for this many seconds are dropped as exited workers' (0 = only by pid)
+METRICS_SNAPSHOT_TTL = float(os.getenv('METRICS_SNAPSHOT_TTL', '86400'))
+
+# On-demand profiling: admins add `X-Profile: 1` (or ?_profile) to a request to run it
+# under cProfile. Profiles are stored in PROFILING_DIR and listed at /api/admin/profiles/.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+PROFILING_DIR = os.getenv('PROFILING_DIR', '')  # Defaults to <tmp>/grfs-profiles
+PROFILING_QUERY_PARAM = os.getenv('PROFILING_QUERY_PARAM', '_profile')
+PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', '50'))
+
+# Slow query capture: statements slower than the threshold are logged as JSON lines
+# (`python manage.py slow_queries` summarizes them). 0 disables capture. On PostgreSQL a
+# sample of slow SELECTs is re-run under EXPLAIN (ANALYZE, BUFFERS) in the background.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '500'))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', '0'))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', '')  # Defaults to <tmp>/grfs-slow-queries.jsonl
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+
+# Traffic capture: anonymized traces of /api/ requests written as JSON lines, for
+# `python manage.py replay_traffic`. Off by default.
+TRAFFIC_CAPTURE_ENABLED = os.getenv('TRAFFIC_CAPTURE_ENABLED', 'False').lower() == 'true'
+TRAFFIC_CAPTURE_LOG = os.getenv('TRAFFIC_CAPTURE_LOG', '')  # Defaults to <tmp>/grfs-traffic.jsonl
+TRAFFIC_CAPTURE_LOG_MAX_BYTES = int(os.getenv('TRAFFIC_CAPTURE_LOG_MAX_BYTES', str(50 * 1024 * 1024)))
+TRAFFIC_CAPTURE_BACKUP_COUNT = int(os.getenv('TRAFFIC_CAPTURE_BACKUP_COUNT', '5'))
+
+# Compression of /api/ responses (brotli when the brotli package is installed, else gzip).
+# Levels are tuned for per-request speed rather than the smallest output.
+API_COMPRESSION_ENABLED = os.getenv('API_COMPRESSION_ENABLED', 'True').lower() == 'true'
+API_COMPRESSION_MIN_BYTES = int(os.getenv('API_COMPRESSION_MIN_BYTES', '1024'))
+API_COMPRESSION_GZIP_LEVEL = int(os.getenv('API_COMPRESSION_GZIP_LEVEL', '6'))
+API_COMPRESSION_BROTLI_QUALITY = int(os.getenv('API_COMPRESSION_BROTLI_QUALITY', '4'))
+
 # Site URL for email links (used in email templates)
 # Fallback logic: use SITE_URL env var, or construct from ALLOWED_HOSTS, or use localhost
 if os.getenv('SITE_URL'):
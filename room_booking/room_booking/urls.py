@@ -19,6 +19,7 @@ from django.urls import path, include, re_path
 from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
+from booking.react_shell import REACT_ROUTE_PATTERN
 from booking.views import serve_react_app
 
 urlpatterns = [
@@ -33,7 +34,7 @@ if not settings.DEBUG:
         path('', serve_react_app, name='react-app'),
         # Exclude api/, admin/, static/, media/, and common static files from catch-all
         # static/ is where Vite outputs CSS/JS files (configured in vite.config.js)
-        re_path(r'^(?!api/|admin/|static/|media/|favicon\.ico|robots\.txt|manifest\.json).*$', serve_react_app),
+        re_path(REACT_ROUTE_PATTERN, serve_react_app),
     ]
 else:
     # Development: serve media if you're testing uploads